@@ -0,0 +1,28 @@
+"""unique_url_market_listings
+
+Revision ID: a2b3c4d5e6f7
+Revises: f1a2b3c4d5e6
+Create Date: 2026-10-17 12:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a2b3c4d5e6f7'
+down_revision = 'f1a2b3c4d5e6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Eliminar duplicados por URL (se conserva el listing más antiguo)
+    op.execute(
+        "DELETE FROM market_listings WHERE url IS NOT NULL AND id NOT IN ("
+        "SELECT MIN(id) FROM market_listings WHERE url IS NOT NULL GROUP BY url)"
+    )
+    # La normalización deduplica con INSERT ... ON CONFLICT DO NOTHING sobre este índice
+    op.create_index('ix_market_listings_url', 'market_listings', ['url'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_market_listings_url', table_name='market_listings')
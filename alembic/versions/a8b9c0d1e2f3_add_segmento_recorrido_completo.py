@@ -0,0 +1,23 @@
+"""add_segmento_recorrido_completo
+
+Revision ID: a8b9c0d1e2f3
+Revises: f7a8b9c0d1e2
+Create Date: 2026-10-17 23:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a8b9c0d1e2f3'
+down_revision = 'f7a8b9c0d1e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Último recorrido de cada segmento hasta el final del listado (lo usa la vigencia)
+    op.add_column('scraping_segmentos', sa.Column('ultimo_recorrido_completo', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('scraping_segmentos', 'ultimo_recorrido_completo')
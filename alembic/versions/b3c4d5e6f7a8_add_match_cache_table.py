@@ -0,0 +1,37 @@
+"""add_match_cache_table
+
+Revision ID: b3c4d5e6f7a8
+Revises: a2b3c4d5e6f7
+Create Date: 2026-10-17 14:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b3c4d5e6f7a8'
+down_revision = 'a2b3c4d5e6f7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Caché persistente de matcheo (marca_raw, modelo_raw) → (marca_id, modelo_id)
+    op.create_table('match_cache',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('marca_raw', sa.String(), nullable=False),
+        sa.Column('modelo_raw', sa.String(), nullable=False),
+        sa.Column('marca_id', sa.Integer(), nullable=True),
+        sa.Column('modelo_id', sa.Integer(), nullable=True),
+        sa.Column('catalogo_version', sa.String(length=40), nullable=False),
+        sa.Column('fecha_creacion', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['marca_id'], ['marcas.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['modelo_id'], ['modelos.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('marca_raw', 'modelo_raw', name='uq_match_cache_clave')
+    )
+    op.create_index(op.f('ix_match_cache_id'), 'match_cache', ['id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_match_cache_id'), table_name='match_cache')
+    op.drop_table('match_cache')
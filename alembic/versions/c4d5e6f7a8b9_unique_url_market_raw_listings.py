@@ -0,0 +1,38 @@
+"""unique_url_market_raw_listings
+
+Revision ID: c4d5e6f7a8b9
+Revises: b3c4d5e6f7a8
+Create Date: 2026-10-17 16:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c4d5e6f7a8b9'
+down_revision = 'b3c4d5e6f7a8'
+branch_labels = None
+depends_on = None
+
+# Raw listings duplicados por URL (todos menos el más antiguo de cada URL)
+DUPLICADOS = (
+    "SELECT id FROM market_raw_listings WHERE url IS NOT NULL AND id NOT IN ("
+    "SELECT MIN(id) FROM market_raw_listings WHERE url IS NOT NULL GROUP BY url)"
+)
+
+
+def upgrade():
+    # Los market listings que apuntan a un duplicado pasan a apuntar al raw que se conserva
+    op.execute(
+        "UPDATE market_listings SET raw_listing_id = ("
+        "SELECT MIN(r2.id) FROM market_raw_listings r1 "
+        "JOIN market_raw_listings r2 ON r2.url = r1.url "
+        "WHERE r1.id = market_listings.raw_listing_id"
+        f") WHERE raw_listing_id IN ({DUPLICADOS})"
+    )
+    op.execute(f"DELETE FROM market_raw_listings WHERE id IN ({DUPLICADOS})")
+    # Los scrapers deduplican con INSERT ... ON CONFLICT (url) DO NOTHING sobre este índice
+    op.create_index('ix_market_raw_listings_url', 'market_raw_listings', ['url'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_market_raw_listings_url', table_name='market_raw_listings')
@@ -0,0 +1,39 @@
+"""add_scraping_segmentos_table
+
+Revision ID: d5e6f7a8b9c0
+Revises: c4d5e6f7a8b9
+Create Date: 2026-10-17 18:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd5e6f7a8b9c0'
+down_revision = 'c4d5e6f7a8b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Estado por segmento (fuente, marca, modelo) para el scraping incremental
+    op.create_table('scraping_segmentos',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('fuente', sa.String(), nullable=False),
+        sa.Column('marca', sa.String(), nullable=False),
+        sa.Column('modelo', sa.String(), nullable=False),
+        sa.Column('ultimo_scrapeo', sa.DateTime(), nullable=True),
+        sa.Column('duracion_segundos', sa.Float(), nullable=True),
+        sa.Column('vistos', sa.Integer(), nullable=False),
+        sa.Column('nuevos', sa.Integer(), nullable=False),
+        sa.Column('tasa_nuevos', sa.Float(), nullable=False),
+        sa.Column('tasa_cambios_precio', sa.Float(), nullable=False),
+        sa.Column('corridas', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('fuente', 'marca', 'modelo', name='uq_scraping_segmento')
+    )
+    op.create_index(op.f('ix_scraping_segmentos_id'), 'scraping_segmentos', ['id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_scraping_segmentos_id'), table_name='scraping_segmentos')
+    op.drop_table('scraping_segmentos')
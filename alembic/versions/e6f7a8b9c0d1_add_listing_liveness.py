@@ -0,0 +1,59 @@
+"""add_listing_liveness
+
+Revision ID: e6f7a8b9c0d1
+Revises: d5e6f7a8b9c0
+Create Date: 2026-10-17 20:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e6f7a8b9c0d1'
+down_revision = 'd5e6f7a8b9c0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Último scrapeo que encontró cada listing (se arranca desde la fecha de scraping)
+    op.add_column('market_raw_listings', sa.Column('fecha_ultima_vista', sa.DateTime(), nullable=True))
+    op.add_column('market_listings', sa.Column('fecha_ultima_vista', sa.DateTime(), nullable=True))
+    op.execute("UPDATE market_raw_listings SET fecha_ultima_vista = fecha_scraping")
+    op.execute("UPDATE market_listings SET fecha_ultima_vista = fecha_scraping")
+
+    # El índice de comparables pasa a ser parcial sobre los listings activos
+    op.drop_index('ix_market_listings_comparables', table_name='market_listings')
+    op.create_index(
+        'ix_market_listings_comparables', 'market_listings', ['marca_id', 'modelo_id', 'anio'],
+        unique=False, postgresql_where=sa.text('activo'), sqlite_where=sa.text('activo'),
+    )
+
+    # Archivo de listings inactivos (fuera de la tabla caliente)
+    op.create_table('market_listings_archivo',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('raw_listing_id', sa.Integer(), nullable=True),
+        sa.Column('fuente', sa.String(), nullable=False),
+        sa.Column('marca_id', sa.Integer(), nullable=False),
+        sa.Column('modelo_id', sa.Integer(), nullable=False),
+        sa.Column('anio', sa.Integer(), nullable=False),
+        sa.Column('km', sa.Integer(), nullable=True),
+        sa.Column('precio', sa.Float(), nullable=False),
+        sa.Column('moneda', sa.String(), nullable=True),
+        sa.Column('ubicacion', sa.String(), nullable=True),
+        sa.Column('url', sa.String(), nullable=True),
+        sa.Column('fecha_publicacion', sa.DateTime(), nullable=True),
+        sa.Column('fecha_scraping', sa.DateTime(), nullable=True),
+        sa.Column('fecha_ultima_vista', sa.DateTime(), nullable=True),
+        sa.Column('fecha_archivado', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_market_listings_archivo_marca_modelo', 'market_listings_archivo', ['marca_id', 'modelo_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_market_listings_archivo_marca_modelo', table_name='market_listings_archivo')
+    op.drop_table('market_listings_archivo')
+    op.drop_index('ix_market_listings_comparables', table_name='market_listings')
+    op.create_index('ix_market_listings_comparables', 'market_listings', ['marca_id', 'modelo_id', 'anio'], unique=False)
+    op.drop_column('market_listings', 'fecha_ultima_vista')
+    op.drop_column('market_raw_listings', 'fecha_ultima_vista')
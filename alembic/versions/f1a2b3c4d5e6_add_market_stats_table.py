@@ -0,0 +1,46 @@
+"""add_market_stats_table
+
+Revision ID: f1a2b3c4d5e6
+Revises: 7c96bb646bc7, e4f5g6h7i8j9
+Create Date: 2026-10-17 10:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'f1a2b3c4d5e6'
+down_revision = ('7c96bb646bc7', 'e4f5g6h7i8j9')
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Agregados precalculados de market_listings por marca/modelo/año/moneda
+    op.create_table('market_stats',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('marca_id', sa.Integer(), nullable=False),
+        sa.Column('modelo_id', sa.Integer(), nullable=False),
+        sa.Column('anio', sa.Integer(), nullable=False),
+        sa.Column('moneda', sa.String(), nullable=False),
+        sa.Column('cantidad', sa.Integer(), nullable=False),
+        sa.Column('suma_precio', sa.Float(), nullable=False),
+        sa.Column('precio_min', sa.Float(), nullable=True),
+        sa.Column('precio_max', sa.Float(), nullable=True),
+        sa.Column('mediana', sa.Float(), nullable=True),
+        sa.Column('media_recortada', sa.Float(), nullable=True),
+        sa.Column('p10', sa.Float(), nullable=True),
+        sa.Column('p90', sa.Float(), nullable=True),
+        sa.Column('km_promedio', sa.Float(), nullable=True),
+        sa.Column('km_cantidad', sa.Integer(), nullable=False),
+        sa.Column('fecha_actualizacion', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['marca_id'], ['marcas.id'], ),
+        sa.ForeignKeyConstraint(['modelo_id'], ['modelos.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('marca_id', 'modelo_id', 'anio', 'moneda', name='uq_market_stats_clave')
+    )
+    op.create_index(op.f('ix_market_stats_id'), 'market_stats', ['id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_market_stats_id'), table_name='market_stats')
+    op.drop_table('market_stats')
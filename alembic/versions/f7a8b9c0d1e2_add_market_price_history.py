@@ -0,0 +1,35 @@
+"""add_market_price_history
+
+Revision ID: f7a8b9c0d1e2
+Revises: e6f7a8b9c0d1
+Create Date: 2026-10-17 22:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'f7a8b9c0d1e2'
+down_revision = 'e6f7a8b9c0d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Historial de precios (una fila por cambio de precio de un raw listing)
+    op.create_table('market_price_history',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('raw_listing_id', sa.Integer(), nullable=False),
+        sa.Column('fecha', sa.DateTime(), nullable=False),
+        sa.Column('precio', sa.Float(), nullable=False),
+        sa.Column('moneda', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['raw_listing_id'], ['market_raw_listings.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_market_price_history_id'), 'market_price_history', ['id'], unique=False)
+    op.create_index('ix_market_price_history_listing_fecha', 'market_price_history', ['raw_listing_id', 'fecha'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_market_price_history_listing_fecha', table_name='market_price_history')
+    op.drop_index(op.f('ix_market_price_history_id'), table_name='market_price_history')
+    op.drop_table('market_price_history')
@@ -10,6 +10,7 @@ from app.crud.configuracion_ai import (
     delete_configuracion_ai,
 )
 from app.config import DEEPSEEK_API_KEY
+from app.services.ai_client import invalidar_api_key, obtener_cache
 
 router = APIRouter()
 
@@ -62,6 +63,7 @@ def create_configuracion_ai_endpoint(
         raise HTTPException(status_code=400, detail="API key requerida")
 
     db_config = create_configuracion_ai(db, configuracion)
+    invalidar_api_key()
     has_key, last4 = _mask_key(db_config.api_key)
     return ConfiguracionAIOut(
         id=db_config.id,
@@ -83,6 +85,7 @@ def update_configuracion_ai_endpoint(
     current_admin=Depends(get_current_admin),
 ):
     db_config = update_configuracion_ai(db, configuracion_id, configuracion)
+    invalidar_api_key()
     if not db_config:
         raise HTTPException(status_code=404, detail="Configuración de IA no encontrada")
 
@@ -106,6 +109,24 @@ def delete_configuracion_ai_endpoint(
     current_admin=Depends(get_current_admin),
 ):
     db_config = delete_configuracion_ai(db, configuracion_id)
+    invalidar_api_key()
     if not db_config:
         raise HTTPException(status_code=404, detail="Configuración de IA no encontrada")
     return {"message": "Configuración de IA eliminada exitosamente"}
+
+
+@router.get("/configuracion-ai/cache")
+def read_cache_ai(current_admin=Depends(get_current_admin)):
+    """Aciertos, fallos y entradas de la caché de respuestas de la IA."""
+    cache = obtener_cache()
+    if cache is None:
+        return {"activa": False}
+    return {"activa": True, **cache.estadisticas()}
+
+
+@router.delete("/configuracion-ai/cache")
+def delete_cache_ai(current_admin=Depends(get_current_admin)):
+    cache = obtener_cache()
+    if cache is not None:
+        cache.limpiar()
+    return {"message": "Caché de IA vaciada"}
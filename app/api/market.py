@@ -2,7 +2,11 @@
 Endpoints públicos para consultas de mercado (usable por la app móvil sin login).
 """
 from fastapi import APIRouter, Query, HTTPException, Depends, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+import json
 import statistics
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import Optional, List
 
@@ -10,7 +14,10 @@ from app.database import get_db
 from app.models.pricing import MarketListing
 from app.schemas.pricing import MarketListingOut
 from app.services.pricing_engine import _trimmed_mean
-from app.services.ai_client import deepseek_chat, get_deepseek_api_key
+from app.services.market_stats import obtener_market_stats, combinar_market_stats
+from app.services.historial_precios import historial_listing, serie_semanal
+from app.services.ai_client import deepseek_chat_async, get_deepseek_api_key
+from app.services.trabajos_ai import trabajos
 from app.database import SessionLocal
 from app.models.pricing import MarketListing
 from app.schemas.pricing import MarketListingOut
@@ -62,12 +69,43 @@ def market_historico(
     modelo_id: Optional[int] = Query(None),
     anio_min: Optional[int] = Query(None),
     anio_max: Optional[int] = Query(None),
+    agrupar: str = Query("anio", pattern="^(anio|semana)$"),
+    semanas: int = Query(26, ge=1, le=104),
+    moneda: str = Query("ARS"),
     db: Session = Depends(get_db),
 ):
     """Retorna la evolución histórica por año con la media recortada (se elimina mínimo y máximo).
     Respuesta: list de objetos {anio: int, precio_promedio: float}
+    Solo considera listings en `moneda`. Lee de `market_stats`; si la tabla todavía no
+    fue poblada, calcula sobre los listings.
+    Con `agrupar=semana` retorna la tendencia de las últimas `semanas` semanas
+    (list de {semana: fecha del lunes, precio_promedio, count}), usando el historial de precios.
     """
-    query = db.query(MarketListing).filter(MarketListing.activo == True, MarketListing.precio > 0)
+    if agrupar == "semana":
+        series = serie_semanal(db, marca_id, modelo_id, anio_min, anio_max, moneda=moneda, semanas=semanas)
+        if not series:
+            raise HTTPException(status_code=404, detail="No hay datos de mercado para esos filtros")
+        return series
+
+    stats = obtener_market_stats(db, marca_id, modelo_id, anio_min, anio_max, moneda)
+    if stats:
+        por_anio: dict[int, list] = {}
+        for s in stats:
+            por_anio.setdefault(s.anio, []).append(s)
+        series = []
+        for year in sorted(por_anio.keys()):
+            resumen = combinar_market_stats(por_anio[year], moneda)
+            if not resumen:
+                continue
+            precio_prom = resumen["media_recortada"]
+            series.append({"anio": year, "precio_promedio": round(precio_prom, 2) if precio_prom is not None else None, "count": resumen["cantidad"]})
+        return series
+
+    query = db.query(MarketListing).filter(
+        MarketListing.activo == True,
+        MarketListing.precio > 0,
+        func.coalesce(MarketListing.moneda, "ARS") == moneda,
+    )
     if marca_id:
         query = query.filter(MarketListing.marca_id == marca_id)
     if modelo_id:
@@ -97,70 +135,101 @@ def market_historico(
     return series
 
 
-@router.get("/ai_sugerir")
-def market_ai_sugerir(
-    marca_id: Optional[int] = Query(None),
-    modelo_id: Optional[int] = Query(None),
-    anio_min: Optional[int] = Query(None),
-    anio_max: Optional[int] = Query(None),
-    limit: int = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db),
-    response: Response = None,
-):
-    """Genera una sugerencia usando IA basada en los listings filtrados.
-    Retorna texto de sugerencia y los `limit` mejores candidates.
+@router.get("/listings/{listing_id}/historial")
+def market_listing_historial(listing_id: int, db: Session = Depends(get_db)):
+    """Historial de precios de un listing.
+    Respuesta: list de {fecha, precio, moneda}, del más viejo al más nuevo.
     """
+    puntos = historial_listing(db, listing_id)
+    if puntos is None:
+        raise HTTPException(status_code=404, detail="Listing no encontrado")
+    return puntos
+
+
+def _preparar_sugerencia(
+    marca_id: Optional[int],
+    modelo_id: Optional[int],
+    anio_min: Optional[int],
+    anio_max: Optional[int],
+    limit: int,
+) -> dict:
+    """Parte sincrónica de /ai_sugerir, con su propia Session que se cierra
+    antes de llamar a la IA (no se retiene una conexión mientras el modelo responde).
+    Retorna {mensaje} si no hay datos, o {candidates, messages, api_key}.
+    """
+    db = SessionLocal()
     try:
-        # obtener comparables simples
-        query = db.query(MarketListing).filter(MarketListing.activo == True, MarketListing.precio > 0)
-        if marca_id:
-            query = query.filter(MarketListing.marca_id == marca_id)
-        if modelo_id:
-            query = query.filter(MarketListing.modelo_id == modelo_id)
-        if anio_min is not None:
-            query = query.filter(MarketListing.anio >= anio_min)
-        if anio_max is not None:
-            query = query.filter(MarketListing.anio <= anio_max)
-
-        listings = query.order_by(MarketListing.fecha_scraping.desc()).limit(200).all()
-        if not listings:
-            msg = "No hay datos de mercado para esos filtros. Prueba con otros valores."
-            if response is not None:
-                response.headers["Access-Control-Allow-Origin"] = "*"
-            return {"sugerencia": msg, "candidates": []}
-
-        precios = [float(l.precio) for l in listings if l.precio and l.precio > 0]
-        if not precios:
-            msg = "No hay precios válidos para esos filtros."
-            if response is not None:
-                response.headers["Access-Control-Allow-Origin"] = "*"
-            return {"sugerencia": msg, "candidates": []}
+        return _preparar_sugerencia_db(db, marca_id, modelo_id, anio_min, anio_max, limit)
+    finally:
+        db.close()
+
+
+def _preparar_sugerencia_db(
+    db: Session,
+    marca_id: Optional[int],
+    modelo_id: Optional[int],
+    anio_min: Optional[int],
+    anio_max: Optional[int],
+    limit: int,
+) -> dict:
+    # obtener comparables simples
+    query = db.query(MarketListing).filter(MarketListing.activo == True, MarketListing.precio > 0)
+    if marca_id:
+        query = query.filter(MarketListing.marca_id == marca_id)
+    if modelo_id:
+        query = query.filter(MarketListing.modelo_id == modelo_id)
+    if anio_min is not None:
+        query = query.filter(MarketListing.anio >= anio_min)
+    if anio_max is not None:
+        query = query.filter(MarketListing.anio <= anio_max)
 
+    listings = query.order_by(MarketListing.fecha_scraping.desc()).limit(200).all()
+    if not listings:
+        return {"mensaje": "No hay datos de mercado para esos filtros. Prueba con otros valores."}
+
+    precios = [float(l.precio) for l in listings if l.precio and l.precio > 0]
+    if not precios:
+        return {"mensaje": "No hay precios válidos para esos filtros."}
+
+    # resumen del mercado en pesos desde market_stats (fallback: los listings traídos)
+    resumen = combinar_market_stats(
+        obtener_market_stats(db, marca_id, modelo_id, anio_min, anio_max, "ARS")
+    )
+    if resumen:
+        total_listings = resumen["cantidad"]
+        precio_trim = resumen["media_recortada"]
+        mediana = resumen["mediana"]
+        if mediana is None:
+            # Varias filas: la mediana exacta sale de los listings traídos en pesos
+            precios_ars = [float(l.precio) for l in listings if l.precio and (l.moneda or "ARS") == "ARS"]
+            mediana = statistics.median(precios_ars) if precios_ars else None
+    else:
+        total_listings = len(precios)
         precio_trim = _trimmed_mean(precios, trim_count=1)
         mediana = statistics.median(precios)
 
-        # seleccionar top candidates por cercanía a mediana
-        def score(l: MarketListing):
-            if not l.precio or mediana is None:
-                return float('inf')
-            return abs(float(l.precio) - mediana)
+    # seleccionar top candidates por cercanía a mediana
+    def score(l: MarketListing):
+        if not l.precio or mediana is None:
+            return float('inf')
+        return abs(float(l.precio) - mediana)
 
-        candidates = sorted(listings, key=score)[:limit]
+    candidates = sorted(listings, key=score)[:limit]
 
-        # preparar prompt para la IA
-        summary = {
-            "count": len(precios),
-            "mediana": mediana,
-            "precio_trim": precio_trim,
-        }
+    # preparar prompt para la IA
+    summary = {
+        "count": total_listings,
+        "mediana": mediana,
+        "precio_trim": precio_trim,
+    }
 
-        # preparar datos de listings formateados
-        listings_data = "\n".join([
-            f"- {l.marca_id}/{l.modelo_id} {l.anio}: ${l.precio} ({l.km}km) - {l.url}"
-            for l in candidates[:20]
-        ])
+    # preparar datos de listings formateados
+    listings_data = "\n".join([
+        f"- {l.marca_id}/{l.modelo_id} {l.anio}: ${l.precio} ({l.km}km) - {l.url}"
+        for l in candidates[:20]
+    ])
 
-        prompt = (
+    prompt = (
 f"""
 Actúa como asesor experto en autos usados.
 
@@ -200,45 +269,137 @@ Link: URL
 Máximo 10 líneas.
 Sé directo.
 """
+    )
+
+    api_key, _src = get_deepseek_api_key(db)
+    messages = [
+        {"role": "system", "content": "Eres un experto en compra/venta de autos usados."},
+        {"role": "user", "content": prompt},
+    ]
+
+    # convertir candidates a dict serializable
+    candidates_out = [
+        {
+            "id": c.id,
+            "fuente": c.fuente,
+            "marca_id": c.marca_id,
+            "modelo_id": c.modelo_id,
+            "anio": c.anio,
+            "km": c.km,
+            "precio": c.precio,
+            "moneda": c.moneda,
+            "url": c.url,
+        }
+        for c in candidates
+    ]
+    return {"mensaje": None, "candidates": candidates_out, "messages": messages, "api_key": api_key}
+
+
+@router.get("/ai_sugerir")
+async def market_ai_sugerir(
+    marca_id: Optional[int] = Query(None),
+    modelo_id: Optional[int] = Query(None),
+    anio_min: Optional[int] = Query(None),
+    anio_max: Optional[int] = Query(None),
+    limit: int = Query(10, ge=1, le=100),
+    modo: str = Query("sync", pattern="^(sync|job)$"),
+    response: Response = None,
+):
+    """Genera una sugerencia usando IA basada en los listings filtrados.
+    Retorna texto de sugerencia y los `limit` mejores candidates.
+    Las consultas corren en el threadpool y la llamada a la IA es async: mientras
+    espera al modelo el request no ocupa ningún thread ni conexión a la base.
+    Con `modo=job` responde enseguida con los candidates, `sugerencia: null` y un
+    `job_id`; el texto se obtiene con GET /market/ai_sugerir/{job_id} (polling)
+    o GET /market/ai_sugerir/{job_id}/eventos (Server-Sent Events). Sin IA
+    configurada el job nace en estado `error`.
+    """
+    try:
+        preparada = await run_in_threadpool(
+            _preparar_sugerencia, marca_id, modelo_id, anio_min, anio_max, limit
         )
+        if preparada["mensaje"]:
+            if response is not None:
+                response.headers["Access-Control-Allow-Origin"] = "*"
+            return {"sugerencia": preparada["mensaje"], "candidates": []}
+
+        if modo == "job":
+            if preparada["api_key"]:
+                trabajo = trabajos.lanzar(preparada["messages"], preparada["api_key"])
+            else:
+                trabajo = trabajos.fallido("IA no configurada en el servidor")
+            if response is not None:
+                response.headers["Access-Control-Allow-Origin"] = "*"
+            return {**trabajo.resumen(), "candidates": preparada["candidates"]}
 
         # llamar IA si está configurada
-        api_key, _src = get_deepseek_api_key(db)
-        sugerencia_text = None
-        if api_key:
-            messages = [
-                {"role": "system", "content": "Eres un experto en compra/venta de autos usados."},
-                {"role": "user", "content": prompt},
-            ]
+        if preparada["api_key"]:
             try:
-                sugerencia_text = deepseek_chat(messages, db=db)
+                sugerencia_text = await deepseek_chat_async(preparada["messages"], api_key=preparada["api_key"])
             except Exception as e:
                 sugerencia_text = f"IA no disponible: {e}"
         else:
             sugerencia_text = "IA no configurada en el servidor."
 
-        # convertir candidates a dict serializable
-        candidates_out = [
-            {
-                "id": c.id,
-                "fuente": c.fuente,
-                "marca_id": c.marca_id,
-                "modelo_id": c.modelo_id,
-                "anio": c.anio,
-                "km": c.km,
-                "precio": c.precio,
-                "moneda": c.moneda,
-                "url": c.url,
-            }
-            for c in candidates
-        ]
-
         # fallback: asegurar header CORS si por alguna razón el middleware no se aplica
         if response is not None:
             response.headers["Access-Control-Allow-Origin"] = "*"
-        return {"sugerencia": sugerencia_text, "candidates": candidates_out}
+        return {"sugerencia": sugerencia_text, "candidates": preparada["candidates"]}
     except Exception as e:
         # Captura cualquier error y lo devuelve en sugerencia
         if response is not None:
             response.headers["Access-Control-Allow-Origin"] = "*"
         return {"sugerencia": f"Error interno: {e}", "candidates": []}
+
+
+def _trabajo_o_404(job_id: str):
+    trabajo = trabajos.obtener(job_id)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado o vencido")
+    return trabajo
+
+
+@router.get("/ai_sugerir/{job_id}")
+async def market_ai_sugerir_estado(job_id: str, response: Response = None):
+    """Estado de una sugerencia en modo job.
+    Respuesta: {job_id, estado: pendiente|listo|error, sugerencia (parcial mientras está pendiente)}.
+    """
+    trabajo = _trabajo_o_404(job_id)
+    if response is not None:
+        response.headers["Access-Control-Allow-Origin"] = "*"
+    return trabajo.resumen()
+
+
+def _evento(nombre: str, datos: dict) -> str:
+    return f"event: {nombre}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+
+@router.get("/ai_sugerir/{job_id}/eventos")
+async def market_ai_sugerir_eventos(job_id: str):
+    """Server-Sent Events de una sugerencia en modo job: un evento `fragmento`
+    ({texto}) por cada parte que genera la IA y un `fin` con el resumen final.
+    """
+    trabajo = _trabajo_o_404(job_id)
+
+    async def eventos():
+        vistos = 0
+        while True:
+            if not await trabajo.esperar(vistos, timeout=15):
+                # Comentario SSE para que proxies y clientes no corten la conexión
+                yield ": ping\n\n"
+                continue
+            # `terminado` antes que los fragmentos: si ya terminó, están todos
+            terminado = trabajo.terminado
+            nuevas = trabajo.partes[vistos:]
+            vistos += len(nuevas)
+            for parte in nuevas:
+                yield _evento("fragmento", {"texto": parte})
+            if terminado:
+                yield _evento("fin", trabajo.resumen())
+                return
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "Access-Control-Allow-Origin": "*"},
+    )
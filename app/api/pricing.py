@@ -2,11 +2,15 @@
 API endpoints para el módulo de Pricing Inteligente.
 """
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Optional
 from io import BytesIO
+import os
+import tempfile
 
+from app.config import EXCEL_MAX_MB
 from app.database import get_db
 from app.api.deps import get_current_admin
 from app.schemas.pricing import (
@@ -31,11 +35,7 @@ from app.services.pricing_engine import (
     obtener_estadisticas_pricing,
 )
 from app.services.simulador import simular_venta, simular_rango
-from app.services.scraper_mercadolibre import scrape_all_mercadolibre
-from app.services.scraper_kavak import scrape_all_kavak
-from app.services.scraper_deruedas import scrape_all_deruedas
-from app.services.scraper_preciosdeautos import scrape_all_preciosdeautos
-from app.services.scraper_ai import scrape_all_ai
+from app.services.scraping_orchestrator import FUENTES_WEB, ejecutar_scrapers, sumar_stats
 from app.services.ai_client import get_deepseek_api_key
 from app.services.normalizer import normalizar_listings
 from app.services.excel_importer import importar_excel
@@ -172,36 +172,15 @@ def ejecutar_scraping(
     db: Session = Depends(get_db),
     admin=Depends(get_current_admin),
 ):
-    """Ejecuta el scraping de datos de mercado."""
-    total = {"nuevos": 0, "duplicados": 0, "errores": 0}
-
-    if fuente in ("mercadolibre", "all"):
-        stats_ml = scrape_all_mercadolibre(db)
-        for k in total:
-            total[k] += stats_ml[k]
-
-    if fuente in ("kavak", "all"):
-        stats_kv = scrape_all_kavak(db)
-        for k in total:
-            total[k] += stats_kv[k]
-
-    if fuente in ("deruedas", "all"):
-        stats_dr = scrape_all_deruedas(db)
-        for k in total:
-            total[k] += stats_dr[k]
-
-    if fuente in ("preciosdeautos", "all"):
-        stats_pda = scrape_all_preciosdeautos(db)
-        for k in total:
-            total[k] += stats_pda[k]
-
-    if fuente in ("ai", "all"):
+    """Ejecuta el scraping de datos de mercado (las fuentes corren en paralelo)."""
+    fuentes = FUENTES_WEB + ["ai"] if fuente == "all" else [fuente]
+
+    if "ai" in fuentes:
         api_key, _source = get_deepseek_api_key(db)
         if not api_key:
             raise HTTPException(status_code=400, detail="API key de IA no configurada")
-        stats_ai = scrape_all_ai(db)
-        for k in total:
-            total[k] += stats_ai[k]
+
+    total = sumar_stats(ejecutar_scrapers(fuentes))
 
     return ScrapingResult(
         fuente=fuente,
@@ -268,25 +247,35 @@ async def importar_datos_excel(
             detail="El archivo debe ser un Excel (.xlsx o .xls)",
         )
 
-    # Validar tamaño (máx 10 MB)
-    content = await file.read()
-    if len(content) > 10 * 1024 * 1024:
-        raise HTTPException(
-            status_code=400,
-            detail="El archivo es demasiado grande (máximo 10 MB)",
+    # Volcar a un temporal por partes, validando el tamaño (máx EXCEL_MAX_MB)
+    max_bytes = EXCEL_MAX_MB * 1024 * 1024
+    tmp = tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False)
+    try:
+        with tmp:
+            total = 0
+            while chunk := await file.read(1024 * 1024):
+                total += len(chunk)
+                if total > max_bytes:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"El archivo es demasiado grande (máximo {EXCEL_MAX_MB} MB)",
+                    )
+                tmp.write(chunk)
+
+        stats = await run_in_threadpool(
+            importar_excel,
+            db=db,
+            filename=file.filename,
+            sobrescribir=sobrescribir,
+            ruta=tmp.name,
         )
-
-    stats = importar_excel(
-        db=db,
-        file_content=content,
-        filename=file.filename,
-        sobrescribir=sobrescribir,
-    )
+    finally:
+        os.unlink(tmp.name)
 
     # Normalizar si se pidió y hubo importaciones
     mensaje_norm = ""
     if normalizar and stats["importados"] > 0:
-        norm_stats = normalizar_listings(db)
+        norm_stats = await run_in_threadpool(normalizar_listings, db)
         mensaje_norm = f" | Normalización: {norm_stats['normalizados']} normalizados"
 
     stats["mensaje"] = (
@@ -306,8 +295,6 @@ def descargar_plantilla_excel(
     Descarga la plantilla Excel de ejemplo para importar datos de mercado.
     """
     from generate_sample_excel import create_sample_excel
-    import tempfile
-    import os
 
     # Generar en directorio temporal
     tmp_path = os.path.join(tempfile.gettempdir(), "datos_mercado_plantilla.xlsx")
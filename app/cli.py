@@ -1,35 +1,25 @@
-"""CLI minimal para tareas diarias: scraping, normalización y análisis.
+"""CLI minimal para tareas diarias: scraping, normalización, vigencia y análisis.
 Uso: `python -m app.cli daily-update` o `python -m app.cli`.
+Con `--budget-minutes N` el scraping corre en modo delta (segmentos con más
+movimiento primero, hasta N minutos).
 """
+import argparse
+from typing import Optional
 from app.database import SessionLocal
-from app.services.scraper_mercadolibre import scrape_all_mercadolibre
-from app.services.scraper_kavak import scrape_all_kavak
-from app.services.scraper_deruedas import scrape_all_deruedas
-from app.services.scraper_preciosdeautos import scrape_all_preciosdeautos
-from app.services.scraper_ai import scrape_all_ai
+from app.services.scraping_orchestrator import FUENTES_WEB, ejecutar_scrapers, sumar_stats
 from app.services.normalizer import normalizar_listings
 from app.services.pricing_engine import analizar_inventario
+from app.services.vigencia import actualizar_vigencia
 
-def daily_update():
+def daily_update(budget_minutes: Optional[float] = None):
     db = SessionLocal()
     try:
-        total = {"nuevos": 0, "duplicados": 0, "errores": 0}
-
-        for fn in (scrape_all_mercadolibre, scrape_all_kavak, scrape_all_deruedas, scrape_all_preciosdeautos):
-            try:
-                stats = fn(db)
-                for k in total:
-                    total[k] += stats.get(k, 0)
-            except Exception as e:
-                print(f"Error en scraper {fn.__name__}: {e}")
-
-        # AI scraper (si está configurado puede fallar si no hay API key)
-        try:
-            stats_ai = scrape_all_ai(db)
-            for k in total:
-                total[k] += stats_ai.get(k, 0)
-        except Exception as e:
-            print(f"AI scraper skipped/error: {e}")
+        # Fuentes web + AI en paralelo (el AI scraper puede fallar si no hay API key;
+        # los errores de cada fuente se loguean y no cortan a las demás)
+        stats_por_fuente = ejecutar_scrapers(FUENTES_WEB + ["ai"], limite_minutos=budget_minutes)
+        for fuente, stats in stats_por_fuente.items():
+            print(f"Scraper {fuente}: {stats}")
+        total = sumar_stats(stats_por_fuente)
 
         print("Scraping finalizado:", total)
 
@@ -40,6 +30,13 @@ def daily_update():
         except Exception as e:
             print(f"Normalización falló: {e}")
 
+        # Desactivar listings que ya no aparecen (vendidos)
+        try:
+            vigencia_stats = actualizar_vigencia(db)
+            print("Vigencia:", vigencia_stats)
+        except Exception as e:
+            print(f"Actualización de vigencia falló: {e}")
+
         # Analizar inventario
         try:
             resultados = analizar_inventario(db)
@@ -52,4 +49,13 @@ def daily_update():
 
 
 if __name__ == "__main__":
-    daily_update()
+    parser = argparse.ArgumentParser(description="Tareas diarias de datos de mercado")
+    parser.add_argument("comando", nargs="?", choices=["daily-update"], default="daily-update")
+    parser.add_argument(
+        "--budget-minutes",
+        type=float,
+        default=None,
+        help="Modo delta: prioriza los segmentos con más movimiento y corta al vencer el plazo",
+    )
+    args = parser.parse_args()
+    daily_update(budget_minutes=args.budget_minutes)
@@ -17,3 +17,66 @@ DEEPSEEK_MODEL = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
 ML_CLIENT_ID = os.getenv("ML_CLIENT_ID", "")
 ML_CLIENT_SECRET = os.getenv("ML_CLIENT_SECRET", "")
 ML_REDIRECT_URI = os.getenv("ML_REDIRECT_URI", "http://localhost:8004/ml/callback")
+
+# Normalización de datos de mercado
+NORMALIZER_BATCH_SIZE = int(os.getenv("NORMALIZER_BATCH_SIZE", "1000"))
+NORMALIZER_CHUNK_SIZE = int(os.getenv("NORMALIZER_CHUNK_SIZE", "5000"))
+# Filtro de outliers: "desvio" (media ± umbral·σ, Welford) o "mad" (mediana ± umbral·1.4826·MAD)
+OUTLIER_METODO = os.getenv("OUTLIER_METODO", "desvio")
+OUTLIER_UMBRAL = float(os.getenv("OUTLIER_UMBRAL", "2.0"))
+OUTLIER_MIN_GRUPO = int(os.getenv("OUTLIER_MIN_GRUPO", "3"))
+# Modo "mad": precios por grupo que se conservan (muestreo reservoir) para mediana/MAD
+OUTLIER_MUESTRA_MAX = int(os.getenv("OUTLIER_MUESTRA_MAX", "2000"))
+MATCH_CACHE_LRU_SIZE = int(os.getenv("MATCH_CACHE_LRU_SIZE", "50000"))
+
+# Cliente HTTP compartido de los scrapers (timeout en segundos, backoff exponencial)
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "20"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "1.0"))
+# Caché en disco de páginas scrapeadas (GET condicional); run_scraper.py la activa con --cache
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", ".cache/scraper")
+HTTP_CACHE_TTL_HORAS = float(os.getenv("HTTP_CACHE_TTL_HORAS", "168"))
+HTTP_CACHE_MAX_MB = float(os.getenv("HTTP_CACHE_MAX_MB", "200"))
+
+# Scraping: cantidad de fuentes que corren en paralelo
+SCRAPER_MAX_WORKERS = int(os.getenv("SCRAPER_MAX_WORKERS", "5"))
+# Paginación adaptativa: páginas máximas por búsqueda, presupuesto de páginas por
+# corrida (compartido entre fuentes) y proporción mínima de nuevos para seguir
+SCRAPER_MAX_PAGINAS = int(os.getenv("SCRAPER_MAX_PAGINAS", "10"))
+SCRAPER_PRESUPUESTO_PAGINAS = int(os.getenv("SCRAPER_PRESUPUESTO_PAGINAS", "500"))
+SCRAPER_MIN_RATIO_NUEVOS = float(os.getenv("SCRAPER_MIN_RATIO_NUEVOS", "0.1"))
+# Vigencia de listings: se desactivan los no vistos en N días; los inactivos con
+# más de LISTINGS_DIAS_ARCHIVO días sin verse pasan al archivo (0 = no archivar).
+# Cada LISTINGS_DIAS_RECORRIDO_COMPLETO días una búsqueda se recorre hasta el
+# final, sin cortar por duplicados, para que la vigencia sepa qué dejó de aparecer
+LISTINGS_DIAS_VIGENCIA = int(os.getenv("LISTINGS_DIAS_VIGENCIA", "14"))
+LISTINGS_DIAS_ARCHIVO = int(os.getenv("LISTINGS_DIAS_ARCHIVO", "0"))
+LISTINGS_DIAS_RECORRIDO_COMPLETO = int(
+    os.getenv("LISTINGS_DIAS_RECORRIDO_COMPLETO", str(max(1, LISTINGS_DIAS_VIGENCIA // 2)))
+)
+# Filas por INSERT multi-fila al guardar raw listings (dedup por URL en la base)
+SCRAPER_INSERT_BATCH_SIZE = int(os.getenv("SCRAPER_INSERT_BATCH_SIZE", "500"))
+# Scraper con IA: extracciones en paralelo, tope de tokens por corrida (prompt +
+# respuesta, según el `usage` de la API) y de requests por minuto al proveedor
+AI_MAX_WORKERS = int(os.getenv("AI_MAX_WORKERS", "4"))
+AI_MAX_TOKENS_CORRIDA = int(os.getenv("AI_MAX_TOKENS_CORRIDA", "400000"))
+AI_REQUESTS_POR_MINUTO = int(os.getenv("AI_REQUESTS_POR_MINUTO", "30"))
+# Caché de respuestas de la IA (clave: modelo + mensajes + temperatura + max_tokens).
+# Con AI_CACHE_PATH las respuestas se persisten además en ese SQLite
+AI_CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+AI_CACHE_TTL_HORAS = float(os.getenv("AI_CACHE_TTL_HORAS", "24"))
+AI_CACHE_MAX_ENTRADAS = int(os.getenv("AI_CACHE_MAX_ENTRADAS", "1000"))
+AI_CACHE_PATH = os.getenv("AI_CACHE_PATH", "")
+# Cliente de IA: llamadas simultáneas al proveedor (endpoints + scraper), timeout
+# por llamada y cuánto se reusa la API key leída de la base
+AI_MAX_CONCURRENCIA = int(os.getenv("AI_MAX_CONCURRENCIA", "8"))
+AI_TIMEOUT = float(os.getenv("AI_TIMEOUT", "30"))
+AI_KEY_CACHE_SEGUNDOS = float(os.getenv("AI_KEY_CACHE_SEGUNDOS", "300"))
+# Trabajos de /market/ai_sugerir en modo job (en memoria del proceso)
+AI_TRABAJOS_TTL_SEGUNDOS = float(os.getenv("AI_TRABAJOS_TTL_SEGUNDOS", "600"))
+AI_TRABAJOS_MAX = int(os.getenv("AI_TRABAJOS_MAX", "1000"))
+# Importación de Excel: tamaño máximo del archivo y procesos que parsean hojas en paralelo
+EXCEL_MAX_MB = int(os.getenv("EXCEL_MAX_MB", "50"))
+EXCEL_MAX_WORKERS = int(os.getenv("EXCEL_MAX_WORKERS", "4"))
@@ -19,3 +19,22 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def insert_ignorando_duplicados(db, tabla):
+    """
+    INSERT que descarta silenciosamente las filas que violan un índice único
+    (ON CONFLICT DO NOTHING en PostgreSQL/SQLite).
+    Solo esos dos dialectos: los llamadores usan RETURNING para saber qué filas
+    se insertaron, y MySQL (INSERT IGNORE) no lo soporta.
+    """
+    dialecto = db.bind.dialect.name
+    if dialecto == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(tabla).on_conflict_do_nothing()
+    if dialecto == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert(tabla).on_conflict_do_nothing()
+    raise NotImplementedError(
+        f"insert_ignorando_duplicados no soporta el dialecto '{dialecto}' (solo postgresql y sqlite)"
+    )
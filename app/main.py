@@ -26,6 +26,7 @@ from app.api import (
     pricing,
     market
 )
+from app.services.ai_client import cerrar_clientes
 
 app = FastAPI(root_path="")
 
@@ -64,6 +65,10 @@ app.include_router(ventas.router)
 app.include_router(pricing.router)
 app.include_router(market.router)
 
+@app.on_event("shutdown")
+async def cerrar_cliente_ai():
+    await cerrar_clientes()
+
 @app.get("/")
 def root():
     return {"message": "API Concesionario funcionando"}
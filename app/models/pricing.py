@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, Index
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, Index, UniqueConstraint, text
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
@@ -10,7 +10,7 @@ class MarketRawListing(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     fuente = Column(String, nullable=False)  # mercadolibre, kavak
-    url = Column(String, nullable=True, unique=True)
+    url = Column(String, nullable=True)
     titulo = Column(String, nullable=True)
     marca_raw = Column(String, nullable=True)
     modelo_raw = Column(String, nullable=True)
@@ -24,10 +24,12 @@ class MarketRawListing(Base):
     procesado = Column(Boolean, default=False)
     fecha_publicacion = Column(DateTime, nullable=True)
     fecha_scraping = Column(DateTime, default=datetime.utcnow)
+    fecha_ultima_vista = Column(DateTime, nullable=True)  # último scrapeo que lo encontró
 
     __table_args__ = (
         Index('ix_market_raw_fuente', 'fuente'),
         Index('ix_market_raw_marca_modelo', 'marca_raw', 'modelo_raw'),
+        Index('ix_market_raw_listings_url', 'url', unique=True),
     )
 
 
@@ -49,6 +51,7 @@ class MarketListing(Base):
     activo = Column(Boolean, default=True)
     fecha_publicacion = Column(DateTime, nullable=True)
     fecha_scraping = Column(DateTime, default=datetime.utcnow)
+    fecha_ultima_vista = Column(DateTime, nullable=True)  # ver app/services/vigencia.py
 
     # Relaciones
     marca = relationship("Marca", foreign_keys=[marca_id])
@@ -56,6 +59,135 @@ class MarketListing(Base):
     raw_listing = relationship("MarketRawListing", foreign_keys=[raw_listing_id])
 
     __table_args__ = (
-        Index('ix_market_listings_comparables', 'marca_id', 'modelo_id', 'anio'),
+        # Parcial: los comparables siempre filtran activo, los vendidos no ocupan el índice
+        Index(
+            'ix_market_listings_comparables', 'marca_id', 'modelo_id', 'anio',
+            postgresql_where=text('activo'), sqlite_where=text('activo'),
+        ),
         Index('ix_market_listings_fuente', 'fuente'),
+        Index('ix_market_listings_url', 'url', unique=True),
+    )
+
+
+class MarketPriceHistory(Base):
+    """
+    Historial de precios por raw listing, solo append. Se escribe una fila por
+    cambio de precio (el primer cambio agrega además el precio original en su
+    fecha de scraping); los listings que nunca cambian no ocupan filas.
+    Ver app/services/historial_precios.py.
+    """
+    __tablename__ = "market_price_history"
+
+    id = Column(Integer, primary_key=True, index=True)
+    raw_listing_id = Column(Integer, ForeignKey("market_raw_listings.id", ondelete="CASCADE"), nullable=False)
+    fecha = Column(DateTime, nullable=False, default=datetime.utcnow)
+    precio = Column(Float, nullable=False)
+    moneda = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index('ix_market_price_history_listing_fecha', 'raw_listing_id', 'fecha'),
+    )
+
+
+class MarketListingArchivo(Base):
+    """
+    Market listings inactivos movidos fuera de la tabla caliente
+    (ver app/services/vigencia.py). Conserva el id original.
+    """
+    __tablename__ = "market_listings_archivo"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    raw_listing_id = Column(Integer, nullable=True)
+    fuente = Column(String, nullable=False)
+    marca_id = Column(Integer, nullable=False)
+    modelo_id = Column(Integer, nullable=False)
+    anio = Column(Integer, nullable=False)
+    km = Column(Integer, nullable=True)
+    precio = Column(Float, nullable=False)
+    moneda = Column(String, default="ARS")
+    ubicacion = Column(String, nullable=True)
+    url = Column(String, nullable=True)
+    fecha_publicacion = Column(DateTime, nullable=True)
+    fecha_scraping = Column(DateTime, nullable=True)
+    fecha_ultima_vista = Column(DateTime, nullable=True)
+    fecha_archivado = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_market_listings_archivo_marca_modelo', 'marca_id', 'modelo_id'),
+    )
+
+
+class MarketStat(Base):
+    """
+    Estadísticas de mercado precalculadas por marca/modelo/año/moneda.
+    Se refrescan al final de la normalización (ver app/services/market_stats.py).
+    """
+    __tablename__ = "market_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    marca_id = Column(Integer, ForeignKey("marcas.id"), nullable=False)
+    modelo_id = Column(Integer, ForeignKey("modelos.id"), nullable=False)
+    anio = Column(Integer, nullable=False)
+    moneda = Column(String, nullable=False, default="ARS")
+    cantidad = Column(Integer, nullable=False, default=0)
+    suma_precio = Column(Float, nullable=False, default=0)
+    precio_min = Column(Float, nullable=True)
+    precio_max = Column(Float, nullable=True)
+    mediana = Column(Float, nullable=True)
+    media_recortada = Column(Float, nullable=True)
+    p10 = Column(Float, nullable=True)
+    p90 = Column(Float, nullable=True)
+    km_promedio = Column(Float, nullable=True)
+    km_cantidad = Column(Integer, nullable=False, default=0)
+    fecha_actualizacion = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('marca_id', 'modelo_id', 'anio', 'moneda', name='uq_market_stats_clave'),
+    )
+
+
+class MatchCache(Base):
+    """
+    Resultado memoizado del matcheo texto crudo → catálogo.
+    `marca_id`/`modelo_id` en NULL registran un "sin match". Las filas de una
+    `catalogo_version` distinta a la actual se descartan (ver app/services/match_cache.py).
+    """
+    __tablename__ = "match_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    marca_raw = Column(String, nullable=False)
+    modelo_raw = Column(String, nullable=False, default="")
+    marca_id = Column(Integer, ForeignKey("marcas.id", ondelete="CASCADE"), nullable=True)
+    modelo_id = Column(Integer, ForeignKey("modelos.id", ondelete="CASCADE"), nullable=True)
+    catalogo_version = Column(String(40), nullable=False)
+    fecha_creacion = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('marca_raw', 'modelo_raw', name='uq_match_cache_clave'),
+    )
+
+
+class ScrapingSegmento(Base):
+    """
+    Estado del scraping incremental por fuente/marca/modelo: cuándo se scrapeó
+    y cuánto cambia (proporción de nuevos y de cambios de precio, promedios
+    móviles). El scheduler delta lo usa para priorizar (ver app/services/scraping_delta.py).
+    """
+    __tablename__ = "scraping_segmentos"
+
+    id = Column(Integer, primary_key=True, index=True)
+    fuente = Column(String, nullable=False)
+    marca = Column(String, nullable=False, default="")
+    modelo = Column(String, nullable=False, default="")
+    ultimo_scrapeo = Column(DateTime, nullable=True)
+    duracion_segundos = Column(Float, nullable=True)
+    vistos = Column(Integer, nullable=False, default=0)
+    nuevos = Column(Integer, nullable=False, default=0)
+    tasa_nuevos = Column(Float, nullable=False, default=0)
+    tasa_cambios_precio = Column(Float, nullable=False, default=0)
+    corridas = Column(Integer, nullable=False, default=0)
+    ultimo_recorrido_completo = Column(DateTime, nullable=True)  # ver app/services/vigencia.py
+
+    __table_args__ = (
+        UniqueConstraint('fuente', 'marca', 'modelo', name='uq_scraping_segmento'),
     )
@@ -107,6 +107,8 @@ class NormalizacionResult(BaseModel):
     normalizados: int = 0
     sin_match: int = 0
     outliers_filtrados: int = 0
+    filas_por_segundo: Optional[float] = None
+    cache_aciertos: int = 0
     mensaje: str = ""
 
 
@@ -128,4 +130,5 @@ class ExcelImportResult(BaseModel):
     filas_sin_datos: int = 0
     hojas_procesadas: list = []
     detalles: list = []
+    filas_por_segundo: Optional[float] = None
     mensaje: str = ""
@@ -0,0 +1,150 @@
+"""
+Caché de respuestas del modelo de IA.
+La clave es el SHA-256 de endpoint, modelo, mensajes (con los espacios
+normalizados), temperatura y max_tokens: el mismo prompt de /market/ai_sugerir para los mismos
+filtros, o la misma página para el scraper con IA, se responde desde acá en vez
+de pagar otra llamada de varios segundos.
+
+Las entradas vencen a los `ttl_horas` y se guardan en un LRU en memoria de hasta
+`max_entradas`. Con `ruta` además se persisten en un SQLite local (sobreviven
+reinicios y se comparten entre procesos), que también se poda a `max_entradas`
+por último uso. Se activa al importar ai_client si AI_CACHE_ENABLED.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Cada cuántas escrituras se poda el SQLite (vencidas + exceso sobre max_entradas)
+PODAR_CADA = 100
+
+Respuesta = tuple[str, dict]
+
+
+def clave_respuesta(url: str, modelo: str, messages: list[dict], temperature: float, max_tokens: int) -> str:
+    """
+    Hash estable del pedido; los espacios repetidos no cambian la clave. Incluye
+    la URL para no mezclar respuestas de distintos servidores (p. ej. uno falso).
+    """
+    normalizados = [
+        {"role": m.get("role"), "content": " ".join(str(m.get("content") or "").split())}
+        for m in messages
+    ]
+    datos = json.dumps(
+        {"url": url, "modelo": modelo, "messages": normalizados, "temperature": temperature, "max_tokens": max_tokens},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(datos.encode("utf-8")).hexdigest()
+
+
+class CacheRespuestasIA:
+    """LRU en memoria con TTL y, opcionalmente, un SQLite como segundo nivel."""
+
+    def __init__(self, ttl_horas: float, max_entradas: int, ruta: Optional[str] = None):
+        self.ttl = ttl_horas * 3600
+        self.max_entradas = max_entradas
+        self.ruta = ruta
+        self.aciertos = 0
+        self.fallos = 0
+        self._lru: "OrderedDict[str, tuple[float, Respuesta]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._escrituras = 0
+        self._conexion: Optional[sqlite3.Connection] = None
+        if ruta:
+            directorio = os.path.dirname(ruta)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            self._conexion = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS respuestas ("
+                "clave TEXT PRIMARY KEY, contenido TEXT NOT NULL, usage TEXT, "
+                "guardado REAL NOT NULL, usado REAL NOT NULL)"
+            )
+
+    def _lru_put(self, clave: str, guardado: float, respuesta: Respuesta) -> None:
+        self._lru[clave] = (guardado, respuesta)
+        self._lru.move_to_end(clave)
+        while len(self._lru) > self.max_entradas:
+            self._lru.popitem(last=False)
+
+    def leer(self, clave: str) -> Optional[Respuesta]:
+        """(contenido, usage) de la clave, o None si no está o venció."""
+        ahora = time.time()
+        with self._lock:
+            entrada = self._lru.get(clave)
+            if entrada is not None:
+                guardado, respuesta = entrada
+                if ahora - guardado <= self.ttl:
+                    self._lru.move_to_end(clave)
+                    self.aciertos += 1
+                    return respuesta
+                del self._lru[clave]
+
+            if self._conexion is not None:
+                fila = self._conexion.execute(
+                    "SELECT contenido, usage, guardado FROM respuestas WHERE clave = ?", (clave,)
+                ).fetchone()
+                if fila is not None and ahora - fila[2] <= self.ttl:
+                    respuesta = (fila[0], json.loads(fila[1] or "{}"))
+                    self._conexion.execute("UPDATE respuestas SET usado = ? WHERE clave = ?", (ahora, clave))
+                    self._lru_put(clave, fila[2], respuesta)
+                    self.aciertos += 1
+                    return respuesta
+
+            self.fallos += 1
+            return None
+
+    def guardar(self, clave: str, contenido: str, usage: dict) -> None:
+        ahora = time.time()
+        with self._lock:
+            self._lru_put(clave, ahora, (contenido, usage))
+            if self._conexion is None:
+                return
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, contenido, usage, guardado, usado) VALUES (?, ?, ?, ?, ?)",
+                (clave, contenido, json.dumps(usage), ahora, ahora),
+            )
+            self._escrituras += 1
+            if self._escrituras % PODAR_CADA == 0:
+                self._podar(ahora)
+
+    def _podar(self, ahora: float) -> None:
+        """Borra las vencidas y las menos usadas por encima de max_entradas (con el lock tomado)."""
+        self._conexion.execute("DELETE FROM respuestas WHERE guardado < ?", (ahora - self.ttl,))
+        self._conexion.execute(
+            "DELETE FROM respuestas WHERE clave NOT IN "
+            "(SELECT clave FROM respuestas ORDER BY usado DESC LIMIT ?)",
+            (self.max_entradas,),
+        )
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._lru.clear()
+            if self._conexion is not None:
+                self._conexion.execute("DELETE FROM respuestas")
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            entradas_disco = (
+                self._conexion.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0]
+                if self._conexion is not None else None
+            )
+            consultas = self.aciertos + self.fallos
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": round(self.aciertos / consultas, 3) if consultas else None,
+                "entradas_memoria": len(self._lru),
+                "entradas_disco": entradas_disco,
+                "ttl_horas": self.ttl / 3600,
+                "max_entradas": self.max_entradas,
+            }
@@ -1,34 +1,168 @@
+"""
+Cliente del modelo de IA (API de chat completions de DeepSeek).
+- Conexiones reusadas: una requests.Session con pool por thread para las llamadas
+  sincrónicas y un httpx.AsyncClient por event loop para las async.
+- Un semáforo global limita las llamadas en curso (AI_MAX_CONCURRENCIA), sean
+  sync o async, de los endpoints o del scraper con IA. Las async lo esperan en
+  un thread aparte, en la misma cola que las sync.
+- La API key se resuelve una vez y se cachea AI_KEY_CACHE_SEGUNDOS; el endpoint
+  de configuración la invalida al cambiarla.
+- `deepseek_chat_stream` devuelve el texto a medida que llega (stream SSE).
+- Caché de respuestas por hash del pedido (ver ai_cache.py).
+"""
+import asyncio
+import json
 import logging
-from typing import Optional
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
 from sqlalchemy.orm import Session
-from app.config import DEEPSEEK_API_KEY, DEEPSEEK_BASE_URL, DEEPSEEK_MODEL
+from app.config import (
+    DEEPSEEK_API_KEY, DEEPSEEK_BASE_URL, DEEPSEEK_MODEL,
+    AI_CACHE_ENABLED, AI_CACHE_TTL_HORAS, AI_CACHE_MAX_ENTRADAS, AI_CACHE_PATH,
+    AI_MAX_CONCURRENCIA, AI_TIMEOUT, AI_KEY_CACHE_SEGUNDOS,
+)
 from app.crud.configuracion_ai import get_configuracion_ai
+from app.services.ai_cache import CacheRespuestasIA, clave_respuesta
 
 logger = logging.getLogger(__name__)
 
+_cache: Optional[CacheRespuestasIA] = None
+
+_local = threading.local()
+_semaforo = threading.BoundedSemaphore(AI_MAX_CONCURRENCIA)
+# Las llamadas async que encuentran el semáforo lleno lo esperan acá, de a una
+# (las demás hacen fila en el executor), sin bloquear el event loop
+_esperas_semaforo = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai-semaforo")
+# Un AsyncClient queda atado al loop donde abrió sus conexiones: uno por loop
+_clientes_async: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_clientes_lock = threading.Lock()
+
+_api_key_cacheada: Optional[tuple[str | None, str | None, float]] = None
+_api_key_lock = threading.Lock()
+
 
 class AIConfigError(RuntimeError):
     pass
 
 
+def activar_cache(
+    ttl_horas: float = AI_CACHE_TTL_HORAS,
+    max_entradas: int = AI_CACHE_MAX_ENTRADAS,
+    ruta: Optional[str] = AI_CACHE_PATH or None,
+) -> CacheRespuestasIA:
+    """Activa la caché de respuestas para todas las llamadas del proceso."""
+    global _cache
+    _cache = CacheRespuestasIA(ttl_horas, max_entradas, ruta)
+    logger.info("[AI] Caché de respuestas activa (%s)", ruta or "en memoria")
+    return _cache
+
+
+def desactivar_cache() -> None:
+    global _cache
+    _cache = None
+
+
+def obtener_cache() -> Optional[CacheRespuestasIA]:
+    return _cache
+
+
+if AI_CACHE_ENABLED:
+    activar_cache()
+
+
 def get_deepseek_api_key(db: Optional[Session] = None) -> tuple[str | None, str | None]:
+    """(api_key, origen "env"|"db"). La de la base se cachea AI_KEY_CACHE_SEGUNDOS."""
+    global _api_key_cacheada
     if DEEPSEEK_API_KEY:
         return DEEPSEEK_API_KEY, "env"
-    if db is not None:
-        db_config = get_configuracion_ai(db)
-        if db_config and db_config.api_key:
-            return db_config.api_key, "db"
-    return None, None
+    with _api_key_lock:
+        if _api_key_cacheada is not None and time.monotonic() < _api_key_cacheada[2]:
+            return _api_key_cacheada[0], _api_key_cacheada[1]
+    if db is None:
+        return None, None
+    db_config = get_configuracion_ai(db)
+    api_key, source = (db_config.api_key, "db") if db_config and db_config.api_key else (None, None)
+    with _api_key_lock:
+        _api_key_cacheada = (api_key, source, time.monotonic() + AI_KEY_CACHE_SEGUNDOS)
+    return api_key, source
 
 
-def deepseek_chat(
+def invalidar_api_key() -> None:
+    """Olvida la key cacheada (al crear, editar o borrar la configuración de IA)."""
+    global _api_key_cacheada
+    with _api_key_lock:
+        _api_key_cacheada = None
+
+
+def _sesion() -> requests.Session:
+    """Session del thread actual con pool de conexiones a la API."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=AI_MAX_CONCURRENCIA)
+        session = _local.session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+    return session
+
+
+def _cliente() -> "httpx.AsyncClient":
+    """AsyncClient del event loop en curso."""
+    loop = asyncio.get_running_loop()
+    with _clientes_lock:
+        cliente = _clientes_async.get(loop)
+        if cliente is None:
+            cliente = _clientes_async[loop] = httpx.AsyncClient(
+                timeout=AI_TIMEOUT,
+                limits=httpx.Limits(max_connections=AI_MAX_CONCURRENCIA, max_keepalive_connections=AI_MAX_CONCURRENCIA),
+            )
+    return cliente
+
+
+@asynccontextmanager
+async def _semaforo_async():
+    """
+    Toma el mismo semáforo que las llamadas sincrónicas sin bloquear el loop.
+    Si se cancela la espera, el lugar se libera apenas el thread lo obtiene.
+    """
+    if not _semaforo.acquire(blocking=False):
+        espera = asyncio.get_running_loop().run_in_executor(_esperas_semaforo, _semaforo.acquire)
+        try:
+            await asyncio.shield(espera)
+        except asyncio.CancelledError:
+            espera.add_done_callback(lambda f: f.cancelled() or f.exception() or _semaforo.release())
+            raise
+    try:
+        yield
+    finally:
+        _semaforo.release()
+
+
+async def cerrar_clientes() -> None:
+    """Cierra el cliente async del event loop en curso (al apagar la app)."""
+    with _clientes_lock:
+        cliente = _clientes_async.pop(asyncio.get_running_loop(), None)
+    if cliente is not None:
+        await cliente.aclose()
+
+
+def _pedido(
     messages: list[dict],
-    db: Optional[Session] = None,
-    temperature: float = 0.2,
-    max_tokens: int = 700,
-) -> str:
-    api_key, _source = get_deepseek_api_key(db)
+    db: Optional[Session],
+    temperature: float,
+    max_tokens: int,
+    api_key: Optional[str],
+    stream: bool = False,
+) -> tuple[dict, dict]:
+    """(payload, headers) del pedido; lanza AIConfigError si no hay API key."""
+    if not api_key:
+        api_key, _source = get_deepseek_api_key(db)
     if not api_key:
         raise AIConfigError("DeepSeek API key no configurada")
 
@@ -38,18 +172,22 @@ def deepseek_chat(
         "temperature": temperature,
         "max_tokens": max_tokens,
     }
+    if stream:
+        payload["stream"] = True
 
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
     }
+    return payload, headers
+
 
-    response = requests.post(DEEPSEEK_BASE_URL, json=payload, headers=headers, timeout=30)
-    if response.status_code >= 400:
-        logger.error("DeepSeek error %s: %s", response.status_code, response.text[:500])
+def _contenido(status_code: int, texto: str, data_json) -> tuple[str, dict]:
+    if status_code >= 400:
+        logger.error("DeepSeek error %s: %s", status_code, texto[:500])
         raise AIConfigError("Error al consultar DeepSeek")
 
-    data = response.json()
+    data = data_json()
     choices = data.get("choices") or []
     if not choices:
         raise AIConfigError("Respuesta vacia de DeepSeek")
@@ -59,4 +197,144 @@ def deepseek_chat(
     if not content:
         raise AIConfigError("Respuesta sin contenido de DeepSeek")
 
+    return content, data.get("usage") or {}
+
+
+def _desde_cache(cache: Optional[CacheRespuestasIA], clave: Optional[str]) -> Optional[tuple[str, dict]]:
+    if cache is None:
+        return None
+    cacheada = cache.leer(clave)
+    if cacheada is None:
+        return None
+    return cacheada[0], {"total_tokens": 0, "cache": True}
+
+
+def deepseek_chat_con_uso(
+    messages: list[dict],
+    db: Optional[Session] = None,
+    temperature: float = 0.2,
+    max_tokens: int = 700,
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = None,
+    timeout: float = AI_TIMEOUT,
+    usar_cache: bool = True,
+) -> tuple[str, dict]:
+    """
+    Igual que deepseek_chat pero retorna también el `usage` de la respuesta
+    ({prompt_tokens, completion_tokens, total_tokens}; vacío si no viene).
+    Con `api_key` no se consulta la base (para usar desde threads sin Session).
+    `base_url` reemplaza DEEPSEEK_BASE_URL, p. ej. para apuntar a un servidor
+    falso compatible con chat completions.
+    Con la caché activa, un pedido repetido no llama a la API y su usage es
+    {"total_tokens": 0, "cache": True}.
+    """
+    cache = _cache if usar_cache else None
+    url = base_url or DEEPSEEK_BASE_URL
+    clave = clave_respuesta(url, DEEPSEEK_MODEL, messages, temperature, max_tokens) if cache else None
+    cacheada = _desde_cache(cache, clave)
+    if cacheada is not None:
+        return cacheada
+
+    payload, headers = _pedido(messages, db, temperature, max_tokens, api_key)
+    with _semaforo:
+        response = _sesion().post(url, json=payload, headers=headers, timeout=timeout)
+    content, usage = _contenido(response.status_code, response.text, response.json)
+
+    if cache is not None:
+        cache.guardar(clave, content, usage)
+    return content, usage
+
+
+def deepseek_chat(
+    messages: list[dict],
+    db: Optional[Session] = None,
+    temperature: float = 0.2,
+    max_tokens: int = 700,
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = None,
+    usar_cache: bool = True,
+) -> str:
+    content, _usage = deepseek_chat_con_uso(
+        messages, db, temperature, max_tokens, api_key=api_key, base_url=base_url, usar_cache=usar_cache,
+    )
     return content
+
+
+async def deepseek_chat_async(
+    messages: list[dict],
+    temperature: float = 0.2,
+    max_tokens: int = 700,
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = None,
+    usar_cache: bool = True,
+) -> str:
+    """
+    deepseek_chat para handlers async: no bloquea el event loop ni ocupa un
+    thread del pool mientras espera al modelo. Sin `api_key` usa la cacheada
+    (o la del entorno); no recibe Session para no consultar la base desde el loop.
+    """
+    cache = _cache if usar_cache else None
+    url = base_url or DEEPSEEK_BASE_URL
+    clave = clave_respuesta(url, DEEPSEEK_MODEL, messages, temperature, max_tokens) if cache else None
+    cacheada = _desde_cache(cache, clave)
+    if cacheada is not None:
+        return cacheada[0]
+
+    payload, headers = _pedido(messages, None, temperature, max_tokens, api_key)
+    async with _semaforo_async():
+        response = await _cliente().post(url, json=payload, headers=headers)
+    content, usage = _contenido(response.status_code, response.text, response.json)
+
+    if cache is not None:
+        cache.guardar(clave, content, usage)
+    return content
+
+
+async def deepseek_chat_stream(
+    messages: list[dict],
+    temperature: float = 0.2,
+    max_tokens: int = 700,
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = None,
+    usar_cache: bool = True,
+) -> AsyncIterator[str]:
+    """
+    Fragmentos de la respuesta a medida que el modelo los genera. Una respuesta
+    cacheada sale en un solo fragmento; la completa se guarda en
+    la caché al terminar.
+    """
+    cache = _cache if usar_cache else None
+    url = base_url or DEEPSEEK_BASE_URL
+    clave = clave_respuesta(url, DEEPSEEK_MODEL, messages, temperature, max_tokens) if cache else None
+    cacheada = _desde_cache(cache, clave)
+    if cacheada is not None:
+        yield cacheada[0]
+        return
+
+    payload, headers = _pedido(messages, None, temperature, max_tokens, api_key, stream=True)
+    partes = []
+    async with _semaforo_async():
+        async with _cliente().stream("POST", url, json=payload, headers=headers) as response:
+            if response.status_code >= 400:
+                texto = (await response.aread()).decode(errors="replace")
+                logger.error("DeepSeek error %s: %s", response.status_code, texto[:500])
+                raise AIConfigError("Error al consultar DeepSeek")
+            async for linea in response.aiter_lines():
+                if not linea.startswith("data:"):
+                    continue
+                datos = linea[len("data:"):].strip()
+                if datos == "[DONE]":
+                    break
+                try:
+                    choices = json.loads(datos).get("choices") or []
+                except json.JSONDecodeError:
+                    continue
+                fragmento = (choices[0].get("delta") or {}).get("content") if choices else None
+                if fragmento:
+                    partes.append(fragmento)
+                    yield fragmento
+
+    if not partes:
+        raise AIConfigError("Respuesta sin contenido de DeepSeek")
+    if cache is not None:
+        cache.guardar(clave, "".join(partes), {})
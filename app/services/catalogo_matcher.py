@@ -0,0 +1,208 @@
+"""
+Matcher de marcas/modelos contra el catálogo interno.
+Se construye una vez por corrida a partir de MARCA_ALIASES y las tablas
+`marcas`/`modelos`, y resuelve textos crudos ("VW Gol Trend 1.6") a ids.
+
+Usa un trie de tokens con semántica "gana el match más largo", así el
+resultado es determinístico e independiente del orden de iteración.
+Lo usa el normalizador (vía CacheMatcheo): los scrapers y el importador Excel
+guardan el texto crudo y el matcheo ocurre recién al normalizar.
+"""
+import re
+from typing import Iterable, Optional
+
+MARCA_ALIASES = {
+    "vw": "Volkswagen", "volkswagen": "Volkswagen",
+    "chevy": "Chevrolet", "chevrolet": "Chevrolet",
+    "mercedes benz": "Mercedes-Benz", "mercedes": "Mercedes-Benz", "mb": "Mercedes-Benz",
+    "bmw": "BMW", "ford": "Ford", "toyota": "Toyota", "fiat": "Fiat",
+    "renault": "Renault", "peugeot": "Peugeot",
+    "citroen": "Citroën", "citroën": "Citroën",
+    "nissan": "Nissan", "honda": "Honda", "hyundai": "Hyundai", "kia": "Kia",
+    "jeep": "Jeep", "audi": "Audi", "dodge": "Dodge", "ram": "RAM",
+    "chery": "Chery", "suzuki": "Suzuki", "mitsubishi": "Mitsubishi",
+    "subaru": "Subaru", "mazda": "Mazda", "volvo": "Volvo",
+    "land rover": "Land Rover", "landrover": "Land Rover",
+    "porsche": "Porsche", "ds": "DS",
+    "alfa romeo": "Alfa Romeo", "alfaromeo": "Alfa Romeo",
+    "mini": "MINI", "lexus": "Lexus", "jaguar": "Jaguar",
+    "ds automobiles": "DS", "dfsk": "DFSK", "geely": "Geely",
+    "haval": "Haval", "jac": "JAC", "byd": "BYD",
+    "gac": "GAC", "changan": "Changan", "great wall": "Great Wall",
+    "rover": "Land Rover", "seat": "SEAT", "smart": "Smart",
+    "ssangyong": "SsangYong", "tata": "Tata",
+}
+
+_TOKEN_RE = re.compile(r"\w+")
+# En ASCII, \w es [A-Za-z0-9_]: el resto pasa a espacio y alcanza con split (en C)
+_SEPARADORES_ASCII = str.maketrans({
+    chr(c): " " for c in range(128) if not (chr(c).isalnum() or chr(c) == "_")
+})
+
+
+def _tokens(texto: str) -> tuple[str, ...]:
+    """Tokens de un texto ya en minúsculas."""
+    if texto.isascii():
+        return tuple(texto.translate(_SEPARADORES_ASCII).split())
+    return tuple(_TOKEN_RE.findall(texto))
+
+
+def tokenizar(texto: str) -> tuple[str, ...]:
+    """'Mercedes-Benz Clase A' -> ('mercedes', 'benz', 'clase', 'a')."""
+    return _tokens(texto.lower()) if texto else ()
+
+
+class _NodoTrie:
+    __slots__ = ("hijos", "valor", "mejor_debajo")
+
+    def __init__(self):
+        self.hijos: dict[str, "_NodoTrie"] = {}
+        # valor / mejor_debajo: (prioridad, cantidad_tokens, nombre, id)
+        self.valor: Optional[tuple] = None
+        self.mejor_debajo: Optional[tuple] = None
+
+
+class TrieTokens:
+    """
+    Trie sobre secuencias de tokens.
+    - `mas_largo`: la entrada más larga contenida en el texto (tokens contiguos).
+    - `por_prefijo`: la entrada más corta que empieza con los tokens dados.
+    Los empates se resuelven por prioridad, largo, nombre e id.
+    """
+
+    def __init__(self):
+        self.raiz = _NodoTrie()
+
+    def insertar(self, tokens: tuple[str, ...], entidad_id: int, nombre: str, prioridad: int = 0) -> None:
+        if not tokens:
+            return
+        clave = (prioridad, len(tokens), nombre.lower(), entidad_id)
+        nodo = self.raiz
+        camino = [nodo]
+        for tok in tokens:
+            nodo = nodo.hijos.setdefault(tok, _NodoTrie())
+            camino.append(nodo)
+        if nodo.valor is None or clave < nodo.valor:
+            nodo.valor = clave
+        for n in camino:
+            if n.mejor_debajo is None or clave < n.mejor_debajo:
+                n.mejor_debajo = clave
+
+    def exacto(self, tokens: tuple[str, ...]) -> Optional[int]:
+        nodo = self._bajar(tokens)
+        return nodo.valor[3] if nodo and nodo.valor else None
+
+    def mas_largo(self, tokens: tuple[str, ...]) -> Optional[int]:
+        # Se recorre por inicio creciente: a igual largo gana el primero,
+        # así que solo un match estrictamente más largo reemplaza al mejor.
+        n = len(tokens)
+        hijos_raiz = self.raiz.hijos
+        mejor, mejor_largo = None, 0
+        for inicio in range(n):
+            if n - inicio <= mejor_largo:
+                break
+            nodo = hijos_raiz.get(tokens[inicio])
+            fin = inicio + 1
+            while nodo is not None:
+                if nodo.valor is not None and fin - inicio > mejor_largo:
+                    mejor, mejor_largo = nodo.valor, fin - inicio
+                if fin == n:
+                    break
+                nodo = nodo.hijos.get(tokens[fin])
+                fin += 1
+        return mejor[3] if mejor else None
+
+    def por_prefijo(self, tokens: tuple[str, ...]) -> Optional[int]:
+        nodo = self._bajar(tokens)
+        return nodo.mejor_debajo[3] if nodo and nodo.mejor_debajo else None
+
+    def _bajar(self, tokens: tuple[str, ...]) -> Optional[_NodoTrie]:
+        if not tokens:
+            return None
+        nodo = self.raiz
+        for tok in tokens:
+            nodo = nodo.hijos.get(tok)
+            if nodo is None:
+                return None
+        return nodo
+
+
+class CatalogoMatcher:
+    """
+    Resuelve marca/modelo crudos a ids del catálogo.
+    Orden de búsqueda: nombre exacto (vía alias) → entrada más larga contenida
+    en el texto → entrada más corta que empieza con el texto.
+    """
+
+    def __init__(
+        self,
+        marcas: Iterable[tuple[int, str]],
+        modelos: Iterable[tuple[int, int, str]],
+        aliases: Optional[dict[str, str]] = None,
+    ):
+        aliases = MARCA_ALIASES if aliases is None else aliases
+        self._marcas = TrieTokens()
+        self._modelos: dict[int, TrieTokens] = {}
+        # Atajos para el caso más común: el texto crudo es exactamente un nombre/alias
+        self._marcas_exactas: dict[str, int] = {}
+        self._modelos_exactos: dict[tuple[int, str], int] = {}
+
+        ids_por_nombre: dict[str, int] = {}
+        for marca_id, nombre in sorted(marcas, key=lambda m: m[0]):
+            if not nombre:
+                continue
+            self._marcas.insertar(tokenizar(nombre), marca_id, nombre)
+            ids_por_nombre.setdefault(nombre.lower(), marca_id)
+        self._marcas_exactas.update(ids_por_nombre)
+
+        # Los alias apuntan a la marca oficial si existe en el catálogo
+        for alias, oficial in aliases.items():
+            marca_id = ids_por_nombre.get(oficial.lower())
+            if marca_id is not None:
+                self._marcas.insertar(tokenizar(alias), marca_id, oficial, prioridad=1)
+                self._marcas_exactas.setdefault(alias, marca_id)
+
+        for modelo_id, marca_id, nombre in sorted(modelos, key=lambda m: m[0]):
+            if not nombre:
+                continue
+            self._modelos.setdefault(marca_id, TrieTokens()).insertar(tokenizar(nombre), modelo_id, nombre)
+            self._modelos_exactos.setdefault((marca_id, nombre.lower()), modelo_id)
+
+    def buscar_marca(self, marca_raw: str) -> Optional[int]:
+        if not marca_raw:
+            return None
+        texto = marca_raw.strip().lower()
+        exacto = self._marcas_exactas.get(texto)
+        if exacto:
+            return exacto
+        tokens = _tokens(texto)
+        if not tokens:
+            return None
+        return (
+            self._marcas.exacto(tokens)
+            or self._marcas.mas_largo(tokens)
+            or self._marcas.por_prefijo(tokens)
+        )
+
+    def buscar_modelo(self, modelo_raw: str, marca_id: int) -> Optional[int]:
+        if not modelo_raw:
+            return None
+        texto = modelo_raw.strip().lower()
+        exacto = self._modelos_exactos.get((marca_id, texto))
+        if exacto:
+            return exacto
+        trie = self._modelos.get(marca_id)
+        if trie is None:
+            return None
+        tokens = _tokens(texto)
+        if not tokens:
+            return None
+        # mas_largo ya cubre el match exacto por tokens (es el más largo posible)
+        return trie.mas_largo(tokens) or trie.por_prefijo(tokens)
+
+    def resolver(self, marca_raw: str, modelo_raw: str) -> tuple[Optional[int], Optional[int]]:
+        """Retorna (marca_id, modelo_id); cualquiera puede ser None si no hay match."""
+        marca_id = self.buscar_marca(marca_raw)
+        if not marca_id:
+            return None, None
+        return marca_id, self.buscar_modelo(modelo_raw or "", marca_id)
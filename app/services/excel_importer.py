@@ -5,15 +5,32 @@ Permite cargar datos manualmente cuando el scraping no está disponible.
 Soporta dos formatos de hoja:
   - "Datos de Mercado": listings individuales (como MercadoLibre/Kavak/deRuedas)
   - "Precios de Referencia": rangos de precios por marca/modelo/año/versión
+
+El archivo se lee desde disco (el endpoint lo vuelca a un temporal por partes)
+y, si tiene varias hojas, cada una se parsea en un proceso aparte (hasta
+EXCEL_MAX_WORKERS y no más que las CPUs): openpyxl es Python puro y con threads
+no habría paralelismo. Los procesos mandan las filas en tandas de TANDA_FILAS
+por una cola acotada y el proceso principal las escribe a medida que llegan,
+en lotes con SinkRawListings (INSERT ... ON CONFLICT DO NOTHING), así que la
+memoria no crece con el tamaño de la hoja y no hace falta cargar antes las
+URLs ya importadas. Con una sola hoja (o una sola CPU) se parsea y escribe en
+streaming, sin pool. El progreso se loguea en filas por segundo.
 """
 import logging
+import multiprocessing
+import os
+import queue
 import re
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import Optional, BinaryIO
-from io import BytesIO
+from typing import Iterable, Iterator, Optional
 from openpyxl import load_workbook
 from sqlalchemy.orm import Session
+from app.config import EXCEL_MAX_WORKERS
 from app.models.pricing import MarketRawListing
+from app.services.raw_listing_sink import CAMPOS, SinkRawListings
 
 logger = logging.getLogger(__name__)
 
@@ -229,24 +246,239 @@ def _process_referencia_row(row_data: dict, row_num: int) -> Optional[dict]:
     }
 
 
+# Cada cuántas filas escritas se loguea el progreso
+PROGRESO_CADA = 10_000
+# Filas por mensaje de un proceso del pool al principal; la cola admite dos
+# tandas por proceso, así que ese es el máximo de filas parseadas sin escribir
+TANDA_FILAS = 2_000
+
+# Cola hacia el proceso principal (en los procesos del pool, ver _iniciar_worker)
+_cola = None
+
+
+def _nueva_hoja(nombre: str) -> dict:
+    return {"nombre": nombre, "tipo": None, "omitida": False, "filas_sin_datos": 0, "errores": 0, "detalle": None}
+
+
+def _iterar_hoja(ws, hoja: dict) -> Iterator[dict]:
+    """
+    Filas procesadas de la hoja (fuente + campos del sink). Completa en `hoja`
+    el tipo, las filas sin datos, los errores y si se omitió.
+    """
+    sheet_name = hoja["nombre"]
+    rows_iter = ws.iter_rows(values_only=True)
+    try:
+        header_row = next(rows_iter)
+    except StopIteration:
+        logger.warning(f"Hoja '{sheet_name}' vacía")
+        hoja["omitida"] = True
+        return
+
+    headers = [str(h).strip() if h else "" for h in header_row]
+    sheet_type = _detect_sheet_type(headers)
+
+    if sheet_type == "referencia":
+        column_map = COLUMN_MAP_REFERENCIA
+        process_fn = _process_referencia_row
+    else:
+        column_map = COLUMN_MAP_MERCADO
+        process_fn = _process_mercado_row
+
+    header_mapping = _map_headers(headers, column_map)
+    hoja["tipo"] = sheet_type
+
+    if not header_mapping:
+        logger.warning(f"Hoja '{sheet_name}': no se pudieron mapear columnas")
+        hoja["omitida"] = True
+        hoja["detalle"] = f"Hoja '{sheet_name}': columnas no reconocidas"
+        return
+
+    logger.info(f"Hoja '{sheet_name}': tipo={sheet_type}, columnas mapeadas={list(header_mapping.values())}")
+
+    for row_num, row in enumerate(rows_iter, start=2):
+        try:
+            # Construir dict de la fila
+            row_data = {}
+            for col_idx, field_name in header_mapping.items():
+                if col_idx < len(row):
+                    row_data[field_name] = row[col_idx]
+
+            # Procesar fila
+            result = process_fn(row_data, row_num)
+        except Exception as e:
+            logger.error(f"Hoja '{sheet_name}', fila {row_num}: {e}")
+            hoja["errores"] += 1
+            continue
+        if result is None:
+            hoja["filas_sin_datos"] += 1
+            continue
+        yield {campo: result[campo] for campo in ("fuente", *CAMPOS)}
+
+
+def _iniciar_worker(cola) -> None:
+    global _cola
+    _cola = cola
+
+
+def _leer_hoja(ruta: str, sheet_name: str) -> None:
+    """
+    Parsea una hoja en un proceso del pool y manda por la cola
+    ("filas", hoja, tanda) cada TANDA_FILAS filas y al final ("fin", hoja, stats
+    de la hoja). Un error de lectura se cuenta en la hoja y también termina con "fin".
+    """
+    hoja = _nueva_hoja(sheet_name)
+    try:
+        wb = load_workbook(ruta, read_only=True, data_only=True)
+        try:
+            tanda = []
+            for fila in _iterar_hoja(wb[sheet_name], hoja):
+                tanda.append(fila)
+                if len(tanda) >= TANDA_FILAS:
+                    _cola.put(("filas", sheet_name, tanda))
+                    tanda = []
+            if tanda:
+                _cola.put(("filas", sheet_name, tanda))
+        finally:
+            wb.close()
+    except Exception as e:
+        logger.error(f"Hoja '{sheet_name}': {e}")
+        hoja["errores"] += 1
+        hoja["detalle"] = f"Hoja '{sheet_name}': {str(e)}"
+    _cola.put(("fin", sheet_name, hoja))
+
+
+class _Progreso:
+    """Cuenta las filas escritas y loguea filas/s cada PROGRESO_CADA."""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.filas = 0
+        self.inicio = time.perf_counter()
+
+    def sumar(self) -> None:
+        self.filas += 1
+        if self.filas % PROGRESO_CADA == 0:
+            logger.info(f"[ExcelImport] '{self.filename}': {self.filas} filas, {self.filas_por_segundo()} filas/s")
+
+    def segundos(self) -> float:
+        return time.perf_counter() - self.inicio
+
+    def filas_por_segundo(self) -> Optional[float]:
+        duracion = self.segundos()
+        return round(self.filas / duracion, 1) if duracion > 0 else None
+
+
+class _EscrituraHoja:
+    """
+    Escribe las filas de una hoja a medida que llegan (un sink por fuente).
+    Los sinks no marcan vistas ni registran cambios de precio: un import no es
+    una observación del mercado.
+    """
+
+    def __init__(self, db: Session, progreso: _Progreso):
+        self.db = db
+        self.progreso = progreso
+        self.stats = {"nuevos": 0, "duplicados": 0, "errores": 0}
+        self._sinks: dict[str, SinkRawListings] = {}
+
+    def agregar(self, filas: Iterable[dict]) -> None:
+        for fila in filas:
+            fuente = fila.pop("fuente")
+            sink = self._sinks.get(fuente)
+            if sink is None:
+                sink = self._sinks[fuente] = SinkRawListings(
+                    self.db, fuente, self.stats, marcar_vistas=False, registrar_cambios=False,
+                )
+            sink.agregar(**fila)
+            self.progreso.sumar()
+
+    def cerrar(self, hoja: dict) -> dict:
+        """Escribe lo pendiente y retorna las stats de la hoja."""
+        for sink in self._sinks.values():
+            sink.cerrar()
+        self.stats["errores"] += hoja["errores"]
+        logger.info(f"Hoja '{hoja['nombre']}': {self.stats}")
+        return self.stats
+
+
+def _escribir_hoja(db: Session, hoja: dict, filas: Iterable[dict], progreso: _Progreso) -> dict:
+    """Escribe las filas de una hoja y retorna sus stats."""
+    escritura = _EscrituraHoja(db, progreso)
+    escritura.agregar(filas)
+    return escritura.cerrar(hoja)
+
+
+def _escribir_desde_pool(db: Session, ruta: str, hojas: list[str], workers: int, progreso: _Progreso) -> dict:
+    """Parsea las hojas en `workers` procesos y escribe sus tandas a medida que llegan."""
+    resultados: dict[str, tuple[dict, dict]] = {}
+    escrituras: dict[str, _EscrituraHoja] = {}
+
+    def _escritura(sheet_name: str) -> _EscrituraHoja:
+        if sheet_name not in escrituras:
+            logger.info(f"Procesando hoja: '{sheet_name}'")
+            escrituras[sheet_name] = _EscrituraHoja(db, progreso)
+        return escrituras[sheet_name]
+
+    # spawn: los hijos no heredan threads ni conexiones de la base del proceso
+    contexto = multiprocessing.get_context("spawn")
+    cola = contexto.Queue(maxsize=2 * workers)
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=contexto, initializer=_iniciar_worker, initargs=(cola,),
+    ) as pool:
+        futuros = {sheet_name: pool.submit(_leer_hoja, ruta, sheet_name) for sheet_name in hojas}
+        while len(resultados) < len(hojas):
+            try:
+                tipo, sheet_name, datos = cola.get(timeout=1)
+            except queue.Empty:
+                # Un proceso que murió no llega a mandar el "fin" de su hoja
+                for sheet_name, futuro in futuros.items():
+                    if sheet_name not in resultados and futuro.done() and futuro.exception() is not None:
+                        logger.error(f"Hoja '{sheet_name}': {futuro.exception()}")
+                        hoja = _nueva_hoja(sheet_name)
+                        hoja["errores"] += 1
+                        hoja["detalle"] = f"Hoja '{sheet_name}': {str(futuro.exception())}"
+                        resultados[sheet_name] = (hoja, _escritura(sheet_name).cerrar(hoja))
+                continue
+            if sheet_name in resultados:
+                continue
+            if tipo == "filas":
+                _escritura(sheet_name).agregar(datos)
+            else:
+                resultados[sheet_name] = (datos, _escritura(sheet_name).cerrar(datos))
+    return resultados
+
+
 def importar_excel(
     db: Session,
-    file_content: bytes,
+    file_content: Optional[bytes] = None,
     filename: str = "upload.xlsx",
     sobrescribir: bool = False,
+    ruta: Optional[str] = None,
+    max_workers: int = EXCEL_MAX_WORKERS,
 ) -> dict:
     """
     Importa datos de mercado desde un archivo Excel.
 
     Args:
         db: Sesión de base de datos
-        file_content: Contenido binario del archivo Excel
+        file_content: Contenido binario del archivo Excel (si no se pasa `ruta`)
         filename: Nombre del archivo (para logging)
         sobrescribir: Si True, elimina datos previos de fuente 'excel*' antes de importar
+        ruta: Archivo .xlsx en disco; evita tener el archivo entero en memoria
+        max_workers: Procesos para parsear hojas en paralelo (1 = todo en este proceso)
 
     Returns:
-        dict con stats: {importados, duplicados, errores, hojas_procesadas, detalles}
+        dict con stats: {importados, duplicados, errores, filas_sin_datos,
+        hojas_procesadas, detalles, filas_por_segundo}
     """
+    if ruta is None:
+        with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as tmp:
+            tmp.write(file_content)
+        try:
+            return importar_excel(db, filename=filename, sobrescribir=sobrescribir, ruta=tmp.name, max_workers=max_workers)
+        finally:
+            os.unlink(tmp.name)
+
     stats = {
         "importados": 0,
         "duplicados": 0,
@@ -254,10 +486,11 @@ def importar_excel(
         "filas_sin_datos": 0,
         "hojas_procesadas": [],
         "detalles": [],
+        "filas_por_segundo": None,
     }
 
     try:
-        wb = load_workbook(BytesIO(file_content), read_only=True, data_only=True)
+        wb = load_workbook(ruta, read_only=True, data_only=True)
     except Exception as e:
         logger.error(f"Error abriendo Excel '{filename}': {e}")
         stats["errores"] += 1
@@ -273,100 +506,55 @@ def importar_excel(
         logger.info(f"Eliminados {deleted} registros previos de importación Excel")
         stats["detalles"].append(f"Eliminados {deleted} registros previos")
 
-    # Cargar URLs existentes para deduplicación
-    existing_urls = set(
-        u for (u,) in db.query(MarketRawListing.url).filter(
-            MarketRawListing.fuente.like("excel%")
-        ).all()
-    )
-
+    hojas = []
     for sheet_name in wb.sheetnames:
-        ws = wb[sheet_name]
-        logger.info(f"Procesando hoja: '{sheet_name}'")
-
         # Saltar hoja de instrucciones
         if "instruc" in sheet_name.lower():
             logger.info(f"Saltando hoja de instrucciones: '{sheet_name}'")
             continue
+        hojas.append(sheet_name)
 
-        # Leer headers (primera fila)
-        rows_iter = ws.iter_rows(values_only=True)
-        try:
-            header_row = next(rows_iter)
-        except StopIteration:
-            logger.warning(f"Hoja '{sheet_name}' vacía")
-            continue
-
-        headers = [str(h).strip() if h else "" for h in header_row]
-        sheet_type = _detect_sheet_type(headers)
-
-        if sheet_type == "referencia":
-            column_map = COLUMN_MAP_REFERENCIA
-            process_fn = _process_referencia_row
+    # Más procesos que CPUs solo compiten entre sí y suman el costo de pasar las filas
+    workers = min(max_workers, len(hojas), os.cpu_count() or 1)
+    progreso = _Progreso(filename)
+    resultados: dict[str, tuple[dict, dict]] = {}
+    try:
+        if workers > 1:
+            wb.close()
+            resultados = _escribir_desde_pool(db, ruta, hojas, workers, progreso)
         else:
-            column_map = COLUMN_MAP_MERCADO
-            process_fn = _process_mercado_row
-
-        header_mapping = _map_headers(headers, column_map)
-
-        if not header_mapping:
-            logger.warning(f"Hoja '{sheet_name}': no se pudieron mapear columnas")
-            stats["detalles"].append(f"Hoja '{sheet_name}': columnas no reconocidas")
+            for sheet_name in hojas:
+                logger.info(f"Procesando hoja: '{sheet_name}'")
+                hoja = _nueva_hoja(sheet_name)
+                resultados[sheet_name] = (hoja, _escribir_hoja(db, hoja, _iterar_hoja(wb[sheet_name], hoja), progreso))
+    finally:
+        wb.close()
+
+    # En el orden del libro, no en el que terminaron los procesos
+    for sheet_name in hojas:
+        if sheet_name not in resultados:
+            continue
+        hoja, sheet_stats = resultados[sheet_name]
+        stats["filas_sin_datos"] += hoja["filas_sin_datos"]
+        if hoja["detalle"]:
+            stats["detalles"].append(hoja["detalle"])
+        if hoja["omitida"]:
             continue
 
-        logger.info(f"Hoja '{sheet_name}': tipo={sheet_type}, columnas mapeadas={list(header_mapping.values())}")
-
-        sheet_stats = {"importados": 0, "duplicados": 0, "errores": 0}
-        nuevos = []
-
-        for row_num, row in enumerate(rows_iter, start=2):
-            try:
-                # Construir dict de la fila
-                row_data = {}
-                for col_idx, field_name in header_mapping.items():
-                    if col_idx < len(row):
-                        row_data[field_name] = row[col_idx]
-
-                # Procesar fila
-                result = process_fn(row_data, row_num)
-                if result is None:
-                    stats["filas_sin_datos"] += 1
-                    continue
-
-                # Deduplicar
-                if result["url"] in existing_urls:
-                    sheet_stats["duplicados"] += 1
-                    continue
-
-                nuevos.append(MarketRawListing(**result))
-                existing_urls.add(result["url"])
-                sheet_stats["importados"] += 1
-
-            except Exception as e:
-                logger.error(f"Hoja '{sheet_name}', fila {row_num}: {e}")
-                sheet_stats["errores"] += 1
-
-        # Guardar en lotes
-        if nuevos:
-            BATCH_SIZE = 50
-            for i in range(0, len(nuevos), BATCH_SIZE):
-                batch = nuevos[i:i + BATCH_SIZE]
-                db.add_all(batch)
-                db.commit()
-
-        for k in ("importados", "duplicados", "errores"):
-            stats[k] += sheet_stats[k]
-
+        stats["importados"] += sheet_stats["nuevos"]
+        stats["duplicados"] += sheet_stats["duplicados"]
+        stats["errores"] += sheet_stats["errores"]
         stats["hojas_procesadas"].append({
             "nombre": sheet_name,
-            "tipo": sheet_type,
-            "importados": sheet_stats["importados"],
+            "tipo": hoja["tipo"],
+            "importados": sheet_stats["nuevos"],
             "duplicados": sheet_stats["duplicados"],
             "errores": sheet_stats["errores"],
         })
 
-        logger.info(f"Hoja '{sheet_name}': {sheet_stats}")
-
-    wb.close()
-    logger.info(f"Importación Excel completada: {stats}")
+    stats["filas_por_segundo"] = progreso.filas_por_segundo()
+    logger.info(
+        f"Importación Excel completada: {progreso.filas} filas en {progreso.segundos():.1f}s "
+        f"({stats['filas_por_segundo']} filas/s): {stats}"
+    )
     return stats
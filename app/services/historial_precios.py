@@ -0,0 +1,155 @@
+"""
+Historial de precios de los listings de mercado.
+`market_price_history` guarda solo los cambios (estilo run-length): cuando un
+scraper vuelve a ver una URL con otro precio, SinkRawListings registra el
+cambio en lote y actualiza el precio del raw listing, contra el que se compara
+la próxima vez. El primer cambio de un listing agrega también su precio
+original, así la serie queda completa sin escribir nada para los que no cambian.
+
+Series:
+- `historial_listing`: los puntos (fecha, precio) de un market listing.
+- `serie_semanal`: precio por semana para marca/modelo. Cada listing aporta a
+  las semanas en que estuvo publicado (de fecha_scraping a fecha_ultima_vista)
+  con el precio vigente en cada una.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import bindparam, func, insert, select, text, update
+from sqlalchemy.orm import Session
+from app.models.pricing import MarketListing, MarketPriceHistory, MarketRawListing
+from app.services.pricing_engine import _trimmed_mean
+
+logger = logging.getLogger(__name__)
+
+
+def registrar_cambios(db: Session, cambios: list[dict]) -> None:
+    """
+    Escribe en lote los cambios de precio detectados por el sink.
+    Cada cambio: {raw_listing_id, precio_anterior, moneda_anterior, fecha_anterior,
+    precio, moneda, fecha}. No commitea (lo hace el sink con su lote).
+    """
+    if not cambios:
+        return
+    ids = [c["raw_listing_id"] for c in cambios]
+    con_historial = set(db.execute(
+        text("SELECT DISTINCT raw_listing_id FROM market_price_history WHERE raw_listing_id IN :ids")
+        .bindparams(bindparam("ids", expanding=True)),
+        {"ids": ids},
+    ).scalars())
+
+    filas = []
+    for c in cambios:
+        if c["raw_listing_id"] not in con_historial:
+            filas.append({
+                "raw_listing_id": c["raw_listing_id"],
+                "fecha": c["fecha_anterior"] or c["fecha"],
+                "precio": c["precio_anterior"],
+                "moneda": c["moneda_anterior"],
+            })
+        filas.append({
+            "raw_listing_id": c["raw_listing_id"],
+            "fecha": c["fecha"],
+            "precio": c["precio"],
+            "moneda": c["moneda"],
+        })
+    db.execute(insert(MarketPriceHistory), filas)
+    # UPDATE por primary key en lote (executemany)
+    db.execute(
+        update(MarketRawListing),
+        [{"id": c["raw_listing_id"], "precio": c["precio"], "moneda": c["moneda"]} for c in cambios],
+    )
+
+
+def historial_listing(db: Session, listing_id: int) -> Optional[list[dict]]:
+    """Puntos {fecha, precio, moneda} de un market listing (None si no existe)."""
+    listing = db.get(MarketListing, listing_id)
+    if listing is None:
+        return None
+    puntos = []
+    if listing.raw_listing_id is not None:
+        puntos = [
+            {"fecha": h.fecha, "precio": h.precio, "moneda": h.moneda}
+            for h in db.query(MarketPriceHistory)
+            .filter(MarketPriceHistory.raw_listing_id == listing.raw_listing_id)
+            .order_by(MarketPriceHistory.fecha, MarketPriceHistory.id)
+        ]
+    if not puntos:
+        puntos = [{"fecha": listing.fecha_scraping, "precio": listing.precio, "moneda": listing.moneda}]
+    return puntos
+
+
+def _lunes(fecha: datetime) -> datetime:
+    dia = datetime(fecha.year, fecha.month, fecha.day)
+    return dia - timedelta(days=dia.weekday())
+
+
+def serie_semanal(
+    db: Session,
+    marca_id: Optional[int] = None,
+    modelo_id: Optional[int] = None,
+    anio_min: Optional[int] = None,
+    anio_max: Optional[int] = None,
+    moneda: str = "ARS",
+    semanas: int = 26,
+) -> list[dict]:
+    """
+    Precio por semana (media recortada, igual que la serie por año) de los
+    listings de marca/modelo publicados en las últimas `semanas` semanas.
+    Incluye los ya inactivos: la serie es histórica.
+    Respuesta: list de {semana: fecha del lunes, precio_promedio, count}.
+    """
+    desde = _lunes(datetime.utcnow()) - timedelta(weeks=semanas - 1)
+    visto = func.coalesce(MarketListing.fecha_ultima_vista, MarketListing.fecha_scraping)
+    filtros = [
+        MarketListing.precio > 0,
+        MarketListing.fecha_scraping.isnot(None),
+        visto >= desde,
+        func.coalesce(MarketListing.moneda, "ARS") == moneda,
+    ]
+    if marca_id:
+        filtros.append(MarketListing.marca_id == marca_id)
+    if modelo_id:
+        filtros.append(MarketListing.modelo_id == modelo_id)
+    if anio_min is not None:
+        filtros.append(MarketListing.anio >= anio_min)
+    if anio_max is not None:
+        filtros.append(MarketListing.anio <= anio_max)
+
+    # Solo los listings que cambiaron de precio tienen filas de historial
+    cambios: dict[int, list[tuple[datetime, float]]] = {}
+    for raw_id, fecha, precio in db.execute(
+        select(MarketPriceHistory.raw_listing_id, MarketPriceHistory.fecha, MarketPriceHistory.precio)
+        .join(MarketListing, MarketListing.raw_listing_id == MarketPriceHistory.raw_listing_id)
+        .where(*filtros)
+        .order_by(MarketPriceHistory.raw_listing_id, MarketPriceHistory.fecha, MarketPriceHistory.id)
+    ):
+        cambios.setdefault(raw_id, []).append((fecha, float(precio)))
+
+    buckets: dict[datetime, list[float]] = {}
+    query = select(
+        MarketListing.raw_listing_id, MarketListing.precio, MarketListing.fecha_scraping, visto,
+    ).where(*filtros)
+    for raw_id, precio, inicio, fin in db.execute(query.execution_options(yield_per=5000)):
+        puntos = cambios.get(raw_id) or [(inicio, float(precio))]
+        semana = _lunes(max(inicio, desde))
+        ultima = _lunes(fin)
+        i = 0
+        while semana <= ultima:
+            fin_semana = semana + timedelta(weeks=1)
+            # Precio vigente al cierre de la semana
+            while i + 1 < len(puntos) and puntos[i + 1][0] < fin_semana:
+                i += 1
+            buckets.setdefault(semana, []).append(puntos[i][1])
+            semana = fin_semana
+
+    series = []
+    for semana in sorted(buckets):
+        precios = buckets[semana]
+        precio_prom = _trimmed_mean(precios, trim_count=1)
+        series.append({
+            "semana": semana.date().isoformat(),
+            "precio_promedio": round(precio_prom, 2) if precio_prom is not None else None,
+            "count": len(precios),
+        })
+    return series
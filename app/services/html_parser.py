@@ -0,0 +1,141 @@
+"""
+Capa de parseo HTML para los scrapers.
+Elige el backend más rápido disponible (lxml si está instalado, si no el
+html.parser de la stdlib; se puede forzar con HTML_PARSER) y permite declarar
+la extracción de cada fuente como un set de selectores compilados una sola vez.
+
+Los selectores simples (`tag`, `.clase`, `tag.clase`, `tag[attr]`, `tag[attr*="x"]`)
+se resuelven todos juntos en un único recorrido de los descendientes del elemento;
+el resto se compila con soupsieve. En las páginas de resultados el costo estaba en
+evaluar decenas de `select_one` por item, no en parsear el selector.
+"""
+import logging
+import os
+import re
+from typing import Optional
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.element import Tag
+
+logger = logging.getLogger(__name__)
+
+
+def _detectar_backend() -> str:
+    forzado = os.getenv("HTML_PARSER")
+    if forzado:
+        return forzado
+    try:
+        import lxml  # noqa: F401
+        return "lxml"
+    except ImportError:
+        return "html.parser"
+
+
+BACKEND = _detectar_backend()
+
+
+def parsear_html(html: str, solo: Optional[SoupStrainer] = None, backend: Optional[str] = None) -> BeautifulSoup:
+    """
+    Parsea `html` con el backend configurado.
+    `solo` (SoupStrainer) limita el árbol a los elementos que interesan; solo sirve
+    cuando la extracción no necesita subir a los padres de esos elementos.
+    """
+    return BeautifulSoup(html, backend or BACKEND, parse_only=solo)
+
+
+_SELECTOR_SIMPLE = re.compile(
+    r'^(?P<tag>[\w-]+)?(?:\.(?P<clase>[\w-]+))?(?:\[(?P<attr>[\w-]+)(?:\*="(?P<valor>[^"]*)")?\])?$'
+)
+
+
+class _Simple:
+    __slots__ = ("tag", "clase", "attr", "valor")
+
+    def __init__(self, tag, clase, attr, valor):
+        self.tag, self.clase, self.attr, self.valor = tag, clase, attr, valor
+
+    def matchea(self, el: Tag) -> bool:
+        if self.tag is not None and el.name != self.tag:
+            return False
+        if self.clase is not None and self.clase not in el.get("class", ()):
+            return False
+        if self.attr is not None:
+            valor = el.get(self.attr)
+            if valor is None or (self.valor is not None and self.valor not in valor):
+                return False
+        return True
+
+
+def _compilar(css: str):
+    m = _SELECTOR_SIMPLE.match(css.strip())
+    if m and any(m.groupdict().values()):
+        return _Simple(m["tag"], m["clase"], m["attr"], m["valor"])
+    return soupsieve.compile(css)
+
+
+class Coincidencias:
+    """Resultado de aplicar un SetSelectores a un elemento."""
+
+    def __init__(self, elemento: Tag, alternativas: dict[str, list], simples: dict[int, list[Tag]]):
+        self._elemento = elemento
+        self._alternativas = alternativas
+        self._simples = simples
+
+    def _matches(self, selector) -> list[Tag]:
+        if isinstance(selector, _Simple):
+            return self._simples[id(selector)]
+        return selector.select(self._elemento)
+
+    def todos(self, nombre: str) -> list[Tag]:
+        """Todos los elementos de la primera alternativa con resultados."""
+        for selector in self._alternativas[nombre]:
+            encontrados = self._matches(selector)
+            if encontrados:
+                return encontrados
+        return []
+
+    def uno(self, nombre: str) -> Optional[Tag]:
+        """Primer elemento de la primera alternativa que matchea."""
+        for selector in self._alternativas[nombre]:
+            if isinstance(selector, _Simple):
+                encontrados = self._simples[id(selector)]
+                if encontrados:
+                    return encontrados[0]
+            else:
+                encontrado = selector.select_one(self._elemento)
+                if encontrado is not None:
+                    return encontrado
+        return None
+
+    def texto(self, nombre: str, default: str = "") -> str:
+        encontrado = self.uno(nombre)
+        return encontrado.text.strip() if encontrado is not None else default
+
+
+class SetSelectores:
+    """
+    Selectores CSS precompilados por nombre. Cada nombre puede tener alternativas
+    en orden de preferencia (p.ej. layout viejo y nuevo de un sitio): se usa la
+    primera que matchea.
+    """
+
+    def __init__(self, selectores: dict[str, list[str]]):
+        self._alternativas = {
+            nombre: [_compilar(css) for css in alternativas]
+            for nombre, alternativas in selectores.items()
+        }
+        self._simples = [
+            s for alternativas in self._alternativas.values() for s in alternativas
+            if isinstance(s, _Simple)
+        ]
+
+    def extraer(self, elemento: Tag) -> Coincidencias:
+        """Recorre los descendientes de `elemento` una sola vez para todos los selectores simples."""
+        simples: dict[int, list[Tag]] = {id(s): [] for s in self._simples}
+        if self._simples:
+            for el in elemento.descendants:
+                if isinstance(el, Tag):
+                    for selector in self._simples:
+                        if selector.matchea(el):
+                            simples[id(selector)].append(el)
+        return Coincidencias(elemento, self._alternativas, simples)
@@ -0,0 +1,100 @@
+"""
+Reducción de páginas HTML antes de mandarlas al extractor con IA.
+Los primeros 12.000 caracteres de una página son casi siempre <head>, scripts y
+CSS: tokens pagados sin un solo listing, y los resultados reales quedan después
+del corte. Acá la página se reduce a texto plano, una línea por bloque (fila de
+tabla, item de lista, div, párrafo), y se conservan solo las líneas alrededor
+de un candidato a precio, que es donde están su título, año y km. Los tramos
+conservados se separan con una línea en blanco. Los links quedan como
+<url absoluta> para que el modelo pueda devolver la URL de cada item.
+
+Si la página no tiene ningún candidato a precio el resultado es vacío: no hay
+nada que extraer y el scraper se ahorra la llamada.
+"""
+import re
+from urllib.parse import urljoin
+from app.services.html_parser import parsear_html
+
+# Elementos que nunca contienen listings. De los formularios solo se descartan
+# los controles: hay sitios que envuelven todo el listado en un <form>
+TAGS_DESCARTABLES = (
+    "head", "script", "style", "noscript", "svg", "iframe", "template",
+    "nav", "footer", "input", "button", "select",
+)
+# Elementos que cortan línea; el resto (td, span, a...) queda en la línea de su bloque
+TAGS_BLOQUE = (
+    "tr", "li", "dt", "dd", "p", "div", "article", "section", "table", "ul", "ol",
+    "h1", "h2", "h3", "h4", "h5", "h6", "br",
+)
+# Líneas de contexto que se conservan antes y después de un candidato a precio
+VENTANA = 2
+MAX_CARACTERES_LINEA = 300
+
+RE_PRECIO = re.compile(r"(?:\$|u\$s|us\$|usd|ars)\s*\d|\b\d{1,3}(?:[.,]\d{3}){2,}\b", re.IGNORECASE)
+RE_ANIO = re.compile(r"\b(?:19[5-9]\d|20[0-4]\d)\b")
+RE_KM = re.compile(r"\d[\d.,]*\s*km\b", re.IGNORECASE)
+
+
+def _lineas(html: str, url_base: str) -> list[str]:
+    soup = parsear_html(html)
+    for el in soup.find_all(TAGS_DESCARTABLES):
+        el.decompose()
+    vistas = set()
+    for a in soup.find_all("a", href=True):
+        href = a["href"].strip()
+        if not href or href.startswith(("#", "javascript:", "mailto:", "tel:")):
+            continue
+        url = urljoin(url_base, href).split("#")[0]
+        # Imagen y título suelen linkear a lo mismo: la URL va una sola vez
+        if url not in vistas:
+            vistas.add(url)
+            a.append(f" <{url}>")
+    for el in soup.find_all(TAGS_BLOQUE):
+        el.insert_before("\n")
+        el.append("\n")
+
+    lineas = []
+    for linea in soup.get_text(" ").splitlines():
+        linea = " ".join(linea.split())
+        if linea and (not lineas or lineas[-1] != linea):
+            lineas.append(linea[:MAX_CARACTERES_LINEA])
+    return lineas
+
+
+def reducir_html(html: str, url_base: str = "", max_caracteres: int = 12000) -> str:
+    """
+    Texto compacto con las filas de `html` que rodean a un precio, hasta
+    `max_caracteres`. Vacío si no hay candidatos a precio.
+    """
+    lineas = _lineas(html, url_base)
+    conservar = [False] * len(lineas)
+    for i, linea in enumerate(lineas):
+        if RE_PRECIO.search(linea):
+            for j in range(max(0, i - VENTANA), min(len(lineas), i + VENTANA + 1)):
+                conservar[j] = True
+
+    tramos, actual = [], []
+    for linea, conservada in zip(lineas, conservar):
+        if conservada:
+            actual.append(linea)
+        elif actual:
+            tramos.append("\n".join(actual))
+            actual = []
+    if actual:
+        tramos.append("\n".join(actual))
+
+    resultado = "\n\n".join(tramos)
+    if len(resultado) > max_caracteres:
+        # Cortar en el último fin de línea para no mandar una fila a medias
+        corte = resultado.rfind("\n", 0, max_caracteres)
+        resultado = resultado[:corte if corte > 0 else max_caracteres]
+    return resultado
+
+
+def candidatos(texto: str) -> dict:
+    """Cantidad de candidatos a precio, año y km en `texto` (para medir la reducción)."""
+    return {
+        "precios": len(RE_PRECIO.findall(texto)),
+        "anios": len(RE_ANIO.findall(texto)),
+        "km": len(RE_KM.findall(texto)),
+    }
@@ -0,0 +1,166 @@
+"""
+Caché en disco de páginas scrapeadas (GET condicional + hash de contenido).
+Por URL guarda ETag/Last-Modified, el SHA-256 del cuerpo y el cuerpo comprimido.
+Los re-scrapeos mandan If-None-Match/If-Modified-Since; si el servidor responde
+304, o el cuerpo nuevo tiene el mismo hash, la respuesta se marca `sin_cambios`
+(con el cuerpo cacheado) y solo se actualizan los metadatos. Los listings que
+siguen publicados tienen que contar como vistos: el scraper guarda en la entrada
+las URLs que extrajo (`guardar_vistas`) y en una página sin cambios marca esas,
+sin volver a parsearla; si no las tiene, la procesa desde el cuerpo cacheado.
+
+Las entradas vencen a los `ttl_horas` de la última descarga con contenido nuevo
+(un 304 o el mismo hash no las renuevan): pasado ese plazo la página se vuelve
+a bajar entera. El directorio se mantiene bajo `max_mb` desalojando las menos
+usadas. Se activa desde http_client.activar_cache (flag `--cache` de
+run_scraper.py o HTTP_CACHE_ENABLED).
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def hash_cuerpo(cuerpo: bytes) -> str:
+    return hashlib.sha256(cuerpo).hexdigest()
+
+
+class CachePaginas:
+    """Un par de archivos por URL: `<sha1>.json` (metadatos) y `<sha1>.gz` (cuerpo)."""
+
+    def __init__(self, directorio: str, ttl_horas: float, max_mb: float):
+        self.directorio = directorio
+        self.ttl = ttl_horas * 3600
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        os.makedirs(directorio, exist_ok=True)
+        self._bytes = sum(os.path.getsize(p) for p in self._archivos())
+
+    def _archivos(self) -> list[str]:
+        return [
+            os.path.join(self.directorio, nombre)
+            for nombre in os.listdir(self.directorio)
+            if nombre.endswith((".json", ".gz"))
+        ]
+
+    def _rutas(self, url: str) -> tuple[str, str]:
+        base = os.path.join(self.directorio, hashlib.sha1(url.encode()).hexdigest())
+        return base + ".json", base + ".gz"
+
+    def leer(self, url: str) -> Optional[dict]:
+        """Metadatos de la URL, o None si no hay entrada o está vencida."""
+        ruta_meta, ruta_cuerpo = self._rutas(url)
+        try:
+            with open(ruta_meta, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url or time.time() - meta.get("guardado", 0) > self.ttl:
+            self._borrar(ruta_meta, ruta_cuerpo)
+            return None
+        os.utime(ruta_meta)  # el mtime marca el último uso para el desalojo
+        return meta
+
+    def cuerpo(self, url: str) -> Optional[bytes]:
+        _, ruta_cuerpo = self._rutas(url)
+        try:
+            with open(ruta_cuerpo, "rb") as f:
+                return gzip.decompress(f.read())
+        except (OSError, EOFError, gzip.BadGzipFile):
+            return None
+
+    def guardar(
+        self,
+        url: str,
+        cuerpo: bytes,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        encoding: Optional[str],
+    ) -> None:
+        """Entrada nueva (o contenido nuevo): cuerpo, metadatos y TTL desde ahora."""
+        ruta_meta, ruta_cuerpo = self._rutas(url)
+        meta = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "hash": hash_cuerpo(cuerpo),
+            "encoding": encoding,
+            "guardado": time.time(),
+        }
+        comprimido = gzip.compress(cuerpo)
+        with self._lock:
+            self._escribir(ruta_cuerpo, comprimido)
+            self._escribir(ruta_meta, json.dumps(meta).encode("utf-8"))
+            if self._bytes > self.max_bytes:
+                self._desalojar()
+
+    def actualizar_meta(self, url: str, meta: dict, **cambios) -> None:
+        """
+        Reescribe solo los metadatos de una entrada existente (p. ej. validadores
+        nuevos con el mismo hash, o `vistas`); el cuerpo y `guardado` no cambian.
+        """
+        ruta_meta, _ = self._rutas(url)
+        with self._lock:
+            self._escribir(ruta_meta, json.dumps({**meta, **cambios}).encode("utf-8"))
+
+    def guardar_vistas(self, url: str, urls: list[str], en_pagina: int) -> None:
+        """URLs de listings que el scraper extrajo de la página cacheada (procesada entera)."""
+        meta = self.leer(url)
+        if meta is not None:
+            self.actualizar_meta(url, meta, vistas={"urls": urls, "en_pagina": en_pagina})
+
+    def _escribir(self, ruta: str, datos: bytes) -> None:
+        """Escritura atómica, con el lock tomado: un lector nunca ve un archivo a medias."""
+        self._bytes -= self._tamanio(ruta)
+        tmp = f"{ruta}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(datos)
+        os.replace(tmp, ruta)
+        self._bytes += len(datos)
+
+    @staticmethod
+    def _tamanio(ruta: str) -> int:
+        try:
+            return os.path.getsize(ruta)
+        except OSError:
+            return 0
+
+    def _borrar(self, *rutas: str) -> None:
+        with self._lock:
+            for ruta in rutas:
+                tamanio = self._tamanio(ruta)
+                try:
+                    os.remove(ruta)
+                    self._bytes -= tamanio
+                except OSError:
+                    pass
+
+    def _desalojar(self) -> None:
+        """Borra las entradas menos usadas hasta quedar en el 90% del límite (con el lock tomado)."""
+        metas = []
+        for ruta in self._archivos():
+            if ruta.endswith(".json"):
+                try:
+                    metas.append((os.path.getmtime(ruta), ruta))
+                except OSError:
+                    pass
+        objetivo = int(self.max_bytes * 0.9)
+        borradas = 0
+        for _, ruta_meta in sorted(metas):
+            if self._bytes <= objetivo:
+                break
+            for ruta in (ruta_meta, ruta_meta[:-len(".json")] + ".gz"):
+                tamanio = self._tamanio(ruta)
+                try:
+                    os.remove(ruta)
+                    self._bytes -= tamanio
+                except OSError:
+                    pass
+            borradas += 1
+        en_uso = self._bytes / 1024 / 1024
+        logger.info(f"[HTTPCache] Desalojadas {borradas} entradas ({en_uso:.1f} MB en uso)")
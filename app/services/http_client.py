@@ -0,0 +1,189 @@
+"""
+Cliente HTTP compartido por los scrapers.
+Una `requests.Session` por thread con pools de conexiones por host (keep-alive),
+reintentos con backoff ante 429/5xx, compresión gzip (y brotli si está instalado)
+y timeout uniforme. El rate limiting por host lo aplica `obtener` antes de cada
+request (ver rate_limiter.py).
+
+Con la caché de páginas activa (`activar_cache`), `obtener` hace GET condicional y
+marca `response.sin_cambios = True` cuando la página no cambió desde el último
+scrapeo (el cuerpo es el cacheado). Si el scraper ya había guardado las URLs de
+esa página (`recordar_vistas`), vienen en `response.vistas` y alcanza con marcar
+esos listings como vistos, sin parsear; si no, la procesa desde el cuerpo. En
+los dos casos la cuenta en `stats["sin_cambios"]`.
+"""
+import logging
+import threading
+from typing import Optional
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+from app.config import (
+    HTTP_TIMEOUT, HTTP_POOL_SIZE, HTTP_RETRIES, HTTP_BACKOFF,
+    HTTP_CACHE_ENABLED, HTTP_CACHE_DIR, HTTP_CACHE_TTL_HORAS, HTTP_CACHE_MAX_MB,
+)
+from app.services.http_cache import CachePaginas, hash_cuerpo
+from app.services.rate_limiter import esperar_turno
+
+logger = logging.getLogger(__name__)
+
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "es-AR,es;q=0.9,en;q=0.8",
+    # "gzip,deflate" y también "br" si urllib3 tiene brotli disponible para decodificar
+    "Accept-Encoding": ACCEPT_ENCODING,
+    "Connection": "keep-alive",
+}
+
+# Status que se reintentan con backoff exponencial (respeta Retry-After)
+STATUS_REINTENTABLES = (429, 500, 502, 503, 504)
+
+_local = threading.local()
+_cache: Optional[CachePaginas] = None
+
+
+def crear_sesion(
+    pool_size: int = HTTP_POOL_SIZE,
+    reintentos: int = HTTP_RETRIES,
+    backoff: float = HTTP_BACKOFF,
+) -> requests.Session:
+    """Session con pools por host y política de reintentos."""
+    retry = Retry(
+        total=reintentos,
+        connect=reintentos,
+        read=reintentos,
+        status=reintentos,
+        backoff_factor=backoff,
+        status_forcelist=STATUS_REINTENTABLES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        # Al agotar reintentos se devuelve la última respuesta: los scrapers ya
+        # manejan status != 200 (log + error en stats)
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def obtener_sesion() -> requests.Session:
+    """Session del thread actual (requests.Session no es thread-safe para compartir)."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = crear_sesion()
+    return session
+
+
+def activar_cache(
+    directorio: str = HTTP_CACHE_DIR,
+    ttl_horas: float = HTTP_CACHE_TTL_HORAS,
+    max_mb: float = HTTP_CACHE_MAX_MB,
+) -> CachePaginas:
+    """Activa la caché de páginas para todos los scrapers del proceso."""
+    global _cache
+    _cache = CachePaginas(directorio, ttl_horas, max_mb)
+    logger.info(f"[HTTP] Caché de páginas activa en {directorio}")
+    return _cache
+
+
+def desactivar_cache() -> None:
+    global _cache
+    _cache = None
+
+
+if HTTP_CACHE_ENABLED:
+    activar_cache()
+
+
+def _respuesta_desde_cache(url: str, cuerpo: bytes, meta: dict) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response._content = cuerpo
+    response.encoding = meta.get("encoding")
+    response.headers = CaseInsensitiveDict()
+    return response
+
+
+def recordar_vistas(url: str, urls: list[str], en_pagina: int) -> None:
+    """
+    Guarda con la página cacheada de `url` las URLs de listings que se
+    extrajeron de ella (solo si se procesó entera); ver `response.vistas`.
+    """
+    if _cache is not None:
+        _cache.guardar_vistas(url, urls, en_pagina)
+
+
+def _obtener_con_cache(cache: CachePaginas, url: str, timeout: float, **kwargs) -> requests.Response:
+    meta = cache.leer(url)
+    headers = dict(kwargs.pop("headers", None) or {})
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    response = obtener_sesion().get(url, timeout=timeout, headers=headers, **kwargs)
+
+    if response.status_code == 304 and meta:
+        cuerpo = cache.cuerpo(url)
+        if cuerpo is not None:
+            # Sin renovar el TTL: al vencer, la página se vuelve a bajar entera
+            response = _respuesta_desde_cache(url, cuerpo, meta)
+            response.sin_cambios = True
+            response.vistas = meta.get("vistas")
+            return response
+        # Cuerpo perdido (desalojo a medias): pedir la página completa
+        headers.pop("If-None-Match", None)
+        headers.pop("If-Modified-Since", None)
+        response = obtener_sesion().get(url, timeout=timeout, headers=headers, **kwargs)
+
+    response.sin_cambios = False
+    response.vistas = None
+    if response.status_code == 200:
+        validadores = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "encoding": response.encoding,
+        }
+        if meta and meta.get("hash") == hash_cuerpo(response.content):
+            # Mismo contenido: solo los validadores, sin recomprimir ni renovar el TTL
+            response.sin_cambios = True
+            response.vistas = meta.get("vistas")
+            if any(meta.get(k) != v for k, v in validadores.items()):
+                cache.actualizar_meta(url, meta, **validadores)
+        else:
+            cache.guardar(url, response.content, **validadores)
+    return response
+
+
+def obtener(
+    url: str,
+    intervalo: Optional[float] = None,
+    timeout: float = HTTP_TIMEOUT,
+    **kwargs,
+) -> requests.Response:
+    """
+    GET vía la Session compartida del thread.
+    Si se pasa `intervalo`, espera el turno del host en el rate limiter.
+    Con la caché activa el GET es condicional y la respuesta trae `sin_cambios`
+    (y `vistas`, ver recordar_vistas).
+    Lanza requests.RequestException ante errores de conexión, como requests.get.
+    """
+    if intervalo:
+        esperar_turno(url, intervalo)
+    if _cache is not None:
+        return _obtener_con_cache(_cache, url, timeout, **kwargs)
+    response = obtener_sesion().get(url, timeout=timeout, **kwargs)
+    response.sin_cambios = False
+    response.vistas = None
+    return response
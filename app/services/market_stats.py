@@ -0,0 +1,227 @@
+"""
+Estadísticas de mercado materializadas.
+Mantiene la tabla `market_stats` (cantidad, mediana, media recortada, p10/p90, km promedio)
+por marca/modelo/año/moneda, para que el motor de pricing y los endpoints de mercado
+lean agregados en vez de recorrer todos los listings en cada request.
+"""
+import logging
+import statistics
+from datetime import datetime
+from typing import Iterable, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import func, insert, select, tuple_
+from app.models.pricing import MarketListing, MarketStat
+from app.services.pricing_engine import _trimmed_mean
+
+logger = logging.getLogger(__name__)
+
+# Máximo de claves por sentencia IN al refrescar
+CLAVES_POR_LOTE = 500
+
+Clave = tuple[int, int, int, str]
+
+
+def _percentil(valores_ordenados: list[float], q: float) -> float:
+    """Percentil con interpolación lineal (mismo criterio que percentile_cont)."""
+    pos = (len(valores_ordenados) - 1) * q
+    inferior = int(pos)
+    superior = min(inferior + 1, len(valores_ordenados) - 1)
+    fraccion = pos - inferior
+    return valores_ordenados[inferior] + (valores_ordenados[superior] - valores_ordenados[inferior]) * fraccion
+
+
+def calcular_stats(precios: list[float], kms: list[int]) -> dict:
+    """Calcula los agregados de un grupo marca/modelo/año/moneda."""
+    ordenados = sorted(precios)
+    kms_validos = [k for k in kms if k and k > 0]
+    return {
+        "cantidad": len(ordenados),
+        "suma_precio": sum(ordenados),
+        "precio_min": ordenados[0],
+        "precio_max": ordenados[-1],
+        "mediana": statistics.median(ordenados),
+        "media_recortada": _trimmed_mean(ordenados, trim_count=1),
+        "p10": _percentil(ordenados, 0.10),
+        "p90": _percentil(ordenados, 0.90),
+        "km_promedio": statistics.mean(kms_validos) if kms_validos else None,
+        "km_cantidad": len(kms_validos),
+    }
+
+
+def _iterar_grupos(db: Session, claves: Optional[list[Clave]]) -> Iterable[tuple[Clave, list[float], list[int]]]:
+    """Recorre los listings válidos agrupados por clave, sin cargarlos todos a memoria."""
+    moneda = func.coalesce(MarketListing.moneda, "ARS")
+    query = select(
+        MarketListing.marca_id, MarketListing.modelo_id, MarketListing.anio, moneda,
+        MarketListing.precio, MarketListing.km,
+    ).where(
+        MarketListing.activo == True,
+        MarketListing.precio > 0,
+        MarketListing.anio > 0,
+    )
+    if claves is not None:
+        query = query.where(
+            tuple_(MarketListing.marca_id, MarketListing.modelo_id, MarketListing.anio, moneda).in_(claves)
+        )
+    query = query.order_by(MarketListing.marca_id, MarketListing.modelo_id, MarketListing.anio, moneda)
+
+    clave_actual = None
+    precios: list[float] = []
+    kms: list[int] = []
+    for marca_id, modelo_id, anio, mon, precio, km in db.execute(query.execution_options(yield_per=5000)):
+        clave = (marca_id, modelo_id, anio, mon)
+        if clave != clave_actual:
+            if clave_actual is not None:
+                yield clave_actual, precios, kms
+            clave_actual, precios, kms = clave, [], []
+        precios.append(float(precio))
+        kms.append(km)
+    if clave_actual is not None:
+        yield clave_actual, precios, kms
+
+
+def _escribir_grupos(db: Session, claves: Optional[list[Clave]]) -> int:
+    ahora = datetime.utcnow()
+    filas = []
+    for (marca_id, modelo_id, anio, moneda), precios, kms in _iterar_grupos(db, claves):
+        filas.append({
+            "marca_id": marca_id, "modelo_id": modelo_id, "anio": anio, "moneda": moneda,
+            "fecha_actualizacion": ahora,
+            **calcular_stats(precios, kms),
+        })
+    if filas:
+        db.execute(insert(MarketStat), filas)
+    return len(filas)
+
+
+def refrescar_market_stats(db: Session, claves: Optional[Iterable[Clave]] = None) -> int:
+    """
+    Recalcula `market_stats`.
+    Con `claves` solo se recalculan esos grupos (refresco incremental);
+    sin claves, o si la tabla todavía está vacía, se recalcula todo.
+    Retorna la cantidad de grupos escritos.
+    """
+    if claves is not None:
+        claves = sorted(set(claves))
+        if not claves:
+            return 0
+        if db.query(MarketStat.id).first() is None:
+            claves = None
+
+    escritos = 0
+    if claves is None:
+        db.query(MarketStat).delete(synchronize_session=False)
+        escritos = _escribir_grupos(db, None)
+    else:
+        for i in range(0, len(claves), CLAVES_POR_LOTE):
+            lote = claves[i:i + CLAVES_POR_LOTE]
+            db.query(MarketStat).filter(
+                tuple_(MarketStat.marca_id, MarketStat.modelo_id, MarketStat.anio, MarketStat.moneda).in_(lote)
+            ).delete(synchronize_session=False)
+            escritos += _escribir_grupos(db, lote)
+    db.commit()
+
+    logger.info(f"[MarketStats] {escritos} grupos refrescados")
+    return escritos
+
+
+def obtener_market_stats(
+    db: Session,
+    marca_id: Optional[int] = None,
+    modelo_id: Optional[int] = None,
+    anio_min: Optional[int] = None,
+    anio_max: Optional[int] = None,
+    moneda: Optional[str] = None,
+) -> list[MarketStat]:
+    """Lee las filas de `market_stats` que cumplen los filtros."""
+    query = db.query(MarketStat)
+    if marca_id:
+        query = query.filter(MarketStat.marca_id == marca_id)
+    if modelo_id:
+        query = query.filter(MarketStat.modelo_id == modelo_id)
+    if anio_min is not None:
+        query = query.filter(MarketStat.anio >= anio_min)
+    if anio_max is not None:
+        query = query.filter(MarketStat.anio <= anio_max)
+    if moneda:
+        query = query.filter(MarketStat.moneda == moneda)
+    return query.order_by(MarketStat.anio).all()
+
+
+def combinar_market_stats(stats: list[MarketStat], moneda: str = "ARS") -> Optional[dict]:
+    """
+    Combina las filas de `market_stats` en `moneda` en un solo resumen (las de
+    otras monedas se ignoran: no se mezclan pesos con dólares).
+    Todos los valores son exactos salvo la mediana, que no se puede combinar a
+    partir de medianas: con más de una fila queda en None y el llamador la
+    calcula sobre los listings (ver `mediana_mercado`).
+    """
+    stats = [s for s in stats if s.cantidad and s.moneda == moneda]
+    if not stats:
+        return None
+    if len(stats) == 1:
+        s = stats[0]
+        return {
+            "cantidad": s.cantidad,
+            "promedio": s.suma_precio / s.cantidad,
+            "mediana": s.mediana,
+            "media_recortada": s.media_recortada,
+            "precio_min": s.precio_min,
+            "precio_max": s.precio_max,
+            "km_promedio": s.km_promedio,
+        }
+
+    cantidad = sum(s.cantidad for s in stats)
+    suma = sum(s.suma_precio for s in stats)
+    precio_min = min(s.precio_min for s in stats)
+    precio_max = max(s.precio_max for s in stats)
+    km_cantidad = sum(s.km_cantidad for s in stats if s.km_promedio is not None)
+    return {
+        "cantidad": cantidad,
+        "promedio": suma / cantidad,
+        "mediana": None,
+        # Mismo criterio que _trimmed_mean(trim_count=1): sin el mínimo ni el máximo globales
+        "media_recortada": (suma - precio_min - precio_max) / (cantidad - 2) if cantidad > 2 else suma / cantidad,
+        "precio_min": precio_min,
+        "precio_max": precio_max,
+        "km_promedio": (
+            sum(s.km_promedio * s.km_cantidad for s in stats if s.km_promedio is not None) / km_cantidad
+            if km_cantidad else None
+        ),
+    }
+
+
+def mediana_mercado(
+    db: Session,
+    marca_id: int,
+    modelo_id: int,
+    anio_min: int,
+    anio_max: int,
+    moneda: str = "ARS",
+) -> float:
+    """
+    Mediana de mercado en `moneda` para un rango de años (0 si no hay datos).
+    Si el rango cae en una sola fila de `market_stats` usa su mediana; si abarca
+    varias (o la tabla todavía no se refrescó) la calcula sobre los listings activos,
+    así el resultado es siempre la mediana exacta.
+    """
+    if not marca_id or not modelo_id:
+        return 0
+    resumen = combinar_market_stats(
+        obtener_market_stats(db, marca_id, modelo_id, anio_min, anio_max, moneda), moneda
+    )
+    if resumen and resumen["mediana"] is not None:
+        return resumen["mediana"]
+
+    precios = [
+        precio for (precio,) in db.query(MarketListing.precio).filter(
+            MarketListing.marca_id == marca_id,
+            MarketListing.modelo_id == modelo_id,
+            MarketListing.anio >= anio_min,
+            MarketListing.anio <= anio_max,
+            func.coalesce(MarketListing.moneda, "ARS") == moneda,
+            MarketListing.activo == True,
+            MarketListing.precio > 0,
+        )
+    ]
+    return statistics.median(precios) if precios else 0
@@ -0,0 +1,163 @@
+"""
+Caché de matcheo texto crudo → catálogo.
+Los mismos títulos ("Volkswagen Gol Trend") se repiten miles de veces entre
+fuentes y corridas; en vez de re-matchearlos cada vez, el resultado se guarda en
+la tabla `match_cache` y en un LRU en memoria compartido por el proceso.
+
+Invalidación: cada fila lleva la huella (`catalogo_version`) de marcas, modelos y
+MARCA_ALIASES con la que se calculó. Si el catálogo cambia, la huella cambia y las
+filas viejas se borran al abrir la caché, sin depender de hooks en los endpoints.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional
+from sqlalchemy import delete, select, text, tuple_
+from sqlalchemy.orm import Session
+from app.config import MATCH_CACHE_LRU_SIZE
+from app.database import insert_ignorando_duplicados
+from app.models.pricing import MatchCache
+from app.services.catalogo_matcher import CatalogoMatcher, MARCA_ALIASES
+
+logger = logging.getLogger(__name__)
+
+# Máximo de claves por sentencia IN al precargar
+CLAVES_POR_LOTE = 500
+
+Clave = tuple[str, str]
+Resultado = tuple[Optional[int], Optional[int]]
+
+# LRU del proceso: sobrevive entre corridas mientras la huella del catálogo no cambie
+_lru: "OrderedDict[Clave, Resultado]" = OrderedDict()
+_lru_version: Optional[str] = None
+_lru_lock = threading.Lock()
+
+
+def normalizar_clave(marca_raw: str, modelo_raw: Optional[str]) -> Clave:
+    """'  VW ', 'Gol  Trend' -> ('vw', 'gol trend')."""
+    return " ".join(marca_raw.lower().split()), " ".join((modelo_raw or "").lower().split())
+
+
+def huella_catalogo(marcas, modelos, aliases: Optional[dict[str, str]] = None) -> str:
+    """SHA-1 del catálogo y los alias; cambia ante cualquier alta, baja o renombre."""
+    h = hashlib.sha1()
+    for marca_id, nombre in sorted(marcas, key=lambda m: m[0]):
+        h.update(f"m{marca_id}|{nombre}\n".encode())
+    for modelo_id, marca_id, nombre in sorted(modelos, key=lambda m: m[0]):
+        h.update(f"o{modelo_id}|{marca_id}|{nombre}\n".encode())
+    for alias, oficial in sorted((MARCA_ALIASES if aliases is None else aliases).items()):
+        h.update(f"a{alias}|{oficial}\n".encode())
+    return h.hexdigest()
+
+
+class CacheMatcheo:
+    """
+    Resuelve (marca_raw, modelo_raw) consultando, en orden: LRU en memoria →
+    tabla `match_cache` (vía `precargar`) → CatalogoMatcher. Los resultados nuevos
+    quedan pendientes hasta `guardar`, que los escribe en la transacción del llamador.
+    """
+
+    def __init__(self, marcas, modelos, max_entradas: int = MATCH_CACHE_LRU_SIZE):
+        self._marcas = marcas
+        self._modelos = modelos
+        self._matcher: Optional[CatalogoMatcher] = None
+        self.version = huella_catalogo(marcas, modelos)
+        self.max_entradas = max_entradas
+        self._pendientes: dict[Clave, Resultado] = {}
+        self.aciertos = 0
+        self.fallos = 0
+
+        global _lru_version
+        with _lru_lock:
+            if _lru_version != self.version:
+                _lru.clear()
+                _lru_version = self.version
+
+    @classmethod
+    def desde_db(cls, db: Session, max_entradas: int = MATCH_CACHE_LRU_SIZE) -> "CacheMatcheo":
+        """Carga el catálogo y descarta las filas persistidas con otra huella."""
+        marcas = db.execute(text("SELECT id, nombre FROM marcas")).fetchall()
+        modelos = db.execute(text("SELECT id, marca_id, nombre FROM modelos")).fetchall()
+        cache = cls(marcas, modelos, max_entradas)
+        borradas = db.execute(
+            delete(MatchCache).where(MatchCache.catalogo_version != cache.version)
+        ).rowcount
+        if borradas:
+            db.commit()
+            logger.info(f"[MatchCache] Catálogo modificado: {borradas} entradas invalidadas")
+        return cache
+
+    @property
+    def matcher(self) -> CatalogoMatcher:
+        # Se construye solo si hay textos que no están en la caché
+        if self._matcher is None:
+            self._matcher = CatalogoMatcher(self._marcas, self._modelos)
+        return self._matcher
+
+    def _lru_get(self, clave: Clave) -> Optional[Resultado]:
+        with _lru_lock:
+            resultado = _lru.get(clave)
+            if resultado is not None:
+                _lru.move_to_end(clave)
+            return resultado
+
+    def _lru_put(self, clave: Clave, resultado: Resultado) -> None:
+        with _lru_lock:
+            if _lru_version != self.version:
+                return
+            _lru[clave] = resultado
+            _lru.move_to_end(clave)
+            while len(_lru) > self.max_entradas:
+                _lru.popitem(last=False)
+
+    def precargar(self, db: Session, textos: Iterable[tuple[str, Optional[str]]]) -> None:
+        """Trae de `match_cache` las claves del lote que no están en el LRU."""
+        with _lru_lock:
+            faltantes = sorted({
+                normalizar_clave(marca_raw, modelo_raw)
+                for marca_raw, modelo_raw in textos if marca_raw
+            } - _lru.keys())
+        for i in range(0, len(faltantes), CLAVES_POR_LOTE):
+            lote = faltantes[i:i + CLAVES_POR_LOTE]
+            filas = db.execute(
+                select(MatchCache.marca_raw, MatchCache.modelo_raw, MatchCache.marca_id, MatchCache.modelo_id)
+                .where(
+                    MatchCache.catalogo_version == self.version,
+                    tuple_(MatchCache.marca_raw, MatchCache.modelo_raw).in_(lote),
+                )
+            )
+            for marca_raw, modelo_raw, marca_id, modelo_id in filas:
+                self._lru_put((marca_raw, modelo_raw), (marca_id, modelo_id))
+
+    def resolver(self, marca_raw: str, modelo_raw: Optional[str]) -> Resultado:
+        """Retorna (marca_id, modelo_id) como CatalogoMatcher.resolver."""
+        clave = normalizar_clave(marca_raw, modelo_raw)
+        resultado = self._lru_get(clave)
+        if resultado is None:
+            resultado = self._pendientes.get(clave)
+        if resultado is not None:
+            self.aciertos += 1
+            return resultado
+
+        self.fallos += 1
+        resultado = self.matcher.resolver(marca_raw, modelo_raw)
+        self._pendientes[clave] = resultado
+        self._lru_put(clave, resultado)
+        return resultado
+
+    def guardar(self, db: Session) -> int:
+        """Persiste los resultados nuevos (sin commit). Retorna la cantidad de entradas."""
+        if not self._pendientes:
+            return 0
+        filas = [
+            {
+                "marca_raw": marca_raw, "modelo_raw": modelo_raw,
+                "marca_id": marca_id, "modelo_id": modelo_id,
+                "catalogo_version": self.version,
+            }
+            for (marca_raw, modelo_raw), (marca_id, modelo_id) in self._pendientes.items()
+        ]
+        db.execute(insert_ignorando_duplicados(db, MatchCache), filas)
+        self._pendientes.clear()
+        return len(filas)
@@ -2,197 +2,296 @@
 Normalización de datos de mercado.
 Convierte MarketRawListing → MarketListing, matcheando con marcas/modelos internos.
 Usa SQL directo para escritura eficiente contra Railway PostgreSQL.
+Procesa el backlog de raw listings por chunks (keyset por id) para que la memoria
+no crezca con el tamaño de la tabla; la deduplicación por URL la resuelve la base
+(índice único + ON CONFLICT DO NOTHING).
 """
 import logging
+import math
+import random
 import statistics
+import time
+from array import array
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
+from app.config import (
+    NORMALIZER_BATCH_SIZE, NORMALIZER_CHUNK_SIZE,
+    OUTLIER_METODO, OUTLIER_UMBRAL, OUTLIER_MIN_GRUPO, OUTLIER_MUESTRA_MAX,
+)
+from app.database import insert_ignorando_duplicados
 from app.models.pricing import MarketRawListing, MarketListing
 from app.models.marca import Marca
 from app.models.modelo import Modelo
+from app.services.market_stats import refrescar_market_stats
+from app.services.match_cache import CacheMatcheo
 
-logger = logging.getLogger(__name__)
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional: sin él la mediana/MAD se calcula con statistics
+    np = None
 
-MARCA_ALIASES = {
-    "vw": "Volkswagen", "volkswagen": "Volkswagen",
-    "chevy": "Chevrolet", "chevrolet": "Chevrolet",
-    "mercedes benz": "Mercedes-Benz", "mercedes": "Mercedes-Benz", "mb": "Mercedes-Benz",
-    "bmw": "BMW", "ford": "Ford", "toyota": "Toyota", "fiat": "Fiat",
-    "renault": "Renault", "peugeot": "Peugeot",
-    "citroen": "Citroën", "citroën": "Citroën",
-    "nissan": "Nissan", "honda": "Honda", "hyundai": "Hyundai", "kia": "Kia",
-    "jeep": "Jeep", "audi": "Audi", "dodge": "Dodge", "ram": "RAM",
-    "chery": "Chery", "suzuki": "Suzuki", "mitsubishi": "Mitsubishi",
-    "subaru": "Subaru", "mazda": "Mazda", "volvo": "Volvo",
-    "land rover": "Land Rover", "landrover": "Land Rover",
-    "porsche": "Porsche", "ds": "DS",
-    "alfa romeo": "Alfa Romeo", "alfaromeo": "Alfa Romeo",
-    "mini": "MINI", "lexus": "Lexus", "jaguar": "Jaguar",
-    "ds automobiles": "DS", "dfsk": "DFSK", "geely": "Geely",
-    "haval": "Haval", "jac": "JAC", "byd": "BYD",
-    "gac": "GAC", "changan": "Changan", "great wall": "Great Wall",
-    "rover": "Land Rover", "seat": "SEAT", "smart": "Smart",
-    "ssangyong": "SsangYong", "tata": "Tata",
-}
+logger = logging.getLogger(__name__)
 
 
 def _normalizar_nombre(nombre: str) -> str:
     return nombre.strip().lower()
 
 
-def _es_outlier(precio: float, precios: list[float], desviaciones: float = 2.0) -> bool:
-    if len(precios) < 3:
+class _EstadisticaGrupo:
+    """Media y desvío estándar muestral acumulados en una sola pasada (Welford)."""
+    __slots__ = ("n", "media", "m2")
+
+    def __init__(self):
+        self.n = 0
+        self.media = 0.0
+        self.m2 = 0.0
+
+    def agregar(self, valor: float) -> None:
+        self.n += 1
+        delta = valor - self.media
+        self.media += delta / self.n
+        self.m2 += delta * (valor - self.media)
+
+    @property
+    def desvio(self) -> float:
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+    def limites(self) -> tuple[float, float]:
+        return self.media, self.desvio
+
+
+class _MuestraGrupo:
+    """
+    Precios de un grupo para mediana/MAD (escalado a σ con 1.4826). Conserva a lo
+    sumo `max_muestra` precios con muestreo reservoir, así la memoria no crece con
+    el backlog; `rnd` es compartido por la pasada y con semilla fija, para que el
+    resultado sea reproducible.
+    """
+    __slots__ = ("n", "valores", "max_muestra", "rnd")
+
+    def __init__(self, rnd: random.Random, max_muestra: int = OUTLIER_MUESTRA_MAX):
+        self.n = 0
+        self.valores = array("d")
+        self.max_muestra = max_muestra
+        self.rnd = rnd
+
+    def agregar(self, valor: float) -> None:
+        self.n += 1
+        if len(self.valores) < self.max_muestra:
+            self.valores.append(valor)
+            return
+        j = self.rnd.randrange(self.n)
+        if j < self.max_muestra:
+            self.valores[j] = valor
+
+    def limites(self) -> tuple[float, float]:
+        if np is not None:
+            valores = np.frombuffer(self.valores, dtype=np.float64)
+            mediana = float(np.median(valores))
+            mad = float(np.median(np.abs(valores - mediana)))
+        else:
+            mediana = statistics.median(self.valores)
+            mad = statistics.median(abs(v - mediana) for v in self.valores)
+        return mediana, 1.4826 * mad
+
+
+ClaveOutlier = tuple[int, int, int, str]
+
+
+def _es_outlier(precio: float, limites: tuple[float, float] | None, umbral: float = OUTLIER_UMBRAL) -> bool:
+    """`limites` = (centro, escala) precalculados del grupo; None si el grupo es chico."""
+    if limites is None:
         return False
-    try:
-        media = statistics.mean(precios)
-        desvio = statistics.stdev(precios)
-        if desvio == 0:
-            return False
-        return abs(precio - media) > desviaciones * desvio
-    except statistics.StatisticsError:
+    centro, escala = limites
+    if escala == 0:
         return False
+    return abs(precio - centro) > umbral * escala
+
+
+def _estadisticas_outliers(
+    db: Session,
+    cache: CacheMatcheo,
+    max_id: int,
+    chunk_size: int,
+    metodo: str = OUTLIER_METODO,
+    min_grupo: int = OUTLIER_MIN_GRUPO,
+) -> dict[ClaveOutlier, tuple[float, float]]:
+    """
+    Primera pasada: límites (centro, escala) por marca/modelo/año/moneda sobre los
+    raw pendientes. Usa un cursor del lado del servidor y se calcula una sola vez por
+    grupo, así el filtrado posterior es O(1) por fila.
+    """
+    if metodo not in ("desvio", "mad"):
+        raise ValueError(f"Método de outliers desconocido: {metodo}")
+    if metodo == "mad":
+        rnd = random.Random(0)
+        tipo_grupo = lambda: _MuestraGrupo(rnd)
+    else:
+        tipo_grupo = _EstadisticaGrupo
+
+    grupos: dict[ClaveOutlier, _EstadisticaGrupo | _MuestraGrupo] = {}
+    result = db.execute(
+        text(
+            "SELECT marca_raw, modelo_raw, anio, precio, moneda FROM market_raw_listings "
+            "WHERE procesado = false AND id <= :max_id AND precio > 0 AND anio > 0 "
+            "AND marca_raw IS NOT NULL"
+        ).execution_options(stream_results=True, yield_per=chunk_size),
+        {"max_id": max_id},
+    )
+    for filas in result.partitions():
+        cache.precargar(db, ((f[0], f[1]) for f in filas))
+        for marca_raw, modelo_raw, anio, precio, moneda in filas:
+            marca_id, modelo_id = cache.resolver(marca_raw, modelo_raw)
+            if not marca_id or not modelo_id:
+                continue
+            key = (marca_id, modelo_id, anio, moneda or "ARS")
+            grupo = grupos.get(key)
+            if grupo is None:
+                grupo = grupos[key] = tipo_grupo()
+            grupo.agregar(float(precio))
+
+    return {key: grupo.limites() for key, grupo in grupos.items() if grupo.n >= min_grupo}
+
+
+def _marcar_procesados(db: Session, ids: list[int], batch_size: int) -> None:
+    """
+    Marca los raw como procesados.
+    En PostgreSQL usa un UPDATE ... FROM (VALUES ...) por lote; en otros motores, WHERE id IN.
+    """
+    es_postgres = db.bind.dialect.name == "postgresql"
+    for i in range(0, len(ids), batch_size):
+        batch_ids = ids[i:i + batch_size]
+        if es_postgres:
+            valores = ",".join(f"({int(x)})" for x in batch_ids)
+            db.execute(text(
+                "UPDATE market_raw_listings AS r SET procesado = true "
+                f"FROM (VALUES {valores}) AS v(id) WHERE r.id = v.id"
+            ))
+        else:
+            db.execute(
+                text("UPDATE market_raw_listings SET procesado = true WHERE id IN :ids")
+                .bindparams(bindparam("ids", expanding=True)),
+                {"ids": batch_ids},
+            )
 
 
-def normalizar_listings(db: Session) -> dict:
+def _insertar_listings(db: Session, filas: list[dict], batch_size: int) -> int:
+    """
+    Inserta market listings con executemany (INSERT multi-fila en SQLAlchemy 2.x).
+    Las URLs ya existentes se descartan en la base (ON CONFLICT DO NOTHING).
+    Retorna la cantidad de filas efectivamente insertadas.
+    """
+    insertados = 0
+    stmt = insert_ignorando_duplicados(db, MarketListing).returning(MarketListing.id)
+    for i in range(0, len(filas), batch_size):
+        insertados += len(db.execute(stmt, filas[i:i + batch_size]).all())
+    return insertados
+
+
+def normalizar_listings(
+    db: Session,
+    batch_size: int = NORMALIZER_BATCH_SIZE,
+    chunk_size: int = NORMALIZER_CHUNK_SIZE,
+) -> dict:
     """
     Convierte raw listings → market listings usando SQL directo.
-    1. Lee todos los raw no procesados en memoria (SELECT)
-    2. Matchea marca/modelo en Python (sin queries)
-    3. Escribe con SQL directo (INSERT batch + UPDATE batch)
+    1. Calcula límites de outliers por marca/modelo/año/moneda (una pasada en streaming)
+    2. Lee los raw no procesados por chunks de `chunk_size` (keyset por id)
+    3. Matchea marca/modelo vía CacheMatcheo (LRU → tabla match_cache → CatalogoMatcher)
+    4. Escribe cada chunk con SQL directo (INSERT multi-fila + UPDATE por lotes
+       de `batch_size`) en una transacción por chunk
     """
     stats = {"procesados": 0, "normalizados": 0, "sin_match": 0, "outliers_filtrados": 0}
+    inicio = time.perf_counter()
 
-    # ── Leer todo a memoria con SQL directo ──
-    raws = db.execute(text(
-        "SELECT id, fuente, url, marca_raw, modelo_raw, anio, km, precio, moneda, "
-        "ubicacion, fecha_publicacion, fecha_scraping "
-        "FROM market_raw_listings WHERE procesado = false"
-    )).fetchall()
+    # Fijar el límite superior: lo que llegue durante la corrida queda para la próxima
+    max_id = db.execute(text(
+        "SELECT MAX(id) FROM market_raw_listings WHERE procesado = false"
+    )).scalar()
 
-    if not raws:
+    if max_id is None:
         return stats
 
-    # ── Marcas y modelos en memoria ──
-    marcas_rows = db.execute(text("SELECT id, nombre FROM marcas")).fetchall()
-    modelos_rows = db.execute(text("SELECT id, marca_id, nombre FROM modelos")).fetchall()
+    # ── Caché de matcheo de marcas/modelos (invalida si cambió el catálogo) ──
+    cache = CacheMatcheo.desde_db(db)
 
-    marcas_por_nombre: dict[str, tuple[int, str]] = {}
-    for mid, nombre in marcas_rows:
-        marcas_por_nombre[nombre.lower()] = (mid, nombre)
+    # ── Límites por grupo para outliers ──
+    limites_outliers = _estadisticas_outliers(db, cache, max_id, chunk_size)
 
-    modelos_por_marca: dict[int, dict[str, int]] = {}
-    for mid, marca_id, nombre in modelos_rows:
-        modelos_por_marca.setdefault(marca_id, {})
-        modelos_por_marca[marca_id][nombre.lower()] = mid
+    # ── Procesar por chunks ──
+    claves_stats: set[tuple] = set()
+    ultimo_id = 0
 
-    existing_urls = set(
-        row[0] for row in db.execute(text(
-            "SELECT url FROM market_listings WHERE url IS NOT NULL"
-        )).fetchall()
-    )
+    while True:
+        raws = db.execute(text(
+            "SELECT id, fuente, url, marca_raw, modelo_raw, anio, km, precio, moneda, "
+            "ubicacion, fecha_publicacion, fecha_scraping, fecha_ultima_vista "
+            "FROM market_raw_listings "
+            "WHERE procesado = false AND id > :ultimo_id AND id <= :max_id "
+            "ORDER BY id LIMIT :limite"
+        ), {"ultimo_id": ultimo_id, "max_id": max_id, "limite": chunk_size}).fetchall()
 
-    def buscar_marca(marca_raw: str) -> int | None:
-        if not marca_raw:
-            return None
-        norm = _normalizar_nombre(marca_raw)
-        oficial = MARCA_ALIASES.get(norm, marca_raw.strip())
-        r = marcas_por_nombre.get(oficial.lower())
-        if r:
-            return r[0]
-        for key, (mid, _) in marcas_por_nombre.items():
-            if oficial.lower() in key or key in oficial.lower():
-                return mid
-        r = marcas_por_nombre.get(marca_raw.strip().lower())
-        return r[0] if r else None
-
-    def buscar_modelo(modelo_raw: str, marca_id: int) -> int | None:
-        if not modelo_raw:
-            return None
-        modelos = modelos_por_marca.get(marca_id, {})
-        mid = modelos.get(modelo_raw.strip().lower())
-        if mid:
-            return mid
-        ml = modelo_raw.strip().lower()
-        for key, mid in modelos.items():
-            if ml in key or key in ml:
-                return mid
-        return None
-
-    # ── Agrupar precios para outliers ──
-    precios_grupo: dict[str, list[float]] = {}
-    for row in raws:
-        precio, marca_raw, anio = row[7], row[3], row[5]
-        if precio and marca_raw and anio:
-            key = f"{_normalizar_nombre(marca_raw)}_{anio}"
-            precios_grupo.setdefault(key, []).append(float(precio))
-
-    # ── Procesar en memoria ──
-    ids_procesados = []
-    inserts = []
-
-    for row in raws:
-        raw_id, fuente, url = row[0], row[1], row[2]
-        marca_raw, modelo_raw, anio = row[3], row[4], row[5]
-        km, precio, moneda = row[6], row[7], row[8]
-        ubicacion, fecha_pub, fecha_scr = row[9], row[10], row[11]
-
-        stats["procesados"] += 1
-        ids_procesados.append(raw_id)
-
-        if not precio or not marca_raw:
-            stats["sin_match"] += 1
-            continue
-
-        marca_id = buscar_marca(marca_raw)
-        if not marca_id:
-            stats["sin_match"] += 1
-            continue
-
-        modelo_id = buscar_modelo(modelo_raw or "", marca_id)
-        if not modelo_id:
-            stats["sin_match"] += 1
-            continue
-
-        key = f"{_normalizar_nombre(marca_raw)}_{anio}"
-        precios = precios_grupo.get(key, [])
-        if _es_outlier(float(precio), precios):
-            stats["outliers_filtrados"] += 1
-            continue
-
-        if url and url in existing_urls:
-            continue
-
-        inserts.append({
-            "raw_listing_id": raw_id, "fuente": fuente,
-            "marca_id": marca_id, "modelo_id": modelo_id,
-            "anio": anio or 0, "km": km, "precio": float(precio),
-            "moneda": moneda or "ARS", "ubicacion": ubicacion,
-            "url": url, "activo": True,
-            "fecha_publicacion": fecha_pub, "fecha_scraping": fecha_scr,
-        })
-        if url:
-            existing_urls.add(url)
-        stats["normalizados"] += 1
-
-    # ── Escribir con SQL en lotes ──
-    BATCH = 25
-
-    # 1. UPDATE procesado = true en lotes
-    for i in range(0, len(ids_procesados), BATCH):
-        batch_ids = ids_procesados[i:i + BATCH]
-        placeholders = ",".join(str(x) for x in batch_ids)
-        db.execute(text(f"UPDATE market_raw_listings SET procesado = true WHERE id IN ({placeholders})"))
-        db.commit()
-
-    # 2. INSERT market_listings en lotes
-    if inserts:
-        from app.models.pricing import MarketListing
-        for i in range(0, len(inserts), BATCH):
-            batch = inserts[i:i + BATCH]
-            for row_data in batch:
-                listing = MarketListing(**row_data)
-                db.add(listing)
+        if not raws:
+            break
+        ultimo_id = raws[-1][0]
+
+        ids_procesados = []
+        inserts = []
+        cache.precargar(db, ((row[3], row[4]) for row in raws if row[7]))
+
+        for row in raws:
+            raw_id, fuente, url = row[0], row[1], row[2]
+            marca_raw, modelo_raw, anio = row[3], row[4], row[5]
+            km, precio, moneda = row[6], row[7], row[8]
+            ubicacion, fecha_pub, fecha_scr, fecha_vista = row[9], row[10], row[11], row[12]
+
+            stats["procesados"] += 1
+            ids_procesados.append(raw_id)
+
+            if not precio or not marca_raw:
+                stats["sin_match"] += 1
+                continue
+
+            marca_id, modelo_id = cache.resolver(marca_raw, modelo_raw)
+            if not marca_id or not modelo_id:
+                stats["sin_match"] += 1
+                continue
+
+            if anio and _es_outlier(float(precio), limites_outliers.get((marca_id, modelo_id, anio, moneda or "ARS"))):
+                stats["outliers_filtrados"] += 1
+                continue
+
+            inserts.append({
+                "raw_listing_id": raw_id, "fuente": fuente,
+                "marca_id": marca_id, "modelo_id": modelo_id,
+                "anio": anio or 0, "km": km, "precio": float(precio),
+                "moneda": moneda or "ARS", "ubicacion": ubicacion,
+                "url": url, "activo": True,
+                "fecha_publicacion": fecha_pub, "fecha_scraping": fecha_scr,
+                "fecha_ultima_vista": fecha_vista or fecha_scr,
+            })
+
+        # ── Escribir el chunk con SQL en lotes, una transacción por chunk ──
+        try:
+            _marcar_procesados(db, ids_procesados, batch_size)
+            stats["normalizados"] += _insertar_listings(db, inserts, batch_size)
+            cache.guardar(db)
             db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        claves_stats.update(
+            (i["marca_id"], i["modelo_id"], i["anio"], i["moneda"]) for i in inserts
+        )
+
+    duracion = time.perf_counter() - inicio
+    stats["filas_por_segundo"] = round(stats["procesados"] / duracion, 1) if duracion > 0 else None
+    stats["cache_aciertos"] = cache.aciertos
+
+    # Refrescar estadísticas materializadas de los grupos tocados
+    if claves_stats:
+        refrescar_market_stats(db, claves_stats)
 
     logger.info(f"Normalización completada: {stats}")
     return stats
@@ -0,0 +1,120 @@
+"""
+Paginación adaptativa de los scrapers de listados.
+Cada búsqueda (marca/modelo) recorre páginas mientras sigan trayendo datos
+nuevos. Corta cuando una página viene vacía, cuando trae solo duplicados o
+cuando la proporción de nuevos cae bajo `min_ratio_nuevos` (meseta: el
+listado ya está casi todo en la base). Así, ir más profundo solo cuesta
+páginas donde hay datos nuevos.
+
+Las páginas de toda la corrida salen de un PresupuestoPaginas que comparten
+las fuentes (lo crea el orquestador). El presupuesto puede tener además un
+límite de tiempo (modo delta, `--budget-minutes`).
+"""
+import logging
+import threading
+import time
+from typing import Callable, Optional
+from app.config import SCRAPER_MAX_PAGINAS, SCRAPER_MIN_RATIO_NUEVOS
+
+logger = logging.getLogger(__name__)
+
+
+class PresupuestoPaginas:
+    """Contador thread-safe de páginas disponibles para la corrida, con plazo opcional."""
+
+    def __init__(self, max_paginas: int, limite_segundos: Optional[float] = None):
+        self.max_paginas = max_paginas
+        self.usadas = 0
+        self.vence = time.monotonic() + limite_segundos if limite_segundos is not None else None
+        self._lock = threading.Lock()
+
+    @property
+    def vencido(self) -> bool:
+        return self.vence is not None and time.monotonic() >= self.vence
+
+    def consumir(self) -> bool:
+        """Reserva una página; False si el presupuesto se agotó o venció el plazo."""
+        with self._lock:
+            if self.usadas >= self.max_paginas or self.vencido:
+                return False
+            self.usadas += 1
+            if self.usadas == self.max_paginas:
+                logger.warning(f"[Paginación] Presupuesto de {self.max_paginas} páginas agotado")
+            return True
+
+    @property
+    def restantes(self) -> int:
+        return max(0, self.max_paginas - self.usadas)
+
+
+def paginar(
+    scrape_pagina: Callable[[int, int], dict],
+    etiqueta: str,
+    max_nuevos: int,
+    presupuesto: Optional[PresupuestoPaginas] = None,
+    max_paginas: int = SCRAPER_MAX_PAGINAS,
+    min_ratio_nuevos: float = SCRAPER_MIN_RATIO_NUEVOS,
+    tam_pagina: Optional[int] = None,
+    recorrido_completo: bool = False,
+) -> dict:
+    """
+    Llama a `scrape_pagina(pagina, limit)` (páginas desde 1) hasta que se corte
+    por alguna regla de parada, se junten `max_nuevos` o se agote el presupuesto.
+    Con `tam_pagina`, una página con menos resultados se toma como la última.
+    Con `recorrido_completo` no se corta por duplicados ni por meseta: se sigue
+    hasta el final del listado (si alcanzan las páginas y el presupuesto).
+
+    El final del listado se decide con `en_pagina` de las stats de la página
+    (resultados antes de filtrar los que no se guardan), nunca con nuevos +
+    duplicados; una página con `truncada` (no se procesó entera por `limit`)
+    deja listings sin ver, así que la búsqueda no cuenta como completa.
+    Retorna la suma de las stats {nuevos, duplicados, errores, cambios_precio,
+    sin_cambios} de las páginas, más `paginas` (las que se llegaron a pedir; 0 si
+    el presupuesto ya estaba agotado y la búsqueda no se hizo) y `completo`
+    (True si se llegó al final del listado sin errores ni páginas truncadas).
+    """
+    total = {
+        "nuevos": 0, "duplicados": 0, "errores": 0, "cambios_precio": 0, "sin_cambios": 0,
+        "paginas": 0, "completo": False,
+    }
+    motivo = f"{max_paginas} páginas"
+    truncada = False
+    for pagina in range(1, max_paginas + 1):
+        if total["nuevos"] >= max_nuevos:
+            motivo = f"{max_nuevos} nuevos"
+            break
+        if presupuesto is not None and not presupuesto.consumir():
+            if pagina == 1:
+                return total
+            motivo = "presupuesto agotado"
+            break
+
+        limit = max_nuevos - total["nuevos"]
+        stats = scrape_pagina(pagina, limit)
+        total["paginas"] += 1
+        for k in ("nuevos", "duplicados", "errores", "cambios_precio", "sin_cambios"):
+            total[k] += stats.get(k, 0)
+        truncada = truncada or bool(stats.get("truncada"))
+        en_pagina = stats.get("en_pagina")
+        # Sin `en_pagina` no se sabe si la página era la última, solo que no trajo nada útil
+        fin_valido = en_pagina is not None and not total["errores"] and not truncada
+
+        vistos = stats["nuevos"] + stats["duplicados"]
+        if vistos == 0:
+            # Una primera página vacía puede ser un bloqueo: no prueba que el listado terminó
+            total["completo"] = fin_valido and en_pagina == 0 and pagina > 1
+            motivo = f"página {pagina} sin resultados"
+            break
+        if not recorrido_completo and stats["nuevos"] == 0:
+            motivo = f"página {pagina} solo con duplicados"
+            break
+        if not recorrido_completo and stats["nuevos"] / vistos < min_ratio_nuevos:
+            motivo = f"meseta en página {pagina} ({stats['nuevos']}/{vistos} nuevos)"
+            break
+        if tam_pagina is not None and (en_pagina if en_pagina is not None else vistos) < min(tam_pagina, limit):
+            total["completo"] = fin_valido
+            motivo = f"última página ({pagina})"
+            break
+
+    logger.info(f"[Paginación] {etiqueta}: {total} (corte: {motivo})")
+    return total
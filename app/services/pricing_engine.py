@@ -5,8 +5,8 @@ Calcula precios sugeridos, competitividad y márgenes basándose en datos de mer
 import statistics
 import logging
 from typing import Optional, List
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, tuple_
 from app.models.pricing import MarketListing, MarketRawListing
 from app.models.auto import Auto
 from app.schemas.pricing import PrecioSugerido, MarketListingOut
@@ -56,7 +56,7 @@ def obtener_comparables(
                 MarketListing.km >= km_min,
                 MarketListing.km <= km_max,
             )
-        return query.limit(limit).all()
+        return query.order_by(MarketListing.id).limit(limit).all()
 
     # Intentar con rango progresivo hasta encontrar resultados
     for rango in RANGOS_ANIO_PROGRESIVOS:
@@ -87,7 +87,7 @@ def obtener_comparables(
         MarketListing.activo == True,
         MarketListing.precio > 0,
     ).order_by(
-        func.abs(MarketListing.anio - anio)
+        func.abs(MarketListing.anio - anio), MarketListing.id
     ).limit(limit)
 
     return query.all()
@@ -116,7 +116,89 @@ def _query_comparables_moneda(
             MarketListing.km >= km_min,
             MarketListing.km <= km_max,
         )
-    return query.limit(limit).all()
+    return query.order_by(MarketListing.id).limit(limit).all()
+
+
+def _cargar_candidatos_por_par(
+    db: Session,
+    pares: set[tuple[int, int]],
+) -> dict[tuple[int, int], list[MarketListing]]:
+    """
+    Trae en una sola query todos los listings válidos para los pares (marca_id, modelo_id)
+    pedidos, ordenados por id (mismo orden que usan las queries por auto).
+    """
+    pares = {p for p in pares if p[0] is not None and p[1] is not None}
+    if not pares:
+        return {}
+
+    listings = db.query(MarketListing).filter(
+        tuple_(MarketListing.marca_id, MarketListing.modelo_id).in_(list(pares)),
+        MarketListing.anio > 0,
+        MarketListing.activo == True,
+        MarketListing.precio > 0,
+    ).order_by(MarketListing.id).all()
+
+    por_par: dict[tuple[int, int], list[MarketListing]] = {}
+    for l in listings:
+        por_par.setdefault((l.marca_id, l.modelo_id), []).append(l)
+    return por_par
+
+
+def _filtrar_candidatos(
+    candidatos: list[MarketListing],
+    anio: int,
+    rango: int,
+    km: Optional[int],
+    rango_km_pct: float,
+    moneda: str,
+    limit: int,
+) -> list[MarketListing]:
+    """Equivalente en memoria de `_query_comparables_moneda` sobre candidatos ya cargados."""
+    km_min = km_max = None
+    if km and rango_km_pct > 0:
+        km_min = int(km * (1 - rango_km_pct))
+        km_max = int(km * (1 + rango_km_pct))
+
+    resultados = []
+    for c in candidatos:
+        if not (anio - rango <= c.anio <= anio + rango) or c.moneda != moneda:
+            continue
+        if km_min is not None and (c.km is None or not (km_min <= c.km <= km_max)):
+            continue
+        resultados.append(c)
+        if len(resultados) >= limit:
+            break
+    return resultados
+
+
+def resolver_comparables(
+    candidatos: list[MarketListing],
+    anio: int,
+    rango_anio: int = 1,
+    rango_km_pct: float = 0.3,
+    km: Optional[int] = None,
+    limit: int = 100,
+    moneda: str = "ARS",
+) -> list[MarketListing]:
+    """
+    Misma cascada que `obtener_comparables` (rango progresivo de año, fallback a USD
+    y último recurso sin moneda) pero resuelta en memoria sobre los candidatos
+    de un par marca/modelo traídos con `_cargar_candidatos_por_par`.
+    """
+    for rango in RANGOS_ANIO_PROGRESIVOS:
+        if rango < rango_anio:
+            continue
+        resultados = _filtrar_candidatos(candidatos, anio, rango, km, rango_km_pct, moneda, limit)
+        if resultados:
+            return resultados
+
+    if moneda == "ARS":
+        for rango in RANGOS_ANIO_PROGRESIVOS:
+            resultados = _filtrar_candidatos(candidatos, anio, rango, km, rango_km_pct, "USD", limit)
+            if resultados:
+                return resultados
+
+    return sorted(candidatos, key=lambda c: (abs(c.anio - anio), c.id))[:limit]
 
 
 def _calcular_ajuste_km(km_auto: Optional[int], km_promedio_mercado: Optional[float]) -> float:
@@ -173,6 +255,15 @@ def calcular_precio_sugerido(db: Session, auto_id: int) -> PrecioSugerido:
     if not auto:
         return PrecioSugerido(auto_id=auto_id, precio_actual=0)
 
+    # Buscar comparables (intenta ARS primero, con rango progresivo)
+    comparables = obtener_comparables(
+        db, auto.marca_id, auto.modelo_id, auto.anio, moneda="ARS"
+    )
+    return _precio_sugerido_desde_comparables(auto, comparables)
+
+
+def _precio_sugerido_desde_comparables(auto: Auto, comparables: list[MarketListing]) -> PrecioSugerido:
+    """Arma el PrecioSugerido de un auto a partir de sus comparables ya resueltos."""
     resultado = PrecioSugerido(
         auto_id=auto.id,
         marca=auto.marca.nombre if auto.marca else None,
@@ -181,11 +272,6 @@ def calcular_precio_sugerido(db: Session, auto_id: int) -> PrecioSugerido:
         precio_actual=auto.precio,
     )
 
-    # Buscar comparables (intenta ARS primero, con rango progresivo)
-    comparables = obtener_comparables(
-        db, auto.marca_id, auto.modelo_id, auto.anio, moneda="ARS"
-    )
-
     if not comparables:
         resultado.comparables_count = 0
         resultado.competitividad = "sin_datos"
@@ -263,22 +349,45 @@ def calcular_precio_sugerido(db: Session, auto_id: int) -> PrecioSugerido:
 def analizar_inventario(db: Session) -> list[PrecioSugerido]:
     """
     Analiza todos los autos en stock y genera precio sugerido para cada uno.
+    Modo batch: trae los comparables de todos los pares marca/modelo del stock
+    en una sola query y resuelve la cascada año/moneda en memoria.
     """
-    autos = db.query(Auto).filter(Auto.en_stock == True).all()
+    autos = (
+        db.query(Auto)
+        .options(joinedload(Auto.marca), joinedload(Auto.modelo))
+        .filter(Auto.en_stock == True)
+        .all()
+    )
+    candidatos_por_par = _cargar_candidatos_por_par(
+        db, {(auto.marca_id, auto.modelo_id) for auto in autos}
+    )
+
     resultados = []
     for auto in autos:
-        resultado = calcular_precio_sugerido(db, auto.id)
-        resultados.append(resultado)
+        comparables = resolver_comparables(
+            candidatos_por_par.get((auto.marca_id, auto.modelo_id), []),
+            auto.anio,
+            moneda="ARS",
+        )
+        resultados.append(_precio_sugerido_desde_comparables(auto, comparables))
     return resultados
 
 
 def obtener_estadisticas_pricing(db: Session) -> dict:
     """
     Genera estadísticas globales del módulo de pricing.
+    Usa la misma resolución batch de comparables que `analizar_inventario`,
+    así la cantidad de queries no depende del tamaño del stock.
     """
-    autos_stock = db.query(Auto).filter(Auto.en_stock == True).all()
+    autos_stock = db.query(
+        Auto.id, Auto.marca_id, Auto.modelo_id, Auto.anio, Auto.precio
+    ).filter(Auto.en_stock == True).all()
     total = len(autos_stock)
 
+    candidatos_por_par = _cargar_candidatos_por_par(
+        db, {(auto.marca_id, auto.modelo_id) for auto in autos_stock}
+    )
+
     con_datos = 0
     sin_datos = 0
     muy_comp = 0
@@ -287,8 +396,8 @@ def obtener_estadisticas_pricing(db: Session) -> dict:
     margenes = []
 
     for auto in autos_stock:
-        comparables = obtener_comparables(
-            db, auto.marca_id, auto.modelo_id, auto.anio
+        comparables = resolver_comparables(
+            candidatos_por_par.get((auto.marca_id, auto.modelo_id), []), auto.anio
         )
         precios = [c.precio for c in comparables if c.precio > 0]
 
@@ -311,8 +420,11 @@ def obtener_estadisticas_pricing(db: Session) -> dict:
         margen = auto.precio - (auto.precio * 0.85)
         margenes.append(margen)
 
-    total_listings = db.query(func.count(MarketListing.id)).scalar() or 0
-    total_raw = db.query(func.count(MarketRawListing.id)).scalar() or 0
+    # Totales en una sola query
+    total_listings, total_raw = db.query(
+        db.query(func.count(MarketListing.id)).scalar_subquery(),
+        db.query(func.count(MarketRawListing.id)).scalar_subquery(),
+    ).one()
 
     fuentes = db.query(MarketListing.fuente).distinct().all()
     fuentes_activas = [f[0] for f in fuentes]
@@ -326,7 +438,7 @@ def obtener_estadisticas_pricing(db: Session) -> dict:
         "caros": caros,
         "margen_promedio": round(statistics.mean(margenes), 2) if margenes else None,
         "precio_mercado_promedio_global": None,
-        "total_listings_mercado": total_listings,
-        "total_raw_listings": total_raw,
+        "total_listings_mercado": total_listings or 0,
+        "total_raw_listings": total_raw or 0,
         "fuentes_activas": fuentes_activas,
     }
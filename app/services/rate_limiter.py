@@ -0,0 +1,68 @@
+"""
+Rate limiting por host para los scrapers.
+Reemplaza los `time.sleep(REQUEST_DELAY)` entre requests: cada host tiene su
+propio token bucket, así se mantiene la cortesía con cada sitio pero las fuentes
+no se esperan entre sí cuando corren en paralelo (ver scraping_orchestrator.py).
+"""
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    """
+    Token bucket thread-safe: `tasa` tokens por segundo, hasta `capacidad` acumulados.
+    `adquirir` reserva el token antes de dormir, así los hilos que compiten por el
+    mismo host se encolan sin retener el lock.
+    """
+
+    def __init__(self, tasa: float, capacidad: float = 1.0):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self._tokens = capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self) -> float:
+        """Bloquea hasta obtener un token. Retorna los segundos esperados."""
+        with self._lock:
+            ahora = time.monotonic()
+            self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+            self._ultimo = ahora
+            self._tokens -= 1
+            espera = -self._tokens / self.tasa if self._tokens < 0 else 0.0
+        if espera > 0:
+            time.sleep(espera)
+        return espera
+
+
+class LimitadorPorHost:
+    """Un TokenBucket por host, creado al primer request a ese host."""
+
+    def __init__(self):
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host: str, intervalo: float) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(tasa=1.0 / intervalo)
+            return bucket
+
+    def esperar(self, url: str, intervalo: float) -> float:
+        host = urlsplit(url).hostname or ""
+        return self.bucket(host, intervalo).adquirir()
+
+
+limitador = LimitadorPorHost()
+
+
+def esperar_turno(url: str, intervalo: Optional[float] = None) -> float:
+    """
+    Espera el turno del host de `url` en el limitador global.
+    `intervalo` es la separación mínima entre requests al host (segundos); se fija
+    con el primer request a ese host.
+    """
+    return limitador.esperar(url, intervalo or 1.5)
@@ -0,0 +1,163 @@
+"""
+Escritura de raw listings con deduplicación del lado de la base.
+Los scrapers acumulan filas en un SinkRawListings y este las inserta en lotes
+con INSERT ... ON CONFLICT (url) DO NOTHING RETURNING url: las filas devueltas
+son las nuevas y el resto eran duplicados. Así ningún scraper necesita cargar
+el set de URLs existentes de la fuente (antes se hacía en cada página).
+
+De los duplicados del lote se leen solo sus precios guardados (una consulta
+IN por lote): los cambios de precio se registran en market_price_history
+(app/services/historial_precios.py) y alimentan al scheduler delta. Además
+se les actualiza `fecha_ultima_vista` en raw y market listings con un UPDATE
+por tabla y lote (ver app/services/vigencia.py).
+"""
+import logging
+from datetime import datetime
+from sqlalchemy import bindparam, select, text
+from sqlalchemy.orm import Session
+from app.config import SCRAPER_INSERT_BATCH_SIZE
+from app.database import insert_ignorando_duplicados
+from app.models.pricing import MarketRawListing
+from app.services.historial_precios import registrar_cambios
+
+logger = logging.getLogger(__name__)
+
+CAMPOS = (
+    "url", "titulo", "marca_raw", "modelo_raw", "anio", "km",
+    "precio", "moneda", "ubicacion", "imagen_url",
+)
+
+
+class SinkRawListings:
+    """
+    Buffer de raw listings de una fuente. `agregar` acumula y escribe cada
+    `batch_size` filas; `cerrar` escribe el resto. Cada lote se commitea y
+    suma nuevos/duplicados/cambios_precio en `stats` (el dict de stats del scraper).
+
+    Las URLs repetidas dentro de un mismo lote se descartan antes del INSERT;
+    las filas sin URL no tienen contra qué deduplicar y se insertan siempre.
+
+    `urls` acumula las URLs recibidas (para recordarlas con la página cacheada,
+    ver http_client.recordar_vistas).
+
+    Con `marcar_vistas=False` (importaciones) no se toca `fecha_ultima_vista`:
+    la fuente no cuenta como scrapeada para la vigencia. Con
+    `registrar_cambios=False` (importaciones) los duplicados no se comparan
+    contra el precio guardado: no escriben historial ni cuentan cambios_precio.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        fuente: str,
+        stats: dict,
+        batch_size: int = SCRAPER_INSERT_BATCH_SIZE,
+        marcar_vistas: bool = True,
+        registrar_cambios: bool = True,
+    ):
+        self.db = db
+        self.fuente = fuente
+        self.stats = stats
+        self.batch_size = batch_size
+        self.marcar_vistas = marcar_vistas
+        self.registrar_cambios = registrar_cambios
+        self.nuevos = 0
+        self.cambios_precio = 0
+        self.stats.setdefault("cambios_precio", 0)
+        self._filas: list[dict] = []
+        self._urls: set[str] = set()
+        self.urls: list[str] = []
+        self._stmt = insert_ignorando_duplicados(db, MarketRawListing).returning(MarketRawListing.url)
+
+    def agregar(self, **datos) -> None:
+        url = datos.get("url") or None
+        if url is not None:
+            if url in self._urls:
+                self.stats["duplicados"] += 1
+                return
+            self._urls.add(url)
+            self.urls.append(url)
+        fila = {campo: datos.get(campo) for campo in CAMPOS}
+        ahora = datetime.utcnow()
+        fila.update(
+            url=url,
+            moneda=fila["moneda"] or "ARS",
+            fuente=self.fuente,
+            activo=True,
+            procesado=False,
+            fecha_scraping=ahora,
+            fecha_ultima_vista=ahora if self.marcar_vistas else None,
+        )
+        self._filas.append(fila)
+        if len(self._filas) >= self.batch_size:
+            self._escribir()
+
+    def _escribir(self) -> int:
+        filas, self._filas, self._urls = self._filas, [], set()
+        if not filas:
+            return 0
+        insertadas = {url for (url,) in self.db.execute(self._stmt, filas).all()}
+        insertados = sum(1 for f in filas if f["url"] is None or f["url"] in insertadas)
+        duplicadas = [f for f in filas if f["url"] is not None and f["url"] not in insertadas]
+        cambios = self._registrar_cambios_precio(duplicadas) if self.registrar_cambios else 0
+        if self.marcar_vistas:
+            self._marcar_vistas([f["url"] for f in duplicadas])
+        self.db.commit()
+        self.nuevos += insertados
+        self.cambios_precio += cambios
+        self.stats["nuevos"] += insertados
+        self.stats["duplicados"] += len(duplicadas)
+        self.stats["cambios_precio"] += cambios
+        return insertados
+
+    def _registrar_cambios_precio(self, duplicadas: list[dict]) -> int:
+        vistas = {f["url"]: f for f in duplicadas if f["precio"] is not None}
+        if not vistas:
+            return 0
+        guardados = self.db.execute(
+            select(
+                MarketRawListing.id, MarketRawListing.url, MarketRawListing.precio,
+                MarketRawListing.moneda, MarketRawListing.fecha_scraping,
+            ).where(MarketRawListing.url.in_(list(vistas)))
+        ).all()
+        cambios = [
+            {
+                "raw_listing_id": raw_id,
+                "precio_anterior": precio,
+                "moneda_anterior": moneda,
+                "fecha_anterior": fecha_scraping,
+                "precio": vistas[url]["precio"],
+                "moneda": vistas[url]["moneda"],
+                "fecha": vistas[url]["fecha_scraping"],
+            }
+            for raw_id, url, precio, moneda, fecha_scraping in guardados
+            if precio is not None and precio != vistas[url]["precio"]
+        ]
+        registrar_cambios(self.db, cambios)
+        return len(cambios)
+
+    def _marcar_vistas(self, urls: list[str]) -> None:
+        if not urls:
+            return
+        ahora = datetime.utcnow()
+        for tabla in ("market_raw_listings", "market_listings"):
+            self.db.execute(
+                text(f"UPDATE {tabla} SET fecha_ultima_vista = :ahora WHERE url IN :urls")
+                .bindparams(bindparam("urls", expanding=True)),
+                {"ahora": ahora, "urls": urls},
+            )
+
+    def marcar_vistas_cacheadas(self, urls: list[str]) -> None:
+        """
+        Listings de una página sin cambios que ya se procesó: cuentan como
+        duplicados y se marcan vistos, sin insertar ni comparar precios.
+        """
+        if self.marcar_vistas:
+            self._marcar_vistas(urls)
+        self.db.commit()
+        self.stats["duplicados"] += len(urls)
+
+    def cerrar(self) -> int:
+        """Escribe lo pendiente. Retorna el total de nuevos insertados por este sink."""
+        self._escribir()
+        return self.nuevos
@@ -1,30 +1,110 @@
+"""
+Scraper de precios con IA.
+Para cada combinación (marca, modelo, año) en stock y cada fuente se baja la
+página, se reduce a las filas con candidatos a precio (html_reduccion.py) y se
+le pide al modelo que extraiga los listings de ese texto.
+
+Las extracciones corren en un pool de threads: mientras unas esperan al modelo
+otras bajan su página (la cortesía con cada sitio la mantiene el rate limiter
+por host). Con el proveedor rigen los `LimitesIA` de la corrida: un tope de
+tokens (según el `usage` de cada respuesta) y de requests por minuto.
+Los threads no tocan la base: los items vuelven al thread principal, que los
+escribe con un SinkRawListings por fuente.
+"""
 import json
 import logging
 import re
+import threading
 import time
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional
 import requests
 from sqlalchemy.orm import Session
+from app.config import AI_MAX_TOKENS_CORRIDA, AI_MAX_WORKERS, AI_REQUESTS_POR_MINUTO
 from app.models.auto import Auto
 from app.models.marca import Marca
 from app.models.modelo import Modelo
-from app.models.pricing import MarketRawListing
-from app.services.ai_client import deepseek_chat, AIConfigError
+from app.services.ai_client import deepseek_chat_con_uso, get_deepseek_api_key, AIConfigError
+from app.services.html_reduccion import reducir_html
+from app.services.http_client import obtener
+from app.services.rate_limiter import TokenBucket
+from app.services.raw_listing_sink import SinkRawListings
 
 logger = logging.getLogger(__name__)
 
 REQUEST_DELAY = 1.2
-
-HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-        "(KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
-    ),
-    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-    "Accept-Language": "es-AR,es;q=0.9,en;q=0.8",
-    "Connection": "keep-alive",
-}
+FUENTES_AI = ["infoauto", "acara", "deruedas", "preciosdeautos"]
+MAX_TOKENS_RESPUESTA = 700
+MAX_CARACTERES_PAGINA = 12000
+# Estimación conservadora para reservar tokens antes de la llamada
+CARACTERES_POR_TOKEN = 3
+
+
+class PresupuestoIAAgotado(Exception):
+    pass
+
+
+class LimitesIA:
+    """
+    Límites de una corrida con el proveedor de IA, compartidos por los threads.
+    Antes de cada llamada se reserva una estimación de tokens (prompt +
+    max_tokens) y al volver se reemplaza por el `usage` real, así las llamadas
+    en vuelo no pueden pasarse del tope. Sin límite cuando es None.
+    """
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = AI_MAX_TOKENS_CORRIDA,
+        requests_por_minuto: Optional[int] = AI_REQUESTS_POR_MINUTO,
+    ):
+        self.max_tokens = max_tokens
+        self.tokens_usados = 0
+        self.llamadas = 0
+        self.items_extraidos = 0
+        self.paginas_sin_candidatos = 0
+        self.agotado = False
+        self._reservados = 0
+        self._lock = threading.Lock()
+        self._bucket = TokenBucket(tasa=requests_por_minuto / 60.0) if requests_por_minuto else None
+
+    def reservar(self, estimado: int) -> bool:
+        with self._lock:
+            if self.agotado:
+                return False
+            if self.max_tokens is not None and self.tokens_usados + self._reservados + estimado > self.max_tokens:
+                self.agotado = True
+                return False
+            self._reservados += estimado
+            return True
+
+    def confirmar(self, estimado: int, usados: int) -> None:
+        with self._lock:
+            self._reservados -= estimado
+            self.tokens_usados += usados
+            self.llamadas += 1
+
+    def registrar_extraccion(self, items: Optional[int]) -> None:
+        """Items que devolvió una llamada; None si la página no tenía candidatos y no se llamó."""
+        with self._lock:
+            if items is None:
+                self.paginas_sin_candidatos += 1
+            else:
+                self.items_extraidos += items
+
+    def esperar_turno(self) -> None:
+        if self._bucket is not None:
+            self._bucket.adquirir()
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {
+                "llamadas": self.llamadas,
+                "tokens": self.tokens_usados,
+                "tokens_por_llamada": round(self.tokens_usados / self.llamadas) if self.llamadas else None,
+                "items": self.items_extraidos,
+                "items_por_llamada": round(self.items_extraidos / self.llamadas, 2) if self.llamadas else None,
+                "paginas_sin_candidatos": self.paginas_sin_candidatos,
+            }
 
 
 def _slugify(text: str) -> str:
@@ -50,16 +130,17 @@ def _build_source_urls(marca: str, modelo: str, anio: Optional[int]) -> dict:
     }
 
 
-def _fetch_html(url: str) -> Optional[str]:
+def _fetch_html(url: str) -> tuple[Optional[str], bool]:
+    """Retorna (html, sin_cambios); html es None si el request falló."""
     try:
-        response = requests.get(url, headers=HEADERS, timeout=20)
+        response = obtener(url, REQUEST_DELAY)
         if response.status_code != 200:
             logger.warning("[AI] Status %s para %s", response.status_code, url)
-            return None
-        return response.text
+            return None, False
+        return response.text, response.sin_cambios
     except requests.RequestException as exc:
         logger.error("[AI] Error de conexion %s", exc)
-        return None
+        return None, False
 
 
 def _extract_json_list(content: str) -> list[dict]:
@@ -119,10 +200,36 @@ def _normalize_item(item: dict, marca: str, modelo: str, source_url: str) -> dic
     }
 
 
-def _prompt_extract_listings(source: str, url: str, html: str, marca: str, modelo: str, anio: Optional[int]) -> list[dict]:
-    html_snippet = html[:12000]
+def _estimar_tokens(messages: list[dict], max_tokens: int) -> int:
+    return sum(len(m["content"]) for m in messages) // CARACTERES_POR_TOKEN + max_tokens
+
+
+def _prompt_extract_listings(
+    source: str,
+    url: str,
+    html: str,
+    marca: str,
+    modelo: str,
+    anio: Optional[int],
+    limites: Optional[LimitesIA] = None,
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = None,
+) -> list[dict]:
+    """
+    Extrae los listings de la página reducida a sus filas con precio; si no
+    tiene ninguna no llama al modelo. Lanza PresupuestoIAAgotado si la llamada
+    no entra en los límites de la corrida.
+    """
+    limites = limites or LimitesIA(None, None)
+    contenido = reducir_html(html, url, MAX_CARACTERES_PAGINA)
+    if not contenido:
+        logger.info("[AI] Sin candidatos a precio en %s", url)
+        limites.registrar_extraccion(None)
+        return []
+
     prompt = (
-        "Extrae informacion de precios de autos desde el HTML dado. "
+        "Extrae informacion de precios de autos desde el contenido dado "
+        "(texto de la pagina, una linea por bloque, links como <url>). "
         "Devuelve un JSON array con hasta 8 items. Cada item debe tener: "
         "titulo, marca_raw, modelo_raw, anio, km, precio, moneda, ubicacion, url. "
         "Reglas: SOLO incluir items que tengan precio y anio (no null). "
@@ -134,63 +241,90 @@ def _prompt_extract_listings(source: str, url: str, html: str, marca: str, model
 
     messages = [
         {"role": "system", "content": "Eres un extractor de datos de autos."},
-        {"role": "user", "content": prompt + "\n\nHTML:\n" + html_snippet},
+        {"role": "user", "content": prompt + "\n\nContenido:\n" + contenido},
     ]
 
-    content = deepseek_chat(messages, max_tokens=700)
-    return _extract_json_list(content)
-
-
-def scrape_ai_source(
-    db: Session,
+    estimado = _estimar_tokens(messages, MAX_TOKENS_RESPUESTA)
+    if not limites.reservar(estimado):
+        raise PresupuestoIAAgotado()
+    limites.esperar_turno()
+    usados = 0
+    try:
+        content, usage = deepseek_chat_con_uso(
+            messages, max_tokens=MAX_TOKENS_RESPUESTA, api_key=api_key, base_url=base_url,
+        )
+        # Sin `usage` en la respuesta se cuenta la estimación (las de caché traen 0)
+        usados = usage.get("total_tokens", estimado)
+    finally:
+        limites.confirmar(estimado, usados)
+    items = _extract_json_list(content)
+    limites.registrar_extraccion(len(items))
+    return items
+
+
+def _extraer(
     marca: str,
     modelo: str,
     anio: Optional[int],
     source: str,
+    limites: LimitesIA,
+    api_key: Optional[str],
+    base_url: Optional[str] = None,
 ) -> dict:
-    stats = {"nuevos": 0, "duplicados": 0, "errores": 0}
-    urls = _build_source_urls(marca, modelo, anio)
-    source_url = urls.get(source)
+    """
+    Baja la página de una fuente y extrae sus items con la IA (sin tocar la base).
+    Retorna {source, items (ya normalizados), errores, omitida}.
+    """
+    resultado = {"source": source, "items": [], "errores": 0, "omitida": False}
+    if limites.agotado:
+        resultado["omitida"] = True
+        return resultado
+
+    source_url = _build_source_urls(marca, modelo, anio).get(source)
     if not source_url:
-        stats["errores"] += 1
-        return stats
+        resultado["errores"] += 1
+        return resultado
 
-    html = _fetch_html(source_url)
+    html, sin_cambios = _fetch_html(source_url)
     if not html:
-        stats["errores"] += 1
-        return stats
+        resultado["errores"] += 1
+        return resultado
+    if sin_cambios:
+        # Misma página que en el último scrapeo: se extrae igual para marcar sus
+        # listings como vistos; el prompt es el mismo, así que con la caché de
+        # respuestas activa no hay otra llamada a la IA
+        logger.info("[AI] Sin cambios desde el último scrapeo: %s", source_url)
 
     try:
-        items = _prompt_extract_listings(source, source_url, html, marca, modelo, anio)
+        items = _prompt_extract_listings(
+            source, source_url, html, marca, modelo, anio,
+            limites=limites, api_key=api_key, base_url=base_url,
+        )
+    except PresupuestoIAAgotado:
+        resultado["omitida"] = True
+        return resultado
     except AIConfigError as exc:
         logger.error("[AI] %s", exc)
-        stats["errores"] += 1
-        return stats
+        resultado["errores"] += 1
+        return resultado
     except Exception as exc:
         logger.error("[AI] Error procesando IA: %s", exc)
-        stats["errores"] += 1
-        return stats
-
-    existing_urls = set(
-        u for (u,) in db.query(MarketRawListing.url).filter(
-            MarketRawListing.fuente == f"ai_{source}"
-        ).all()
-    )
+        resultado["errores"] += 1
+        return resultado
 
-    nuevos = []
     for item in items:
         normalized = _normalize_item(item, marca, modelo, source_url)
         if not normalized.get("precio") or not normalized.get("anio"):
-            stats["errores"] += 1
-            continue
-        url = normalized.get("url")
-        if url and url in existing_urls:
-            stats["duplicados"] += 1
+            resultado["errores"] += 1
             continue
+        resultado["items"].append(normalized)
+    return resultado
 
-        nuevos.append(MarketRawListing(
-            fuente=f"ai_{source}",
-            url=url,
+
+def _guardar_items(sink: SinkRawListings, items: list[dict]) -> None:
+    for normalized in items:
+        sink.agregar(
+            url=normalized.get("url"),
             titulo=normalized["titulo"],
             marca_raw=normalized["marca_raw"],
             modelo_raw=normalized["modelo_raw"],
@@ -199,35 +333,30 @@ def scrape_ai_source(
             precio=normalized["precio"],
             moneda=normalized["moneda"],
             ubicacion=normalized["ubicacion"],
-            imagen_url=None,
-            activo=True,
-            procesado=False,
-            fecha_scraping=datetime.utcnow(),
-        ))
-        if url:
-            existing_urls.add(url)
-        stats["nuevos"] += 1
-
-    if nuevos:
-        db.add_all(nuevos)
-        db.commit()
-
-    return stats
+        )
 
 
-def scrape_all_ai(
+def scrape_ai_source(
     db: Session,
-    max_autos: int = 20,
-    sources: Optional[list[str]] = None,
+    marca: str,
+    modelo: str,
+    anio: Optional[int],
+    source: str,
+    base_url: Optional[str] = None,
 ) -> dict:
-    total_stats = {"nuevos": 0, "duplicados": 0, "errores": 0}
-    fuentes = sources or ["infoauto", "acara", "deruedas", "preciosdeautos"]
+    stats = {"nuevos": 0, "duplicados": 0, "errores": 0}
+    api_key, _source = get_deepseek_api_key(db)
+    resultado = _extraer(marca, modelo, anio, source, LimitesIA(), api_key, base_url)
+    stats["errores"] += resultado["errores"]
+    if resultado["items"]:
+        sink = SinkRawListings(db, f"ai_{source}", stats)
+        _guardar_items(sink, resultado["items"])
+        sink.cerrar()
+    return stats
 
-    autos = db.query(Auto).filter(Auto.en_stock == True).all()
-    if not autos:
-        logger.warning("[AI] No hay autos en stock para scrapear")
-        return total_stats
 
+def _combos_en_stock(db: Session, max_autos: int) -> list[tuple[str, str, Optional[int]]]:
+    autos = db.query(Auto).filter(Auto.en_stock == True).all()
     marcas = {m.id: m.nombre for m in db.query(Marca).all()}
     modelos = {m.id: m.nombre for m in db.query(Modelo).all()}
 
@@ -238,21 +367,85 @@ def scrape_all_ai(
         if key in seen:
             continue
         seen.add(key)
-        combos.append(key)
-        if len(combos) >= max_autos:
+        marca = marcas.get(auto.marca_id, "")
+        modelo = modelos.get(auto.modelo_id, "")
+        if marca and modelo:
+            combos.append((marca, modelo, auto.anio))
+        if len(seen) >= max_autos:
             break
+    return combos
+
+
+def extraer_combos(
+    db: Session,
+    combos: list[tuple[str, str, Optional[int]]],
+    sources: Optional[list[str]] = None,
+    max_workers: int = AI_MAX_WORKERS,
+    limites: Optional[LimitesIA] = None,
+    base_url: Optional[str] = None,
+) -> dict:
+    """
+    Extrae cada (marca, modelo, año) × fuente en paralelo con hasta `max_workers`
+    threads dentro de `limites`, y guarda los items desde este thread.
+    `base_url` permite apuntar a otro servidor compatible con chat completions.
+    """
+    total_stats = {"nuevos": 0, "duplicados": 0, "errores": 0}
+    fuentes = sources or FUENTES_AI
+    tareas = [(marca, modelo, anio, fuente) for marca, modelo, anio in combos for fuente in fuentes]
+    if not tareas:
+        return total_stats
+
+    api_key, _source = get_deepseek_api_key(db)
+    if not api_key:
+        logger.error("[AI] DeepSeek API key no configurada")
+        total_stats["errores"] += 1
+        return total_stats
+
+    limites = limites or LimitesIA()
+    inicio = time.perf_counter()
+    omitidas = 0
+    sinks: dict[str, SinkRawListings] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tareas))), thread_name_prefix="ai") as pool:
+        futuros = [pool.submit(_extraer, *tarea, limites, api_key, base_url) for tarea in tareas]
+        for futuro in as_completed(futuros):
+            resultado = futuro.result()
+            total_stats["errores"] += resultado["errores"]
+            omitidas += resultado["omitida"]
+            if resultado["items"]:
+                source = resultado["source"]
+                if source not in sinks:
+                    sinks[source] = SinkRawListings(db, f"ai_{source}", total_stats)
+                _guardar_items(sinks[source], resultado["items"])
+    for sink in sinks.values():
+        sink.cerrar()
+
+    if omitidas:
+        logger.warning("[AI] Tope de tokens alcanzado: %d extracciones omitidas", omitidas)
+    metricas = limites.metricas()
+    logger.info(
+        "[AI] %d tareas en %.1fs: %d llamadas, %s tokens/llamada, %s items/llamada, %d páginas sin candidatos",
+        len(tareas), time.perf_counter() - inicio, metricas["llamadas"], metricas["tokens_por_llamada"],
+        metricas["items_por_llamada"], metricas["paginas_sin_candidatos"],
+    )
+    return total_stats
 
-    for marca_id, modelo_id, anio in combos:
-        marca = marcas.get(marca_id, "")
-        modelo = modelos.get(modelo_id, "")
-        if not marca or not modelo:
-            continue
 
-        for fuente in fuentes:
-            stats = scrape_ai_source(db, marca, modelo, anio, fuente)
-            for k in total_stats:
-                total_stats[k] += stats[k]
-            time.sleep(REQUEST_DELAY)
+def scrape_all_ai(
+    db: Session,
+    max_autos: int = 20,
+    sources: Optional[list[str]] = None,
+    max_workers: int = AI_MAX_WORKERS,
+    max_tokens: Optional[int] = AI_MAX_TOKENS_CORRIDA,
+    requests_por_minuto: Optional[int] = AI_REQUESTS_POR_MINUTO,
+    base_url: Optional[str] = None,
+) -> dict:
+    combos = _combos_en_stock(db, max_autos)
+    if not combos:
+        logger.warning("[AI] No hay autos en stock para scrapear")
+        return {"nuevos": 0, "duplicados": 0, "errores": 0}
 
+    total_stats = extraer_combos(
+        db, combos, sources, max_workers, LimitesIA(max_tokens, requests_por_minuto), base_url,
+    )
     logger.info("[AI] Scraping total completado: %s", total_stats)
     return total_stats
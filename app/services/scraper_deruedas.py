@@ -6,31 +6,29 @@ No requiere credenciales — scraping directo del sitio público.
 import requests
 import logging
 import re
-import time
-from datetime import datetime
 from typing import Optional
-from bs4 import BeautifulSoup
 from sqlalchemy.orm import Session
-from app.models.pricing import MarketRawListing
+from app.config import SCRAPER_PRESUPUESTO_PAGINAS
 from app.models.marca import Marca
 from app.models.modelo import Modelo
+from app.services.http_client import obtener, recordar_vistas
+from app.services.paginacion import PresupuestoPaginas, paginar
+from app.services.scraping_delta import recorrer_segmentos
+from app.services.raw_listing_sink import SinkRawListings
+from app.services.html_parser import SetSelectores, parsear_html
 
 logger = logging.getLogger(__name__)
 
 DERUEDAS_BASE_URL = "https://www.deruedas.com.ar"
 
-HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-        "(KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
-    ),
-    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-    "Accept-Language": "es-AR,es;q=0.9,en;q=0.8",
-    "Connection": "keep-alive",
-}
-
 REQUEST_DELAY = 1.5  # segundos
 
+# Cada listing tiene un link a /vendo/Marca/Modelo/...; el resto de los datos se
+# extrae del contenedor del link (ver _extract_listing_data)
+SELECTORES_DERUEDAS = SetSelectores({
+    "links_listing": ['a[href*="/vendo/"]'],
+})
+
 
 def _build_search_url(marca: str = "", modelo: str = "", page: int = 1) -> str:
     """
@@ -205,15 +203,17 @@ def scrape_deruedas_web(
     """
     Scrape directo del sitio web de deRuedas.
     Parsea el HTML de los resultados de búsqueda.
-    Retorna dict con stats: {nuevos, duplicados, errores}.
+    Retorna dict con stats: {nuevos, duplicados, errores, sin_cambios, en_pagina, truncada}
+    (sin_cambios = 1 si la página era igual a la cacheada; en_pagina = listings de
+    la página, incluidos los que se descartan; truncada = 1 si `limit` dejó listings sin procesar).
     """
-    stats = {"nuevos": 0, "duplicados": 0, "errores": 0}
+    stats = {"nuevos": 0, "duplicados": 0, "errores": 0, "sin_cambios": 0, "en_pagina": 0, "truncada": 0}
 
     url = _build_search_url(marca, modelo, page)
     logger.info(f"[deRuedas] Scraping: {url}")
 
     try:
-        response = requests.get(url, headers=HEADERS, timeout=20)
+        response = obtener(url, REQUEST_DELAY)
         if response.status_code != 200:
             logger.warning(f"[deRuedas] Status {response.status_code} para {url}")
             stats["errores"] += 1
@@ -223,11 +223,22 @@ def scrape_deruedas_web(
         stats["errores"] += 1
         return stats
 
-    soup = BeautifulSoup(response.text, "html.parser")
+    if response.sin_cambios:
+        # Página igual a la cacheada: sus listings tienen que contar igual como vistos
+        logger.info(f"[deRuedas] Sin cambios desde el último scrapeo: {url}")
+        stats["sin_cambios"] = 1
+        if response.vistas is not None:
+            # Ya se procesó esta misma página: alcanza con marcar sus listings como vistos
+            stats["en_pagina"] = response.vistas["en_pagina"]
+            SinkRawListings(db, "deruedas", stats).marcar_vistas_cacheadas(response.vistas["urls"])
+            return stats
+
+    # Sin SoupStrainer: las cards se obtienen subiendo a los padres de cada link
+    soup = parsear_html(response.text)
 
     # Buscar todos los links de listings individuales: /vendo/Marca/Modelo/...
     # Cada listing es un bloque que contiene un link a /vendo/
-    listing_links = soup.find_all("a", href=re.compile(r"/vendo/"))
+    listing_links = SELECTORES_DERUEDAS.extraer(soup).todos("links_listing")
 
     if not listing_links:
         logger.info(f"[deRuedas] 0 resultados para '{marca} {modelo}'")
@@ -258,15 +269,10 @@ def scrape_deruedas_web(
         cards.append(card or link)
 
     logger.info(f"[deRuedas] {len(cards)} listings encontrados para '{marca} {modelo}'")
+    stats["en_pagina"] = len(cards)
+    stats["truncada"] = int(len(cards) > limit)
 
-    # Cargar URLs existentes en memoria
-    existing_urls = set(
-        u for (u,) in db.query(MarketRawListing.url).filter(
-            MarketRawListing.fuente == "deruedas"
-        ).all()
-    )
-
-    nuevos = []
+    sink = SinkRawListings(db, "deruedas", stats)
     for card in cards[:limit]:
         try:
             data = _extract_listing_data(card, marca_hint=marca, modelo_hint=modelo)
@@ -274,12 +280,7 @@ def scrape_deruedas_web(
             if not data["url"] or not data["precio"]:
                 continue
 
-            if data["url"] in existing_urls:
-                stats["duplicados"] += 1
-                continue
-
-            nuevos.append(MarketRawListing(
-                fuente="deruedas",
+            sink.agregar(
                 url=data["url"],
                 titulo=data["titulo"],
                 marca_raw=data["marca"],
@@ -290,33 +291,37 @@ def scrape_deruedas_web(
                 moneda=data["moneda"],
                 ubicacion=data["ubicacion"],
                 imagen_url=data["imagen_url"],
-                activo=True,
-                procesado=False,
-                fecha_scraping=datetime.utcnow(),
-            ))
-            existing_urls.add(data["url"])
-            stats["nuevos"] += 1
+            )
 
         except Exception as e:
             logger.error(f"[deRuedas] Error procesando listing: {e}")
             stats["errores"] += 1
 
+    nuevos = sink.cerrar()
     if nuevos:
-        db.add_all(nuevos)
-        db.commit()
-        logger.info(f"[deRuedas] Guardados {len(nuevos)} nuevos listings")
+        logger.info(f"[deRuedas] Guardados {nuevos} nuevos listings")
+    if not stats["truncada"] and not stats["errores"]:
+        recordar_vistas(url, sink.urls, stats["en_pagina"])
 
     return stats
 
 
-def scrape_all_deruedas(db: Session, max_por_marca: int = 50) -> dict:
+def scrape_all_deruedas(
+    db: Session,
+    max_por_marca: int = 50,
+    presupuesto: Optional[PresupuestoPaginas] = None,
+) -> dict:
     """
     Scrape automático de deRuedas: itera por todas las marcas/modelos
     registrados en el concesionario usando web scraping directo.
-    Soporta paginación (recorre hasta 3 páginas por marca).
+    Soporta paginación (recorre hasta 3 páginas por marca, con las mismas
+    reglas de corte que MercadoLibre/Kavak). Las marcas se recorren por
+    prioridad de segmento (ver app/services/scraping_delta.py).
     """
     total_stats = {"nuevos": 0, "duplicados": 0, "errores": 0}
     MAX_PAGES = 3  # máximo de páginas a recorrer por búsqueda
+    if presupuesto is None:
+        presupuesto = PresupuestoPaginas(SCRAPER_PRESUPUESTO_PAGINAS)
 
     marcas = db.query(Marca).all()
 
@@ -324,27 +329,18 @@ def scrape_all_deruedas(db: Session, max_por_marca: int = 50) -> dict:
         logger.warning("[deRuedas] No hay marcas registradas para scrapear")
         return total_stats
 
-    for marca in marcas:
-        listings_marca = 0
-        for page in range(1, MAX_PAGES + 1):
-            if listings_marca >= max_por_marca:
-                break
-
-            stats = scrape_deruedas_web(
-                db, marca=marca.nombre,
-                limit=max_por_marca - listings_marca,
-                page=page,
-            )
-            for k in total_stats:
-                total_stats[k] += stats[k]
-
-            listings_marca += stats["nuevos"]
-
-            # Si no encontramos nuevos en esta página, no tiene sentido seguir
-            if stats["nuevos"] == 0 and stats["duplicados"] == 0:
-                break
-
-            time.sleep(REQUEST_DELAY)
+    def _buscar(marca: str, modelo: str, completo: bool) -> dict:
+        return paginar(
+            lambda pagina, limit: scrape_deruedas_web(db, marca=marca, limit=limit, page=pagina),
+            etiqueta=f"[deRuedas] {marca}",
+            max_nuevos=max_por_marca,
+            presupuesto=presupuesto,
+            max_paginas=MAX_PAGES,
+            recorrido_completo=completo,
+        )
+
+    busquedas = [(marca.nombre, "") for marca in marcas]
+    total_stats = recorrer_segmentos(db, "deruedas", busquedas, _buscar, presupuesto)
 
     logger.info(f"[deRuedas] Scraping total completado: {total_stats}")
     return total_stats
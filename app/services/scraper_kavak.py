@@ -8,28 +8,21 @@ import requests
 import logging
 import json
 import re
-import time
-from datetime import datetime
-from typing import Optional
+from itertools import islice
+from typing import Iterator, Optional
 from sqlalchemy.orm import Session
-from app.models.pricing import MarketRawListing
+from app.config import SCRAPER_PRESUPUESTO_PAGINAS
 from app.models.marca import Marca
 from app.models.modelo import Modelo
+from app.services.http_client import obtener, recordar_vistas
+from app.services.paginacion import PresupuestoPaginas, paginar
+from app.services.scraping_delta import recorrer_segmentos
+from app.services.raw_listing_sink import SinkRawListings
 
 logger = logging.getLogger(__name__)
 
 KAVAK_BASE_URL = "https://www.kavak.com/ar/usados"
 
-HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-        "(KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
-    ),
-    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-    "Accept-Language": "es-AR,es;q=0.9,en;q=0.8",
-    "Connection": "keep-alive",
-}
-
 REQUEST_DELAY = 1.5
 
 
@@ -59,47 +52,50 @@ def _parse_precio_kavak(text: str) -> Optional[float]:
         return None
 
 
-def _extract_cars_from_html(html: str) -> list[dict]:
+_DECODER = json.JSONDecoder()
+_ESPACIOS = re.compile(r"[\s,]*")
+
+
+def _iter_cars_from_html(html: str) -> Iterator[dict]:
     """
-    Extrae el array de autos del HTML de Kavak.
+    Genera los autos del HTML de Kavak de a uno.
     Kavak usa React SSR y los datos están en un script con formato:
     \\"cars\\":[{\\"id\\":\\"...\\",...}]
+    Solo se desescapa el script que contiene el marcador y cada auto se decodifica
+    con el decoder en C de json (raw_decode), cortando al cerrar el array.
     """
     # Buscar el marcador de cars con doble escape
     marker = '\\"cars\\":['
     start = html.find(marker)
-    if start < 0:
+    escapado = start >= 0
+    if not escapado:
         # Intentar sin doble escape (por si cambian el formato)
         marker = '"cars":['
         start = html.find(marker)
         if start < 0:
-            return []
+            return
 
     idx = start + len(marker)
-    bracket_count = 1
-    i = idx
-    while i < len(html) and bracket_count > 0:
-        ch = html[i]
-        if ch == '\\' and i + 1 < len(html):
-            i += 2  # saltar carácter escapado
-            continue
-        if ch == '[':
-            bracket_count += 1
-        elif ch == ']':
-            bracket_count -= 1
-        i += 1
-
-    raw = html[idx:i - 1]
-
-    # Desescapar: \\" -> "  y \\/ -> /
-    raw = raw.replace('\\"', '"').replace('\\/', '/')
-    cars_json = '[' + raw + ']'
+    fin = html.find("</script>", idx)
+    raw = html[idx:fin] if fin >= 0 else html[idx:]
+    if escapado:
+        # Desescapar: \\" -> "  y \\/ -> /
+        raw = raw.replace('\\"', '"').replace('\\/', '/')
+
+    pos = _ESPACIOS.match(raw, 0).end()
+    while pos < len(raw) and raw[pos] != "]":
+        try:
+            car, pos = _DECODER.raw_decode(raw, pos)
+        except json.JSONDecodeError as e:
+            logger.error(f"[Kavak] Error parseando JSON de cars: {e}")
+            return
+        yield car
+        pos = _ESPACIOS.match(raw, pos).end()
 
-    try:
-        return json.loads(cars_json)
-    except json.JSONDecodeError as e:
-        logger.error(f"[Kavak] Error parseando JSON de cars: {e}")
-        return []
+
+def _extract_cars_from_html(html: str) -> list[dict]:
+    """Extrae el array de autos del HTML de Kavak (ver _iter_cars_from_html)."""
+    return list(_iter_cars_from_html(html))
 
 
 def _parse_car_data(car: dict) -> dict:
@@ -186,15 +182,17 @@ def scrape_kavak_web(
     """
     Scrape directo del sitio web de Kavak.
     Extrae datos JSON embebidos en el HTML.
-    Retorna dict con stats: {nuevos, duplicados, errores}.
+    Retorna dict con stats: {nuevos, duplicados, errores, sin_cambios, en_pagina, truncada}
+    (sin_cambios = 1 si la página era igual a la cacheada; en_pagina = autos leídos
+    de la página; truncada = 1 si `limit` dejó autos sin procesar).
     """
-    stats = {"nuevos": 0, "duplicados": 0, "errores": 0}
+    stats = {"nuevos": 0, "duplicados": 0, "errores": 0, "sin_cambios": 0, "en_pagina": 0, "truncada": 0}
 
     url = _build_kavak_url(marca, modelo, page)
     logger.info(f"[Kavak] Scraping: {url}")
 
     try:
-        response = requests.get(url, headers=HEADERS, timeout=20, allow_redirects=True)
+        response = obtener(url, REQUEST_DELAY)
         if response.status_code != 200:
             logger.warning(f"[Kavak] Status {response.status_code} para {url}")
             stats["errores"] += 1
@@ -204,31 +202,38 @@ def scrape_kavak_web(
         stats["errores"] += 1
         return stats
 
-    cars = _extract_cars_from_html(response.text)
+    if response.sin_cambios:
+        # Página igual a la cacheada: sus listings tienen que contar igual como vistos
+        logger.info(f"[Kavak] Sin cambios desde el último scrapeo: {url}")
+        stats["sin_cambios"] = 1
+        if response.vistas is not None:
+            # Ya se procesó esta misma página: alcanza con marcar sus listings como vistos
+            stats["en_pagina"] = response.vistas["en_pagina"]
+            SinkRawListings(db, "kavak", stats).marcar_vistas_cacheadas(response.vistas["urls"])
+            return stats
+
+    # Solo se decodifican los autos que se van a usar (uno más para saber si quedaron afuera)
+    cars = list(islice(_iter_cars_from_html(response.text), limit + 1))
+    stats["en_pagina"] = len(cars)
+    if len(cars) > limit:
+        stats["truncada"] = 1
+        cars = cars[:limit]
     if not cars:
         logger.info(f"[Kavak] 0 resultados para '{marca} {modelo}'")
         return stats
 
     logger.info(f"[Kavak] {len(cars)} resultados para '{marca} {modelo}'")
 
-    # Cargar URLs existentes
-    existing_urls = set(
-        u for (u,) in db.query(MarketRawListing.url).filter(
-            MarketRawListing.fuente == "kavak"
-        ).all()
-    )
-
-    nuevos = []
-    for car_raw in cars[:limit]:
+    sink = SinkRawListings(db, "kavak", stats)
+    for car_raw in cars:
         try:
             car = _parse_car_data(car_raw)
 
-            if not car["url"] or car["url"] in existing_urls:
+            if not car["url"]:
                 stats["duplicados"] += 1
                 continue
 
-            nuevos.append(MarketRawListing(
-                fuente="kavak",
+            sink.agregar(
                 url=car["url"],
                 titulo=car["titulo"],
                 marca_raw=car["marca"],
@@ -239,49 +244,52 @@ def scrape_kavak_web(
                 moneda=car["moneda"],
                 ubicacion=car["ubicacion"],
                 imagen_url=car["imagen_url"],
-                activo=True,
-                procesado=False,
-                fecha_scraping=datetime.utcnow(),
-            ))
-            existing_urls.add(car["url"])
-            stats["nuevos"] += 1
+            )
 
         except Exception as e:
             logger.error(f"[Kavak] Error procesando auto: {e}")
             stats["errores"] += 1
 
+    nuevos = sink.cerrar()
     if nuevos:
-        db.add_all(nuevos)
-        db.commit()
-        logger.info(f"[Kavak] Guardados {len(nuevos)} nuevos listings")
+        logger.info(f"[Kavak] Guardados {nuevos} nuevos listings")
+    if not stats["truncada"] and not stats["errores"]:
+        recordar_vistas(url, sink.urls, stats["en_pagina"])
 
     return stats
 
 
-def scrape_all_kavak(db: Session, max_por_marca: int = 30) -> dict:
+def scrape_all_kavak(
+    db: Session,
+    max_por_marca: int = 150,
+    presupuesto: Optional[PresupuestoPaginas] = None,
+) -> dict:
     """
-    Scrape automático de Kavak: primero obtiene el catálogo general,
-    luego busca por marcas específicas del concesionario.
+    Scrape automático de Kavak: el catálogo general y las marcas del concesionario.
+    Cada búsqueda pagina (?page=N) hasta juntar `max_por_marca` nuevos o hasta
+    que las páginas dejen de traer datos nuevos (ver app/services/paginacion.py).
+    Las búsquedas se recorren por prioridad de segmento (ver app/services/scraping_delta.py).
     """
-    total_stats = {"nuevos": 0, "duplicados": 0, "errores": 0}
-
-    # 1. Primero scrapear la página general (tiene ~30 autos)
-    stats = scrape_kavak_web(db, limit=30)
-    for k in total_stats:
-        total_stats[k] += stats[k]
-    time.sleep(REQUEST_DELAY)
+    if presupuesto is None:
+        presupuesto = PresupuestoPaginas(SCRAPER_PRESUPUESTO_PAGINAS)
 
-    # 2. Luego buscar por marcas del concesionario
+    # El catálogo general (marca "") más las marcas del concesionario
+    busquedas = [("", "")]
     marcas = db.query(Marca).all()
     if not marcas:
         logger.warning("[Kavak] No hay marcas registradas para scrapear")
-        return total_stats
-
-    for marca in marcas:
-        stats = scrape_kavak_web(db, marca=marca.nombre, limit=max_por_marca)
-        for k in total_stats:
-            total_stats[k] += stats[k]
-        time.sleep(REQUEST_DELAY)
+    busquedas.extend((marca.nombre, "") for marca in marcas)
+
+    def _buscar(marca: str, modelo: str, completo: bool) -> dict:
+        return paginar(
+            lambda pagina, limit: scrape_kavak_web(db, marca=marca, limit=limit, page=pagina),
+            etiqueta=f"[Kavak] {marca or 'catálogo general'}",
+            max_nuevos=max_por_marca,
+            presupuesto=presupuesto,
+            recorrido_completo=completo,
+        )
+
+    total_stats = recorrer_segmentos(db, "kavak", busquedas, _buscar, presupuesto)
 
     logger.info(f"[Kavak] Scraping total completado: {total_stats}")
     return total_stats
@@ -6,32 +6,40 @@ No requiere credenciales de API — scraping directo del sitio público.
 import requests
 import logging
 import re
-import time
-from datetime import datetime
 from typing import Optional
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
 from sqlalchemy.orm import Session
-from app.models.pricing import MarketRawListing
+from app.config import SCRAPER_PRESUPUESTO_PAGINAS
 from app.models.marca import Marca
 from app.models.modelo import Modelo
+from app.services.http_client import obtener, recordar_vistas
+from app.services.paginacion import PresupuestoPaginas, paginar
+from app.services.scraping_delta import recorrer_segmentos
+from app.services.raw_listing_sink import SinkRawListings
+from app.services.html_parser import Coincidencias, SetSelectores, parsear_html
 
 logger = logging.getLogger(__name__)
 
 ML_BASE_URL = "https://autos.mercadolibre.com.ar"
+ML_PAGE_SIZE = 48  # resultados por página (_Desde_ avanza de a 48)
 
-HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-        "(KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
-    ),
-    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-    "Accept-Language": "es-AR,es;q=0.9,en;q=0.8",
-    "Connection": "keep-alive",
-}
-
-# Delay entre requests para ser respetuoso con el sitio
+# Separación mínima entre requests al sitio (rate limiter por host)
 REQUEST_DELAY = 1.5  # segundos
 
+# Extracción de cada resultado (layout clásico "ui-search" y nuevo "poly")
+SELECTORES_ML = SetSelectores({
+    "link": ["a.ui-search-link", "a"],
+    "titulo": [".ui-search-item__title", ".poly-component__title", "h2"],
+    "precio": [".andes-money-amount__fraction"],
+    "moneda": [".andes-money-amount__currency-symbol"],
+    "atributos": [".ui-search-card-attributes__attribute", ".poly-component__attributes-list li"],
+    "ubicacion": [".ui-search-item__location", ".poly-component__location"],
+    "imagen": ["img.ui-search-result-image__element", "img"],
+})
+
+# Solo se construye el árbol de los resultados, no el resto de la página
+SOLO_RESULTADOS_ML = SoupStrainer("li", class_="ui-search-layout__item")
+
 
 def _build_search_url(marca: str, modelo: str = "", offset: int = 0) -> str:
     """Construye la URL de búsqueda de MercadoLibre Autos."""
@@ -89,19 +97,82 @@ def _extraer_marca_modelo_titulo(titulo: str) -> tuple[str, str]:
     return marca, modelo
 
 
+def _url_item(campos: Coincidencias) -> Optional[str]:
+    link_el = campos.uno("link")
+    href = link_el.get("href") if link_el is not None else None
+    return href.split("#")[0].split("?")[0] if href else None
+
+
+def _extraer_item(campos: Coincidencias, marca: str = "", modelo: str = "") -> dict:
+    """Extrae los datos de un resultado de búsqueda (sin la URL)."""
+    titulo = campos.texto("titulo")
+
+    # --- Precio ---
+    price_el = campos.uno("precio")
+    precio = _parse_precio(price_el.text) if price_el is not None else None
+
+    # --- Moneda ---
+    moneda_text = campos.texto("moneda", default="$")
+    moneda = "USD" if "U$S" in moneda_text or "US" in moneda_text else "ARS"
+
+    # --- Año y KM (desde atributos) ---
+    anio = None
+    km = None
+    for a in campos.todos("atributos"):
+        txt = a.text.strip()
+        parsed_anio = _parse_anio(txt)
+        if parsed_anio:
+            anio = parsed_anio
+        elif "km" in txt.lower() or re.match(r"^[\d.]+\s", txt):
+            km = _parse_km(txt)
+
+    # Fallback: extraer año del título
+    if not anio:
+        anio_match = re.search(r"\b(19|20)\d{2}\b", titulo)
+        if anio_match:
+            anio = int(anio_match.group())
+
+    # --- Marca / Modelo ---
+    marca_raw, modelo_raw = _extraer_marca_modelo_titulo(titulo)
+    if marca:
+        marca_raw = marca
+    if modelo:
+        modelo_raw = modelo
+
+    # --- Imagen ---
+    img_el = campos.uno("imagen")
+    img_src = ""
+    if img_el is not None:
+        img_src = img_el.get("data-src") or img_el.get("src") or ""
+
+    return {
+        "titulo": titulo,
+        "marca_raw": marca_raw,
+        "modelo_raw": modelo_raw,
+        "anio": anio,
+        "km": km,
+        "precio": precio,
+        "moneda": moneda,
+        "ubicacion": campos.texto("ubicacion"),
+        "imagen_url": img_src,
+    }
+
+
 def scrape_mercadolibre_web(
     db: Session,
     marca: str = "",
     modelo: str = "",
-    limit: int = 48,
+    limit: int = ML_PAGE_SIZE,
     offset: int = 0,
 ) -> dict:
     """
     Scrape directo del sitio web de MercadoLibre.
     Parsea el HTML de los resultados de búsqueda.
-    Retorna dict con stats: {nuevos, duplicados, errores}.
+    Retorna dict con stats: {nuevos, duplicados, errores, sin_cambios, en_pagina, truncada}
+    (sin_cambios = 1 si la página era igual a la cacheada; en_pagina = items de la
+    página, incluidos los que se descartan; truncada = 1 si `limit` dejó items sin procesar).
     """
-    stats = {"nuevos": 0, "duplicados": 0, "errores": 0}
+    stats = {"nuevos": 0, "duplicados": 0, "errores": 0, "sin_cambios": 0, "en_pagina": 0, "truncada": 0}
 
     if not marca:
         return stats
@@ -110,7 +181,7 @@ def scrape_mercadolibre_web(
     logger.info(f"[ML Web] Scraping: {url}")
 
     try:
-        response = requests.get(url, headers=HEADERS, timeout=20)
+        response = obtener(url, REQUEST_DELAY)
         if response.status_code != 200:
             logger.warning(f"[ML Web] Status {response.status_code} para {url}")
             stats["errores"] += 1
@@ -120,133 +191,67 @@ def scrape_mercadolibre_web(
         stats["errores"] += 1
         return stats
 
-    soup = BeautifulSoup(response.text, "html.parser")
-    items = soup.select("li.ui-search-layout__item")
+    if response.sin_cambios:
+        # Página igual a la cacheada: sus listings tienen que contar igual como vistos
+        logger.info(f"[ML Web] Sin cambios desde el último scrapeo: {url}")
+        stats["sin_cambios"] = 1
+        if response.vistas is not None:
+            # Ya se procesó esta misma página: alcanza con marcar sus listings como vistos
+            stats["en_pagina"] = response.vistas["en_pagina"]
+            SinkRawListings(db, "mercadolibre", stats).marcar_vistas_cacheadas(response.vistas["urls"])
+            return stats
+
+    items = parsear_html(response.text, solo=SOLO_RESULTADOS_ML).find_all("li", class_="ui-search-layout__item")
 
     if not items:
         logger.info(f"[ML Web] 0 resultados para '{marca} {modelo}'")
         return stats
 
     logger.info(f"[ML Web] {len(items)} resultados para '{marca} {modelo}'")
+    stats["en_pagina"] = len(items)
+    stats["truncada"] = int(len(items) > limit)
 
-    # Cargar URLs existentes en memoria
-    existing_urls = set(
-        u for (u,) in db.query(MarketRawListing.url).filter(
-            MarketRawListing.fuente == "mercadolibre"
-        ).all()
-    )
-
-    nuevos = []
+    sink = SinkRawListings(db, "mercadolibre", stats)
     for item in items[:limit]:
         try:
-            # --- Link ---
-            link_el = item.select_one("a.ui-search-link") or item.select_one("a")
-            href = link_el["href"] if link_el and link_el.get("href") else None
-            if not href:
+            campos = SELECTORES_ML.extraer(item)
+            url_clean = _url_item(campos)
+            if url_clean is None:
                 continue
-            url_clean = href.split("#")[0].split("?")[0]
-            if not url_clean or url_clean in existing_urls:
+            if not url_clean:
                 stats["duplicados"] += 1
                 continue
 
-            # --- Título ---
-            title_el = (
-                item.select_one(".ui-search-item__title")
-                or item.select_one(".poly-component__title")
-                or item.select_one("h2")
-            )
-            titulo = title_el.text.strip() if title_el else ""
-
-            # --- Precio ---
-            price_el = item.select_one(".andes-money-amount__fraction")
-            precio = _parse_precio(price_el.text) if price_el else None
-
-            # --- Moneda ---
-            currency_el = item.select_one(".andes-money-amount__currency-symbol")
-            moneda_text = currency_el.text.strip() if currency_el else "$"
-            moneda = "USD" if "U$S" in moneda_text or "US" in moneda_text else "ARS"
-
-            # --- Año y KM (desde atributos) ---
-            attrs = item.select(".ui-search-card-attributes__attribute")
-            if not attrs:
-                attrs = item.select(".poly-component__attributes-list li")
-
-            anio = None
-            km = None
-            for a in attrs:
-                txt = a.text.strip()
-                parsed_anio = _parse_anio(txt)
-                if parsed_anio:
-                    anio = parsed_anio
-                elif "km" in txt.lower() or re.match(r"^[\d.]+\s", txt):
-                    km = _parse_km(txt)
-
-            # Fallback: extraer año del título
-            if not anio:
-                anio_match = re.search(r"\b(19|20)\d{2}\b", titulo)
-                if anio_match:
-                    anio = int(anio_match.group())
-
-            # --- Marca / Modelo ---
-            marca_raw, modelo_raw = _extraer_marca_modelo_titulo(titulo)
-            if marca:
-                marca_raw = marca
-            if modelo:
-                modelo_raw = modelo
-
-            # --- Ubicación ---
-            loc_el = (
-                item.select_one(".ui-search-item__location")
-                or item.select_one(".poly-component__location")
-            )
-            ubicacion = loc_el.text.strip() if loc_el else ""
-
-            # --- Imagen ---
-            img_el = (
-                item.select_one("img.ui-search-result-image__element")
-                or item.select_one("img")
-            )
-            img_src = ""
-            if img_el:
-                img_src = img_el.get("data-src") or img_el.get("src") or ""
-
-            nuevos.append(MarketRawListing(
-                fuente="mercadolibre",
-                url=url_clean,
-                titulo=titulo,
-                marca_raw=marca_raw,
-                modelo_raw=modelo_raw,
-                anio=anio,
-                km=km,
-                precio=precio,
-                moneda=moneda,
-                ubicacion=ubicacion,
-                imagen_url=img_src,
-                activo=True,
-                procesado=False,
-                fecha_scraping=datetime.utcnow(),
-            ))
-            existing_urls.add(url_clean)
-            stats["nuevos"] += 1
+            sink.agregar(url=url_clean, **_extraer_item(campos, marca, modelo))
 
         except Exception as e:
             logger.error(f"[ML Web] Error procesando item: {e}")
             stats["errores"] += 1
 
+    nuevos = sink.cerrar()
     if nuevos:
-        db.add_all(nuevos)
-        db.commit()
-        logger.info(f"[ML Web] Guardados {len(nuevos)} nuevos listings")
+        logger.info(f"[ML Web] Guardados {nuevos} nuevos listings")
+    if not stats["truncada"] and not stats["errores"]:
+        recordar_vistas(url, sink.urls, stats["en_pagina"])
 
     return stats
 
 
-def scrape_all_mercadolibre(db: Session, max_por_marca: int = 48) -> dict:
+def scrape_all_mercadolibre(
+    db: Session,
+    max_por_marca: int = 5 * ML_PAGE_SIZE,
+    presupuesto: Optional[PresupuestoPaginas] = None,
+) -> dict:
     """
     Scrape automático de MercadoLibre: itera por todas las marcas/modelos
     registrados en el concesionario usando web scraping directo.
+    Cada búsqueda pagina hasta juntar `max_por_marca` nuevos o hasta que las
+    páginas dejen de traer datos nuevos (ver app/services/paginacion.py).
+    Las búsquedas se recorren por prioridad de segmento (ver app/services/scraping_delta.py).
     """
     total_stats = {"nuevos": 0, "duplicados": 0, "errores": 0}
+    if presupuesto is None:
+        presupuesto = PresupuestoPaginas(SCRAPER_PRESUPUESTO_PAGINAS)
 
     marcas = db.query(Marca).all()
     modelos = db.query(Modelo).all()
@@ -259,22 +264,29 @@ def scrape_all_mercadolibre(db: Session, max_por_marca: int = 48) -> dict:
     for m in modelos:
         modelos_por_marca.setdefault(m.marca_id, []).append(m)
 
+    busquedas = []
     for marca in marcas:
         marca_modelos = modelos_por_marca.get(marca.id, [])
-
         if not marca_modelos:
-            stats = scrape_mercadolibre_web(db, marca=marca.nombre, limit=max_por_marca)
-            for k in total_stats:
-                total_stats[k] += stats[k]
-            time.sleep(REQUEST_DELAY)
+            busquedas.append((marca.nombre, ""))
         else:
-            for modelo_obj in marca_modelos:
-                stats = scrape_mercadolibre_web(
-                    db, marca=marca.nombre, modelo=modelo_obj.nombre, limit=max_por_marca
-                )
-                for k in total_stats:
-                    total_stats[k] += stats[k]
-                time.sleep(REQUEST_DELAY)
+            busquedas.extend((marca.nombre, modelo_obj.nombre) for modelo_obj in marca_modelos)
+
+    def _buscar(marca: str, modelo: str, completo: bool) -> dict:
+        return paginar(
+            lambda pagina, limit: scrape_mercadolibre_web(
+                db, marca=marca, modelo=modelo,
+                limit=min(limit, ML_PAGE_SIZE),
+                offset=(pagina - 1) * ML_PAGE_SIZE,
+            ),
+            etiqueta=f"[ML Web] {marca} {modelo}".strip(),
+            max_nuevos=max_por_marca,
+            presupuesto=presupuesto,
+            tam_pagina=ML_PAGE_SIZE,
+            recorrido_completo=completo,
+        )
+
+    total_stats = recorrer_segmentos(db, "mercadolibre", busquedas, _buscar, presupuesto)
 
     logger.info(f"[ML Web] Scraping total completado: {total_stats}")
     return total_stats
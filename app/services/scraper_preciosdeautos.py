@@ -10,29 +10,21 @@ y se normalizan igual que MercadoLibre/Kavak/deRuedas.
 import requests
 import logging
 import re
-import time
 from datetime import datetime
 from typing import Optional
 from bs4 import BeautifulSoup
 from sqlalchemy.orm import Session
-from app.models.pricing import MarketRawListing
 from app.models.marca import Marca
 from app.models.modelo import Modelo
+from app.services.http_client import obtener
+from app.services.paginacion import PresupuestoPaginas
+from app.services.scraping_delta import recorrer_segmentos
+from app.services.raw_listing_sink import SinkRawListings
 
 logger = logging.getLogger(__name__)
 
 PDA_BASE_URL = "https://preciosdeautos.com.ar"
 
-HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-        "(KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
-    ),
-    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-    "Accept-Language": "es-AR,es;q=0.9,en;q=0.8",
-    "Connection": "keep-alive",
-}
-
 REQUEST_DELAY = 1.5  # segundos
 
 
@@ -82,7 +74,7 @@ def _get_modelos_from_marca_page(marca: str) -> list[dict]:
     logger.debug(f"[PreciosDeAutos] Listando modelos: {url}")
 
     try:
-        response = requests.get(url, headers=HEADERS, timeout=20)
+        response = obtener(url, REQUEST_DELAY)
         if response.status_code != 200:
             logger.warning(f"[PreciosDeAutos] Status {response.status_code} para {url}")
             return []
@@ -109,22 +101,24 @@ def _get_modelos_from_marca_page(marca: str) -> list[dict]:
 
 def _scrape_modelo_precios(
     marca: str, modelo: str, modelo_url: str
-) -> list[dict]:
+) -> tuple[list[dict], bool]:
     """
     Scrapea los precios por año de un modelo específico.
     Navega /anos_modelos/autos/{marca}/{modelo} y extrae la tabla de precios.
-    Retorna lista de dicts: [{anio, precio_min, precio_max, versiones}, ...]
+    Retorna (precios, sin_cambios): precios es una lista de dicts
+    [{anio, precio_min, precio_max, versiones}, ...] y sin_cambios indica si la
+    página era igual a la cacheada (igual se procesa, para marcar sus filas vistas).
     """
     logger.debug(f"[PreciosDeAutos] Scraping precios: {modelo_url}")
 
     try:
-        response = requests.get(modelo_url, headers=HEADERS, timeout=20)
+        response = obtener(modelo_url, REQUEST_DELAY)
         if response.status_code != 200:
             logger.warning(f"[PreciosDeAutos] Status {response.status_code} para {modelo_url}")
-            return []
+            return [], False
     except requests.RequestException as e:
         logger.error(f"[PreciosDeAutos] Error de conexión: {e}")
-        return []
+        return [], False
 
     soup = BeautifulSoup(response.text, "html.parser")
     resultados = []
@@ -187,7 +181,7 @@ def _scrape_modelo_precios(
             "url": modelo_url,
         })
 
-    return resultados
+    return resultados, response.sin_cambios
 
 
 def scrape_preciosdeautos(
@@ -199,7 +193,8 @@ def scrape_preciosdeautos(
     """
     Scrape de precios de referencia de PreciosDeAutos para una marca.
     Si modelos_filtro tiene valores, solo scrapea esos modelos.
-    Retorna dict con stats: {nuevos, duplicados, errores}.
+    Retorna dict con stats: {nuevos, duplicados, errores, paginas, sin_cambios}
+    (paginas = páginas de modelo pedidas; sin_cambios = cuántas eran iguales a la cacheada).
     """
     stats = {"nuevos": 0, "duplicados": 0, "errores": 0}
 
@@ -219,75 +214,61 @@ def scrape_preciosdeautos(
             if any(f in m["nombre"].lower() or m["nombre"].lower() in f for f in filtro_lower)
         ]
 
-    # Cargar URLs existentes
-    existing_keys = set(
-        f"{r.marca_raw}|{r.modelo_raw}|{r.anio}"
-        for r in db.query(MarketRawListing).filter(
-            MarketRawListing.fuente == "preciosdeautos"
-        ).all()
-    )
-
-    nuevos = []
-    count = 0
+    stats.update(paginas=0, sin_cambios=0)
+    nuevos = 0
     for modelo_info in modelos_sitio:
-        if count >= limit:
+        if nuevos >= limit:
             break
 
-        time.sleep(REQUEST_DELAY)
-        precios = _scrape_modelo_precios(marca, modelo_info["nombre"], modelo_info["url"])
-
-        for p in precios:
-            if count >= limit:
-                break
-
-            # Deduplicar por marca+modelo+año
-            key = f"{p['marca']}|{p['modelo']}|{p['anio']}"
-            if key in existing_keys:
-                stats["duplicados"] += 1
-                continue
-
-            # Construir un título descriptivo
-            titulo = f"{p['marca']} {p['modelo']} {p['anio']}"
-            if p["es_0km"]:
-                titulo += " 0km"
-            if p["precio_min"] and p["precio_max"]:
-                titulo += f" (${p['precio_min']:,.0f} - ${p['precio_max']:,.0f})"
-
-            # URL única para deduplicación: modelo_url#anio
-            url_unica = f"{p['url']}#{p['anio']}"
-
-            nuevos.append(MarketRawListing(
-                fuente="preciosdeautos",
-                url=url_unica,
-                titulo=titulo,
-                marca_raw=p["marca"],
-                modelo_raw=p["modelo"],
-                anio=p["anio"],
-                km=None,  # No aplica para precios de referencia
-                precio=p["precio_promedio"],
-                moneda="ARS",
-                ubicacion="Nacional",  # Precios nacionales de referencia
-                imagen_url="",
-                activo=True,
-                procesado=False,
-                fecha_scraping=datetime.utcnow(),
-            ))
-            existing_keys.add(key)
-            stats["nuevos"] += 1
-            count += 1
+        precios, sin_cambios = _scrape_modelo_precios(marca, modelo_info["nombre"], modelo_info["url"])
+        stats["paginas"] += 1
+        stats["sin_cambios"] += int(sin_cambios)
+
+        # El límite cuenta solo nuevos: se escribe en tandas de lo que falta para llegar.
+        # Cada tanda usa su propio sink, que se cierra para saber cuántas filas fueron nuevas.
+        while precios and nuevos < limit:
+            faltan = limit - nuevos
+            tanda, precios = precios[:faltan], precios[faltan:]
+            sink = SinkRawListings(db, "preciosdeautos", stats)
+            for p in tanda:
+                # Construir un título descriptivo
+                titulo = f"{p['marca']} {p['modelo']} {p['anio']}"
+                if p["es_0km"]:
+                    titulo += " 0km"
+                if p["precio_min"] and p["precio_max"]:
+                    titulo += f" (${p['precio_min']:,.0f} - ${p['precio_max']:,.0f})"
+
+                # URL única para deduplicación (marca+modelo+año): modelo_url#anio
+                sink.agregar(
+                    url=f"{p['url']}#{p['anio']}",
+                    titulo=titulo,
+                    marca_raw=p["marca"],
+                    modelo_raw=p["modelo"],
+                    anio=p["anio"],
+                    km=None,  # No aplica para precios de referencia
+                    precio=p["precio_promedio"],
+                    moneda="ARS",
+                    ubicacion="Nacional",  # Precios nacionales de referencia
+                    imagen_url="",
+                )
+            nuevos += sink.cerrar()
 
     if nuevos:
-        db.add_all(nuevos)
-        db.commit()
-        logger.info(f"[PreciosDeAutos] Guardados {len(nuevos)} nuevos registros de precios")
+        logger.info(f"[PreciosDeAutos] Guardados {nuevos} nuevos registros de precios")
 
     return stats
 
 
-def scrape_all_preciosdeautos(db: Session, max_por_marca: int = 50) -> dict:
+def scrape_all_preciosdeautos(
+    db: Session,
+    max_por_marca: int = 50,
+    presupuesto: Optional[PresupuestoPaginas] = None,
+) -> dict:
     """
     Scrape automático de PreciosDeAutos: itera por todas las marcas
     registradas en el concesionario y obtiene precios de referencia.
+    Las marcas se recorren por prioridad de segmento (ver app/services/scraping_delta.py);
+    del presupuesto solo se respeta el plazo (las páginas por modelo no se cuentan).
     """
     total_stats = {"nuevos": 0, "duplicados": 0, "errores": 0}
 
@@ -303,18 +284,17 @@ def scrape_all_preciosdeautos(db: Session, max_por_marca: int = 50) -> dict:
     for m in modelos:
         modelos_por_marca.setdefault(m.marca_id, []).append(m.nombre)
 
-    for marca in marcas:
-        modelos_filtro = modelos_por_marca.get(marca.id, None)
+    filtros = {marca.nombre: modelos_por_marca.get(marca.id, None) for marca in marcas}
 
-        stats = scrape_preciosdeautos(
-            db, marca=marca.nombre,
-            modelos_filtro=modelos_filtro,
+    def _buscar(marca: str, modelo: str, completo: bool) -> dict:
+        return scrape_preciosdeautos(
+            db, marca=marca,
+            modelos_filtro=filtros[marca],
             limit=max_por_marca,
         )
-        for k in total_stats:
-            total_stats[k] += stats[k]
 
-        time.sleep(REQUEST_DELAY)
+    busquedas = [(marca.nombre, "") for marca in marcas]
+    total_stats = recorrer_segmentos(db, "preciosdeautos", busquedas, _buscar, presupuesto, usa_paginas=False)
 
     logger.info(f"[PreciosDeAutos] Scraping total completado: {total_stats}")
     return total_stats
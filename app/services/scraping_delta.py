@@ -0,0 +1,144 @@
+"""
+Scraping incremental (delta) por segmentos.
+Un segmento es una búsqueda de una fuente: (fuente, marca, modelo). Después de
+cada búsqueda se guarda en `scraping_segmentos` cuándo se hizo, cuánto tardó y
+qué proporción de lo visto fue nuevo o cambió de precio (promedios móviles).
+
+En cada corrida los segmentos se recorren de mayor a menor prioridad: los que
+nunca se scrapearon primero y después los de más movimiento esperado
+(tasa de cambio × horas desde la última visita). Con un presupuesto con plazo
+(`--budget-minutes`) la corrida corta cuando vence, o cuando se agotan las
+páginas, y lo que quedó sin visitar son los segmentos más quietos.
+
+Un segmento que no llegó a pedir ninguna página no se registra, y uno cuyas
+páginas vinieron todas sin cambios (304 o mismo hash) solo actualiza cuándo se
+visitó: las tasas no decaen por una visita que no observó el listado de nuevo.
+
+Cada LISTINGS_DIAS_RECORRIDO_COMPLETO días la búsqueda de un segmento se pide
+completa (sin cortar por duplicados); si llega al final del listado se guarda
+en `ultimo_recorrido_completo`, que es lo que usa la vigencia para desactivar
+lo que ya no aparece (ver app/services/vigencia.py).
+"""
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from sqlalchemy.orm import Session
+from app.config import LISTINGS_DIAS_RECORRIDO_COMPLETO
+from app.models.pricing import ScrapingSegmento
+from app.services.paginacion import PresupuestoPaginas
+
+logger = logging.getLogger(__name__)
+
+# Peso de la última corrida en los promedios móviles
+ALFA = 0.5
+# Tasa mínima: hasta un segmento sin movimiento sube de prioridad con el tiempo
+TASA_MINIMA = 0.02
+
+
+def prioridad(segmento: Optional[ScrapingSegmento], ahora: datetime) -> float:
+    """Movimiento esperado desde la última visita; infinito si nunca se visitó."""
+    if segmento is None or segmento.ultimo_scrapeo is None:
+        return float("inf")
+    horas = max((ahora - segmento.ultimo_scrapeo).total_seconds() / 3600, 0.0)
+    return (segmento.tasa_nuevos + segmento.tasa_cambios_precio + TASA_MINIMA) * horas
+
+
+def toca_recorrido_completo(segmento: Optional[ScrapingSegmento], ahora: datetime) -> bool:
+    """True si el segmento no se recorrió completo en los últimos LISTINGS_DIAS_RECORRIDO_COMPLETO días."""
+    if segmento is None or segmento.ultimo_recorrido_completo is None:
+        return True
+    return segmento.ultimo_recorrido_completo < ahora - timedelta(days=LISTINGS_DIAS_RECORRIDO_COMPLETO)
+
+
+def _registrar(
+    db: Session,
+    fuente: str,
+    segmentos: dict[tuple[str, str], ScrapingSegmento],
+    marca: str,
+    modelo: str,
+    stats: dict,
+    duracion: float,
+) -> None:
+    vistos = stats.get("nuevos", 0) + stats.get("duplicados", 0)
+    if vistos == 0 and stats.get("errores", 0):
+        # Falló la fuente: no se actualiza, así el segmento mantiene su prioridad
+        return
+    paginas = stats.get("paginas")
+    sin_cambios = paginas is not None and 0 < paginas == stats.get("sin_cambios", 0)
+
+    segmento = segmentos.get((marca, modelo))
+    if segmento is None:
+        segmento = ScrapingSegmento(
+            fuente=fuente, marca=marca, modelo=modelo,
+            tasa_nuevos=0.0, tasa_cambios_precio=0.0, corridas=0,
+        )
+        db.add(segmento)
+        segmentos[(marca, modelo)] = segmento
+
+    segmento.ultimo_scrapeo = datetime.utcnow()
+    if stats.get("completo"):
+        segmento.ultimo_recorrido_completo = segmento.ultimo_scrapeo
+    segmento.duracion_segundos = duracion
+    segmento.vistos = vistos
+    segmento.nuevos = stats.get("nuevos", 0)
+    if sin_cambios and segmento.corridas:
+        db.commit()
+        return
+
+    tasa_nuevos = stats.get("nuevos", 0) / vistos if vistos else 0.0
+    tasa_cambios = stats.get("cambios_precio", 0) / vistos if vistos else 0.0
+    if segmento.corridas:
+        tasa_nuevos = ALFA * tasa_nuevos + (1 - ALFA) * segmento.tasa_nuevos
+        tasa_cambios = ALFA * tasa_cambios + (1 - ALFA) * segmento.tasa_cambios_precio
+
+    segmento.tasa_nuevos = tasa_nuevos
+    segmento.tasa_cambios_precio = tasa_cambios
+    segmento.corridas += 1
+    db.commit()
+
+
+def recorrer_segmentos(
+    db: Session,
+    fuente: str,
+    busquedas: list[tuple[str, str]],
+    scrape_busqueda: Callable[[str, str, bool], dict],
+    presupuesto: Optional[PresupuestoPaginas] = None,
+    usa_paginas: bool = True,
+) -> dict:
+    """
+    Corre `scrape_busqueda(marca, modelo, completo)` para cada búsqueda, en orden
+    de prioridad, hasta terminar, hasta que venza el plazo del presupuesto o, si
+    la fuente pagina con él (`usa_paginas`), hasta que se agoten sus páginas.
+    `completo` pide recorrer la búsqueda hasta el final (ver toca_recorrido_completo).
+    Retorna la suma de las stats {nuevos, duplicados, errores}.
+    """
+    total_stats = {"nuevos": 0, "duplicados": 0, "errores": 0}
+    segmentos = {
+        (s.marca, s.modelo): s
+        for s in db.query(ScrapingSegmento).filter(ScrapingSegmento.fuente == fuente).all()
+    }
+    ahora = datetime.utcnow()
+    ordenadas = sorted(
+        dict.fromkeys(busquedas),
+        key=lambda b: prioridad(segmentos.get(b), ahora),
+        reverse=True,
+    )
+
+    for i, (marca, modelo) in enumerate(ordenadas):
+        if presupuesto is not None and presupuesto.vencido:
+            logger.info(f"[Delta] {fuente}: plazo vencido, quedan {len(ordenadas) - i} segmentos para la próxima corrida")
+            break
+        if presupuesto is not None and usa_paginas and presupuesto.restantes == 0:
+            logger.info(f"[Delta] {fuente}: páginas agotadas, quedan {len(ordenadas) - i} segmentos para la próxima corrida")
+            break
+        inicio = time.perf_counter()
+        stats = scrape_busqueda(marca, modelo, toca_recorrido_completo(segmentos.get((marca, modelo)), ahora))
+        for k in total_stats:
+            total_stats[k] += stats.get(k, 0)
+        if stats.get("paginas") == 0:
+            # No se pidió ninguna página (presupuesto agotado entre medio): no hay nada que registrar
+            continue
+        _registrar(db, fuente, segmentos, marca, modelo, stats, time.perf_counter() - inicio)
+
+    return total_stats
@@ -0,0 +1,103 @@
+"""
+Orquestador de scraping.
+Corre las fuentes en paralelo con un pool de threads (una Session propia por
+thread); la cortesía con cada sitio la mantiene el rate limiter por host
+(app/services/rate_limiter.py). Las stats por fuente se suman igual que antes.
+Las fuentes web comparten un presupuesto por corrida: páginas y, en modo
+delta, un plazo (app/services/scraping_delta.py prioriza los segmentos).
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Optional
+from app.config import SCRAPER_MAX_WORKERS, SCRAPER_PRESUPUESTO_PAGINAS
+from app.database import SessionLocal
+from app.services.paginacion import PresupuestoPaginas
+from app.services.scraper_mercadolibre import scrape_all_mercadolibre
+from app.services.scraper_kavak import scrape_all_kavak
+from app.services.scraper_deruedas import scrape_all_deruedas
+from app.services.scraper_preciosdeautos import scrape_all_preciosdeautos
+from app.services.scraper_ai import scrape_all_ai
+
+logger = logging.getLogger(__name__)
+
+SCRAPERS = {
+    "mercadolibre": scrape_all_mercadolibre,
+    "kavak": scrape_all_kavak,
+    "deruedas": scrape_all_deruedas,
+    "preciosdeautos": scrape_all_preciosdeautos,
+    "ai": scrape_all_ai,
+}
+
+# Fuentes de "all" en /pricing/scrape y run_scraper.py (la de IA se pide aparte)
+FUENTES_WEB = ["mercadolibre", "kavak", "deruedas", "preciosdeautos"]
+
+# Fuentes que reciben el presupuesto de la corrida (la de IA tiene sus propios límites)
+FUENTES_CON_PRESUPUESTO = set(FUENTES_WEB)
+
+
+def _stats_vacias() -> dict:
+    return {"nuevos": 0, "duplicados": 0, "errores": 0}
+
+
+def sumar_stats(stats_por_fuente: dict[str, dict]) -> dict:
+    total = _stats_vacias()
+    for stats in stats_por_fuente.values():
+        for k in total:
+            total[k] += stats.get(k, 0)
+    return total
+
+
+def _ejecutar_fuente(fuente: str, max_por_marca: Optional[int], presupuesto: PresupuestoPaginas) -> dict:
+    """Corre un scraper con su propia Session (las Session no se comparten entre threads)."""
+    db = SessionLocal()
+    inicio = time.perf_counter()
+    kwargs = {}
+    if max_por_marca is not None and fuente != "ai":
+        kwargs["max_por_marca"] = max_por_marca
+    if fuente in FUENTES_CON_PRESUPUESTO:
+        kwargs["presupuesto"] = presupuesto
+    try:
+        stats = SCRAPERS[fuente](db, **kwargs)
+        logger.info(f"[Orquestador] {fuente}: {stats} en {time.perf_counter() - inicio:.1f}s")
+        return stats
+    finally:
+        db.close()
+
+
+def ejecutar_scrapers(
+    fuentes: Iterable[str],
+    max_por_marca: Optional[int] = None,
+    max_workers: int = SCRAPER_MAX_WORKERS,
+    max_paginas: int = SCRAPER_PRESUPUESTO_PAGINAS,
+    limite_minutos: Optional[float] = None,
+) -> dict[str, dict]:
+    """
+    Ejecuta las fuentes pedidas en paralelo.
+    `max_paginas` es el presupuesto de páginas de toda la corrida, compartido
+    por las fuentes web. Con `limite_minutos` (modo delta) cada fuente recorre
+    sus segmentos por prioridad y deja de empezar búsquedas al vencer el plazo.
+    Retorna {fuente: {nuevos, duplicados, errores}}; si una fuente falla se loguea
+    y cuenta como un error, sin cortar las demás.
+    """
+    fuentes = [f for f in dict.fromkeys(fuentes) if f in SCRAPERS]
+    if not fuentes:
+        return {}
+
+    presupuesto = PresupuestoPaginas(
+        max_paginas, limite_minutos * 60 if limite_minutos is not None else None
+    )
+
+    resultados: dict[str, dict] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(fuentes))), thread_name_prefix="scraper") as pool:
+        futuros = {pool.submit(_ejecutar_fuente, f, max_por_marca, presupuesto): f for f in fuentes}
+        for futuro in as_completed(futuros):
+            fuente = futuros[futuro]
+            try:
+                resultados[fuente] = futuro.result()
+            except Exception as e:
+                logger.error(f"[Orquestador] Error en scraper {fuente}: {e}")
+                resultados[fuente] = {**_stats_vacias(), "errores": 1}
+
+    logger.info(f"[Orquestador] Páginas usadas: {presupuesto.usadas}/{presupuesto.max_paginas}")
+    return {f: resultados[f] for f in fuentes}
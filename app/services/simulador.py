@@ -7,11 +7,10 @@ import statistics
 import logging
 from typing import Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from app.models.auto import Auto
 from app.models.venta import Venta
-from app.models.pricing import MarketListing
 from app.services.pricing_engine import clasificar_competitividad
+from app.services.market_stats import mediana_mercado
 
 logger = logging.getLogger(__name__)
 
@@ -65,6 +64,18 @@ def _obtener_historico_ventas(
     return resultados
 
 
+def _resumir_historico(historico: list[dict]) -> Optional[tuple[float, float]]:
+    """
+    Resume el histórico en (precio_promedio, dias_promedio).
+    Retorna None si no hay suficientes ventas (mínimo 3) para usarlo.
+    """
+    if not historico or len(historico) < 3:
+        return None
+    precios = [h["precio_venta"] for h in historico]
+    dias = [h["dias_en_stock"] for h in historico]
+    return statistics.mean(precios), statistics.mean(dias)
+
+
 def _estimar_dias_venta(
     precio_propuesto: float,
     precio_mercado: float,
@@ -75,14 +86,20 @@ def _estimar_dias_venta(
     1. Si hay histórico: interpolación lineal precio → días
     2. Si no: modelo basado en desviación del precio de mercado
     """
-    if historico and len(historico) >= 3:
-        # Usar histórico: correlación simple precio → días
-        precios = [h["precio_venta"] for h in historico]
-        dias = [h["dias_en_stock"] for h in historico]
+    return _estimar_dias_desde_resumen(
+        precio_propuesto, precio_mercado, _resumir_historico(historico)
+    )
+
 
-        # Interpolación lineal simple
-        precio_promedio = statistics.mean(precios)
-        dias_promedio = statistics.mean(dias)
+def _estimar_dias_desde_resumen(
+    precio_propuesto: float,
+    precio_mercado: float,
+    resumen_historico: Optional[tuple[float, float]],
+) -> float:
+    """Igual que `_estimar_dias_venta`, con el histórico ya resumido."""
+    if resumen_historico:
+        # Interpolación lineal simple sobre el promedio histórico
+        precio_promedio, dias_promedio = resumen_historico
 
         if precio_promedio > 0:
             # Por cada % de diferencia vs promedio histórico, ajustar días
@@ -121,6 +138,47 @@ def _estimar_probabilidad_30dias(dias_estimados: float) -> float:
         return round(max(5, (30 / dias_estimados) * 60), 1)
 
 
+def _simular_precios(
+    db: Session,
+    auto: Auto,
+    precios_propuestos: list[float],
+) -> list[dict]:
+    """
+    Simula una lista de precios para un auto.
+    Mediana de mercado e histórico se cargan una sola vez; después cada precio
+    es solo aritmética sobre esos valores.
+    """
+    # Obtener precio de mercado (mediana de comparables en pesos, como el precio del auto)
+    precio_mercado = mediana_mercado(
+        db, auto.marca_id, auto.modelo_id, auto.anio - 1, auto.anio + 1, moneda="ARS"
+    )
+
+    # Obtener histórico de ventas similares
+    resumen_historico = _resumir_historico(_obtener_historico_ventas(
+        db, auto.marca_id, auto.modelo_id, auto.anio
+    ))
+
+    # Margen estimado (precio propuesto - 85% como costo estimado)
+    precio_compra_est = auto.precio * 0.85
+
+    resultados = []
+    for precio_propuesto in precios_propuestos:
+        # Estimar días y probabilidad
+        dias = _estimar_dias_desde_resumen(precio_propuesto, precio_mercado, resumen_historico)
+        probabilidad = _estimar_probabilidad_30dias(dias)
+        competitividad = clasificar_competitividad(precio_propuesto, precio_mercado) if precio_mercado else "sin_datos"
+        margen = precio_propuesto - precio_compra_est
+
+        resultados.append({
+            "precio_propuesto": round(precio_propuesto, 2),
+            "dias_estimados": round(dias, 1),
+            "probabilidad_venta_30dias": probabilidad,
+            "margen_estimado": round(margen, 2),
+            "competitividad": competitividad,
+        })
+    return resultados
+
+
 def simular_venta(
     db: Session,
     auto_id: int,
@@ -134,44 +192,7 @@ def simular_venta(
     if not auto:
         return {"error": "Auto no encontrado"}
 
-    # Obtener precio de mercado (mediana de comparables)
-    comparables = (
-        db.query(MarketListing)
-        .filter(
-            MarketListing.marca_id == auto.marca_id,
-            MarketListing.modelo_id == auto.modelo_id,
-            MarketListing.anio >= auto.anio - 1,
-            MarketListing.anio <= auto.anio + 1,
-            MarketListing.activo == True,
-            MarketListing.precio > 0,
-        )
-        .all()
-    )
-
-    precios_mercado = [c.precio for c in comparables]
-    precio_mercado = statistics.median(precios_mercado) if precios_mercado else 0
-
-    # Obtener histórico de ventas similares
-    historico = _obtener_historico_ventas(
-        db, auto.marca_id, auto.modelo_id, auto.anio
-    )
-
-    # Estimar días y probabilidad
-    dias = _estimar_dias_venta(precio_propuesto, precio_mercado, historico)
-    probabilidad = _estimar_probabilidad_30dias(dias)
-    competitividad = clasificar_competitividad(precio_propuesto, precio_mercado) if precio_mercado else "sin_datos"
-
-    # Margen estimado (precio propuesto - 85% como costo estimado)
-    precio_compra_est = auto.precio * 0.85
-    margen = precio_propuesto - precio_compra_est
-
-    return {
-        "precio_propuesto": round(precio_propuesto, 2),
-        "dias_estimados": round(dias, 1),
-        "probabilidad_venta_30dias": probabilidad,
-        "margen_estimado": round(margen, 2),
-        "competitividad": competitividad,
-    }
+    return _simular_precios(db, auto, [precio_propuesto])[0]
 
 
 def simular_rango(
@@ -183,19 +204,19 @@ def simular_rango(
 ) -> list[dict]:
     """
     Genera múltiples simulaciones entre un rango de precios.
-    Pensado para el slider del frontend.
+    Pensado para el slider del frontend: carga auto, mercado e histórico
+    una sola vez por request y evalúa todos los precios sobre esos datos.
     """
     if steps < 2:
         steps = 2
     if steps > 50:
         steps = 50
 
-    incremento = (precio_max - precio_min) / (steps - 1)
-    resultados = []
+    auto = db.query(Auto).filter(Auto.id == auto_id).first()
+    if not auto:
+        return [{"error": "Auto no encontrado"} for _ in range(steps)]
 
-    for i in range(steps):
-        precio = precio_min + (incremento * i)
-        sim = simular_venta(db, auto_id, precio)
-        resultados.append(sim)
+    incremento = (precio_max - precio_min) / (steps - 1)
+    precios = [precio_min + (incremento * i) for i in range(steps)]
 
-    return resultados
+    return _simular_precios(db, auto, precios)
@@ -0,0 +1,133 @@
+"""
+Trabajos en segundo plano de /market/ai_sugerir.
+En modo `job` el endpoint responde enseguida con los candidates y un job_id, y
+el texto de la IA se genera en una tarea del event loop (con streaming, así
+los fragmentos se pueden ir mostrando). El cliente lo obtiene consultando
+GET /market/ai_sugerir/{job_id} o escuchando los Server-Sent Events de
+GET /market/ai_sugerir/{job_id}/eventos.
+
+Los trabajos viven en memoria del proceso, AI_TRABAJOS_TTL_SEGUNDOS después de
+crearse y hasta AI_TRABAJOS_MAX a la vez; al descartar uno que sigue corriendo
+se cancela su llamada a la IA. Con varios workers de uvicorn el
+polling tiene que llegar al mismo worker que creó el trabajo.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+from app.config import AI_TRABAJOS_MAX, AI_TRABAJOS_TTL_SEGUNDOS
+from app.services.ai_client import deepseek_chat_stream
+
+logger = logging.getLogger(__name__)
+
+
+class TrabajoSugerencia:
+    """Texto de la IA en construcción; los lectores esperan fragmentos nuevos con `esperar`."""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.estado = "pendiente"
+        self.partes: list[str] = []
+        self.error: Optional[str] = None
+        self.creado = time.monotonic()
+        self._cambio = asyncio.Condition()
+        self._tarea: Optional[asyncio.Task] = None
+
+    @property
+    def terminado(self) -> bool:
+        return self.estado in ("listo", "error")
+
+    async def _notificar(self) -> None:
+        async with self._cambio:
+            self._cambio.notify_all()
+
+    async def correr(self, messages: list[dict], api_key: Optional[str]) -> None:
+        try:
+            async for fragmento in deepseek_chat_stream(messages, api_key=api_key):
+                self.partes.append(fragmento)
+                await self._notificar()
+            self.estado = "listo"
+        except asyncio.CancelledError:
+            self.error = "trabajo descartado"
+            self.estado = "error"
+            await self._notificar()
+            raise
+        except Exception as e:
+            logger.error(f"[TrabajosAI] Trabajo {self.id} falló: {e}")
+            self.error = str(e)
+            self.estado = "error"
+        await self._notificar()
+
+    def fallar(self, error: str) -> None:
+        """Marca el trabajo como fallido sin haberlo corrido (no hay lectores esperando aún)."""
+        self.error = error
+        self.estado = "error"
+
+    def cancelar(self) -> None:
+        if self._tarea is not None and not self._tarea.done():
+            self._tarea.cancel()
+
+    async def esperar(self, vistos: int, timeout: float) -> bool:
+        """Espera a que haya más de `vistos` fragmentos o termine. False si venció el timeout."""
+        async with self._cambio:
+            try:
+                await asyncio.wait_for(
+                    self._cambio.wait_for(lambda: len(self.partes) > vistos or self.terminado),
+                    timeout,
+                )
+                return True
+            except asyncio.TimeoutError:
+                return False
+
+    def resumen(self) -> dict:
+        if self.estado == "error":
+            sugerencia = f"IA no disponible: {self.error}"
+        else:
+            sugerencia = "".join(self.partes) if self.partes else None
+        return {"job_id": self.id, "estado": self.estado, "sugerencia": sugerencia}
+
+
+class AlmacenTrabajos:
+    def __init__(self, ttl_segundos: float = AI_TRABAJOS_TTL_SEGUNDOS, max_trabajos: int = AI_TRABAJOS_MAX):
+        self.ttl = ttl_segundos
+        self.max_trabajos = max_trabajos
+        self._trabajos: "OrderedDict[str, TrabajoSugerencia]" = OrderedDict()
+
+    def _purgar(self) -> None:
+        ahora = time.monotonic()
+        # Ordenados por creación: se corta en el primero que no venció
+        while self._trabajos:
+            trabajo = next(iter(self._trabajos.values()))
+            if ahora - trabajo.creado <= self.ttl and len(self._trabajos) < self.max_trabajos:
+                break
+            _id, descartado = self._trabajos.popitem(last=False)
+            descartado.cancelar()
+
+    def _nuevo(self) -> TrabajoSugerencia:
+        self._purgar()
+        trabajo = TrabajoSugerencia()
+        self._trabajos[trabajo.id] = trabajo
+        return trabajo
+
+    def lanzar(self, messages: list[dict], api_key: Optional[str]) -> TrabajoSugerencia:
+        """Crea el trabajo y arranca la llamada a la IA en el event loop actual."""
+        trabajo = self._nuevo()
+        trabajo._tarea = asyncio.create_task(trabajo.correr(messages, api_key))
+        return trabajo
+
+    def fallido(self, error: str) -> TrabajoSugerencia:
+        """Crea un trabajo ya en estado error (p. ej. sin API key), consultable como los demás."""
+        trabajo = self._nuevo()
+        trabajo.fallar(error)
+        return trabajo
+
+    def obtener(self, job_id: str) -> Optional[TrabajoSugerencia]:
+        trabajo = self._trabajos.get(job_id)
+        if trabajo is None or time.monotonic() - trabajo.creado > self.ttl:
+            return None
+        return trabajo
+
+
+trabajos = AlmacenTrabajos()
@@ -0,0 +1,125 @@
+"""
+Vigencia de los market listings.
+Cada scrapeo que vuelve a encontrar una URL actualiza `fecha_ultima_vista`
+(en lotes, desde SinkRawListings). Acá se desactivan en una sola sentencia los
+listings que no se vieron en `dias` días, se reactivan los que volvieron a
+aparecer y se refrescan las market_stats de los grupos afectados.
+
+Solo se desactivan listings de un segmento (fuente, marca, modelo) que se
+recorrió completo dentro de la ventana (`ultimo_recorrido_completo`, ver
+app/services/scraping_delta.py): una búsqueda que cortó por duplicados o por
+presupuesto no vio las páginas siguientes, y si una fuente está caída (o sus
+datos vienen de un import) no hay recorrido completo, así que sus listings no
+vencen por no haberse visto.
+
+Opcionalmente, los inactivos con más de `dias_archivo` días sin verse se mueven
+a `market_listings_archivo`, para que la tabla caliente (y el índice parcial
+de comparables) tenga solo lo vigente.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import DateTime, delete, func, insert, literal, or_, select, update
+from sqlalchemy.orm import Session
+from app.config import LISTINGS_DIAS_ARCHIVO, LISTINGS_DIAS_VIGENCIA
+from app.models.marca import Marca
+from app.models.modelo import Modelo
+from app.models.pricing import MarketListing, MarketListingArchivo, ScrapingSegmento
+from app.services.market_stats import refrescar_market_stats
+
+logger = logging.getLogger(__name__)
+
+COLUMNAS_ARCHIVO = (
+    "id", "raw_listing_id", "fuente", "marca_id", "modelo_id", "anio", "km", "precio",
+    "moneda", "ubicacion", "url", "fecha_publicacion", "fecha_scraping", "fecha_ultima_vista",
+)
+
+
+def _ultima_vista():
+    return func.coalesce(MarketListing.fecha_ultima_vista, MarketListing.fecha_scraping)
+
+
+def _clave_stats():
+    return (
+        MarketListing.marca_id, MarketListing.modelo_id, MarketListing.anio,
+        func.coalesce(MarketListing.moneda, "ARS"),
+    )
+
+
+def _recorrido_completo_desde(limite: datetime):
+    """EXISTS: algún segmento que abarca al listing se recorrió completo desde `limite`."""
+    nombre_marca = select(func.lower(Marca.nombre)).where(Marca.id == MarketListing.marca_id).scalar_subquery()
+    nombre_modelo = select(func.lower(Modelo.nombre)).where(Modelo.id == MarketListing.modelo_id).scalar_subquery()
+    return (
+        select(ScrapingSegmento.id)
+        .where(
+            ScrapingSegmento.fuente == MarketListing.fuente,
+            ScrapingSegmento.ultimo_recorrido_completo >= limite,
+            or_(ScrapingSegmento.marca == "", func.lower(ScrapingSegmento.marca) == nombre_marca),
+            or_(ScrapingSegmento.modelo == "", func.lower(ScrapingSegmento.modelo) == nombre_modelo),
+        )
+        .exists()
+    )
+
+
+def archivar_inactivos(db: Session, dias: int) -> int:
+    """Mueve a market_listings_archivo los inactivos sin verse hace más de `dias` días."""
+    ahora = datetime.utcnow()
+    limite = ahora - timedelta(days=dias)
+    condicion = (MarketListing.activo == False, _ultima_vista() < limite)
+    columnas = [getattr(MarketListing, c) for c in COLUMNAS_ARCHIVO]
+    db.execute(
+        insert(MarketListingArchivo).from_select(
+            [*COLUMNAS_ARCHIVO, "fecha_archivado"],
+            select(*columnas, literal(ahora, DateTime)).where(*condicion),
+        )
+    )
+    archivados = db.execute(delete(MarketListing).where(*condicion)).rowcount
+    db.commit()
+    return archivados
+
+
+def actualizar_vigencia(
+    db: Session,
+    dias: int = LISTINGS_DIAS_VIGENCIA,
+    dias_archivo: Optional[int] = LISTINGS_DIAS_ARCHIVO,
+) -> dict:
+    """
+    Desactiva los listings no vistos en `dias` días, reactiva los que se
+    volvieron a ver y refresca market_stats de esos grupos. Con `dias_archivo`
+    archiva los inactivos más viejos.
+    Retorna {desactivados, reactivados, archivados}.
+    """
+    limite = datetime.utcnow() - timedelta(days=dias)
+
+    desactivados = db.execute(
+        update(MarketListing)
+        .where(
+            MarketListing.activo == True,
+            _ultima_vista() < limite,
+            _recorrido_completo_desde(limite),
+        )
+        .values(activo=False)
+        .returning(*_clave_stats())
+    ).all()
+    reactivados = db.execute(
+        update(MarketListing)
+        .where(MarketListing.activo == False, MarketListing.fecha_ultima_vista >= limite)
+        .values(activo=True)
+        .returning(*_clave_stats())
+    ).all()
+    db.commit()
+
+    claves = {tuple(fila) for fila in desactivados} | {tuple(fila) for fila in reactivados}
+    if claves:
+        refrescar_market_stats(db, claves)
+
+    archivados = archivar_inactivos(db, dias_archivo) if dias_archivo else 0
+
+    stats = {
+        "desactivados": len(desactivados),
+        "reactivados": len(reactivados),
+        "archivados": archivados,
+    }
+    logger.info(f"[Vigencia] {stats} (ventana de {dias} días)")
+    return stats
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+"""
+Benchmark del scraper con IA contra servidores locales.
+Levanta un sitio stub por fuente (cada uno en su propia IP de loopback, así el
+rate limiter por host se comporta como con los sitios reales) y un servidor
+falso compatible con chat completions que demora `--latencia` segundos y
+devuelve `usage` y un item por cada precio que ve en el prompt (hasta 8).
+Compara la extracción secuencial (1 worker, como antes) contra el pool de
+`--workers` threads, con los límites de tokens y requests por minuto pedidos,
+y el pool mandando los primeros 12.000 caracteres del HTML (como antes) contra
+la página reducida: tokens por llamada e items por llamada.
+La caché de respuestas de la IA se desactiva para que cada corrida llame.
+
+Escribe los raw listings en la base de DATABASE_URL: usar una base descartable
+(p. ej. DATABASE_URL=sqlite:///bench_ai.db con las tablas creadas).
+
+Uso:
+    python bench_ai.py
+    python bench_ai.py --combos 10 --workers 8 --latencia 1.5 --max-tokens 50000
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal
+from app.services import ai_client, scraper_ai
+from app.services.scraper_ai import FUENTES_AI, LimitesIA, extraer_combos
+
+# Página típica: <head> con CSS y scripts, menú y filtros antes de los resultados
+HTML = (
+    "<html><head><style>" + ".c{color:#333;margin:0 auto}" * 300 + "</style>"
+    + "<script>window.__STATE__ = {" + "\"k\": 1," * 1500 + "}</script></head><body>"
+    + "<nav>" + "<a href='/categoria'>Categoría</a>" * 60 + "</nav>"
+    + "<aside>" + "<div class='filtro'><span>Filtro</span><ul><li>Opción</li></ul></div>" * 40 + "</aside>"
+    + "<table>"
+    + "".join(
+        f"<tr><td><a href='/auto/{i}'>Toyota Etios 1.5 XLS</a></td><td>$ {10 + i}.500.000</td>"
+        f"<td>{2010 + i % 12}</td><td>{40 + i}.000 km</td></tr>"
+        for i in range(30)
+    )
+    + "</table><footer>" + "<a href='/legal'>Legales</a>" * 20 + "</footer></body></html>"
+).encode()
+RE_PRECIO = re.compile(r"\$ \d")
+
+
+class _Stub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latencia = 0.0
+    llamadas = 0
+    respuestas = 0
+    en_vuelo = 0
+    max_en_vuelo = 0
+    _lock = threading.Lock()
+
+    def _responder(self, cuerpo: bytes, tipo: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_GET(self):
+        self._responder(HTML, "text/html")
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with _Stub._lock:
+            _Stub.llamadas += 1
+            _Stub.en_vuelo += 1
+            _Stub.max_en_vuelo = max(_Stub.max_en_vuelo, _Stub.en_vuelo)
+            _Stub.respuestas += 1
+            n = _Stub.respuestas
+        time.sleep(_Stub.latencia)
+        cantidad = min(8, len(RE_PRECIO.findall(payload["messages"][-1]["content"])))
+        items = [
+            {"titulo": f"Auto {n}-{i}", "anio": 2015 + i, "km": 50000, "precio": 10_000_000 + i,
+             "moneda": "ARS", "url": f"https://bench.local/{time.time_ns()}/{n}/{i}"}
+            for i in range(cantidad)
+        ]
+        prompt_tokens = sum(len(m["content"]) for m in payload["messages"]) // 4
+        respuesta = {
+            "choices": [{"message": {"content": json.dumps(items)}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 120, "total_tokens": prompt_tokens + 120},
+        }
+        with _Stub._lock:
+            _Stub.en_vuelo -= 1
+        self._responder(json.dumps(respuesta).encode(), "application/json")
+
+    def log_message(self, *args):
+        pass
+
+
+def _levantar(host: str) -> ThreadingHTTPServer:
+    servidor = ThreadingHTTPServer((host, 0), _Stub)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def _medir(nombre: str, combos, workers: int, limites: LimitesIA, base_url: str) -> None:
+    _Stub.llamadas = _Stub.max_en_vuelo = 0
+    db = SessionLocal()
+    try:
+        t0 = time.perf_counter()
+        stats = extraer_combos(db, combos, max_workers=workers, limites=limites, base_url=base_url)
+        dt = time.perf_counter() - t0
+    finally:
+        db.close()
+    metricas = limites.metricas()
+    print(
+        f"  {nombre:<24} {dt:7.2f}s  llamadas={metricas['llamadas']} tokens/llamada={metricas['tokens_por_llamada']} "
+        f"items/llamada={metricas['items_por_llamada']} en_vuelo_max={_Stub.max_en_vuelo}  nuevos={stats['nuevos']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del scraper con IA")
+    parser.add_argument("--combos", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latencia", type=float, default=0.8, help="Demora de cada chat completion (s)")
+    parser.add_argument("--max-tokens", type=int, default=None, help="Tope de tokens por corrida")
+    parser.add_argument("--rpm", type=int, default=None, help="Tope de requests por minuto")
+    args = parser.parse_args()
+
+    scraper_ai.get_deepseek_api_key = lambda db=None: ("bench", "env")
+    ai_client.desactivar_cache()
+    _Stub.latencia = args.latencia
+
+    sitios = {fuente: _levantar(f"127.0.0.{i + 1}") for i, fuente in enumerate(FUENTES_AI)}
+    chat = _levantar(f"127.0.0.{len(FUENTES_AI) + 1}")
+    base_url = f"http://127.0.0.{len(FUENTES_AI) + 1}:{chat.server_address[1]}/v1/chat/completions"
+
+    def urls_locales(marca, modelo, anio):
+        return {
+            fuente: f"http://{s.server_address[0]}:{s.server_address[1]}/{fuente}/{marca}/{modelo}/{anio}"
+            for fuente, s in sitios.items()
+        }
+
+    # Las fuentes reales se reemplazan por los sitios stub
+    scraper_ai._build_source_urls = urls_locales
+
+    combos = [("Toyota", f"Modelo{i}", 2015 + i % 8) for i in range(args.combos)]
+    print(f"{len(combos)} combos × {len(FUENTES_AI)} fuentes, latencia IA {args.latencia}s")
+    _medir("secuencial", combos, 1, LimitesIA(args.max_tokens, args.rpm), base_url)
+    _medir(f"{args.workers} workers", combos, args.workers, LimitesIA(args.max_tokens, args.rpm), base_url)
+
+    reducir_html = scraper_ai.reducir_html
+    scraper_ai.reducir_html = lambda html, url, max_caracteres: html[:max_caracteres]
+    _medir(f"{args.workers} workers, HTML crudo", combos, args.workers, LimitesIA(args.max_tokens, args.rpm), base_url)
+    scraper_ai.reducir_html = reducir_html
+
+    for s in (*sitios.values(), chat):
+        s.shutdown()
+
+
+if __name__ == "__main__":
+    main()
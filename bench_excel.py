@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Benchmark de la importación de Excel.
+Genera una lista de precios sintética de `--filas` filas repartidas en
+`--hojas` hojas de "Datos de Mercado" y la importa con un solo proceso (parseo
+y escritura en streaming) y con el pool de `--workers` procesos, informando
+filas por segundo. Cada corrida usa `sobrescribir=True`, así las dos insertan
+las mismas filas; después se reimporta sin sobrescribir para medir el camino
+de duplicados.
+
+Escribe raw listings en la base de DATABASE_URL: usar una base descartable
+(p. ej. DATABASE_URL=sqlite:///bench_excel.db con las tablas creadas).
+
+Uso:
+    python bench_excel.py
+    python bench_excel.py --filas 200000 --hojas 4 --workers 4
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from openpyxl import Workbook
+
+from app.database import SessionLocal
+from app.services.excel_importer import importar_excel
+
+MARCAS = {
+    "Toyota": ["Corolla", "Etios", "Hilux", "Yaris"],
+    "Volkswagen": ["Gol Trend", "Polo", "Amarok", "Vento"],
+    "Ford": ["Focus", "Ranger", "Ka", "EcoSport"],
+    "Fiat": ["Cronos", "Argo", "Toro", "Mobi"],
+}
+
+
+def _generar(ruta: str, filas: int, hojas: int) -> None:
+    rnd = random.Random(42)
+    wb = Workbook(write_only=True)
+    por_hoja = filas // hojas
+    for h in range(hojas):
+        ws = wb.create_sheet(f"Mercado {h + 1}")
+        ws.append(["Marca", "Modelo", "Año", "Kilometraje", "Precio", "Moneda", "Ubicación", "URL"])
+        for i in range(por_hoja):
+            marca = rnd.choice(list(MARCAS))
+            ws.append([
+                marca, rnd.choice(MARCAS[marca]), rnd.randint(2010, 2024), rnd.randint(0, 200_000),
+                rnd.randint(8, 60) * 500_000, "ARS", "CABA", f"https://concesionaria.local/{h}/{i}",
+            ])
+    wb.save(ruta)
+
+
+def _medir(nombre: str, ruta: str, workers: int, sobrescribir: bool) -> None:
+    db = SessionLocal()
+    try:
+        t0 = time.perf_counter()
+        stats = importar_excel(db, filename=os.path.basename(ruta), sobrescribir=sobrescribir, ruta=ruta, max_workers=workers)
+        dt = time.perf_counter() - t0
+    finally:
+        db.close()
+    print(
+        f"  {nombre:<28} {dt:7.2f}s  {stats['filas_por_segundo']} filas/s  "
+        f"importados={stats['importados']} duplicados={stats['duplicados']} errores={stats['errores']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la importación de Excel")
+    parser.add_argument("--filas", type=int, default=100_000)
+    parser.add_argument("--hojas", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "lista_precios.xlsx")
+        t0 = time.perf_counter()
+        _generar(ruta, args.filas, args.hojas)
+        print(
+            f"{args.filas} filas en {args.hojas} hojas ({os.path.getsize(ruta) / 1e6:.1f} MB, "
+            f"generado en {time.perf_counter() - t0:.1f}s)"
+        )
+        _medir("1 proceso", ruta, 1, sobrescribir=True)
+        _medir(f"{args.workers} workers", ruta, args.workers, sobrescribir=True)
+        _medir(f"{args.workers} workers, reimportado", ruta, args.workers, sobrescribir=False)
+
+
+if __name__ == "__main__":
+    main()
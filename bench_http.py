@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""
+Benchmark del cliente HTTP compartido de los scrapers.
+Levanta un servidor stub local (HTTP/1.1 con keep-alive) y compara N requests
+con `requests.get` suelto (una conexión nueva por request, como antes) contra
+`http_client.obtener` (Session con pool por host). Reporta tiempo total y
+conexiones TCP abiertas en el servidor.
+
+Contra localhost el handshake es barato; con `--latencia` se simula el costo de
+abrir una conexión (RTT + TLS) demorando la aceptación de cada conexión nueva.
+
+Uso:
+    python bench_http.py
+    python bench_http.py --requests 200 --latencia 0.05
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+
+from app.services.http_client import HEADERS, crear_sesion
+
+CUERPO = b"<html><body>" + b"<li class='ui-search-layout__item'>auto</li>" * 200 + b"</body></html>"
+
+
+class _Stub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers y cuerpo salen en writes separados: sin esto Nagle + delayed ACK suman ~40 ms por request
+    disable_nagle_algorithm = True
+    conexiones = 0
+    latencia = 0.0
+    _lock = threading.Lock()
+
+    def setup(self):
+        with _Stub._lock:
+            _Stub.conexiones += 1
+        if _Stub.latencia:
+            time.sleep(_Stub.latencia)
+        super().setup()
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(CUERPO)))
+        self.end_headers()
+        self.wfile.write(CUERPO)
+
+    def log_message(self, *args):
+        pass
+
+
+def _medir(nombre: str, fetch, url: str, n: int) -> None:
+    _Stub.conexiones = 0
+    t0 = time.perf_counter()
+    for i in range(n):
+        respuesta = fetch(f"{url}?page={i}")
+        assert respuesta.status_code == 200
+    dt = time.perf_counter() - t0
+    print(f"{nombre:<22} {dt:7.3f}s  {dt * 1000 / n:6.2f} ms/req  conexiones={_Stub.conexiones}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del cliente HTTP de scrapers")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--latencia", type=float, default=0.0, help="Demora por conexión nueva (s)")
+    args = parser.parse_args()
+
+    _Stub.latencia = args.latencia
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _Stub)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{servidor.server_address[1]}/listado"
+
+    _medir("requests.get suelto", lambda u: requests.get(u, headers=HEADERS, timeout=20), url, args.requests)
+    sesion = crear_sesion()
+    _medir("Session compartida", lambda u: sesion.get(u, timeout=20), url, args.requests)
+
+    servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Benchmark del extractor de autos de Kavak.
+Compara la extracción anterior (recorrido carácter a carácter para balancear
+corchetes + json.loads del array completo) contra `_iter_cars_from_html`
+(slice del script + raw_decode incremental).
+
+Usa `kavak_sample.html` si tiene contenido; si no, arma una página sintética
+con el payload React SSR escapado (\\"cars\\":[...]) rodeado de otro markup.
+
+Uso:
+    python bench_kavak.py
+    python bench_kavak.py --autos 2000 --repeticiones 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.scraper_kavak import _extract_cars_from_html, _iter_cars_from_html
+
+
+def _extraer_anterior(html: str) -> list[dict]:
+    """Réplica de la implementación previa de _extract_cars_from_html."""
+    marker = '\\"cars\\":['
+    start = html.find(marker)
+    if start < 0:
+        marker = '"cars":['
+        start = html.find(marker)
+        if start < 0:
+            return []
+
+    idx = start + len(marker)
+    bracket_count = 1
+    i = idx
+    while i < len(html) and bracket_count > 0:
+        ch = html[i]
+        if ch == '\\' and i + 1 < len(html):
+            i += 2
+            continue
+        if ch == '[':
+            bracket_count += 1
+        elif ch == ']':
+            bracket_count -= 1
+        i += 1
+
+    raw = html[idx:i - 1]
+    raw = raw.replace('\\"', '"').replace('\\/', '/')
+    try:
+        return json.loads('[' + raw + ']')
+    except json.JSONDecodeError:
+        return []
+
+
+def pagina_sintetica(n: int) -> str:
+    cars = [
+        {
+            "id": str(100000 + i),
+            "url": f"https://www.kavak.com/ar/usado/renault-sandero-{i}",
+            "image": f"https://images.kavak.services/{i}.jpg",
+            "title": "Renault • Sandero",
+            "subtitle": f"{2015 + i % 9} • {30 + i}.000 km • 1.6 Intens",
+            "mainPrice": f"{14 + i % 11}.940.000",
+            "footerInfo": [{"text": "Buenos Aires"}],
+            "analytics": {
+                "car_make": "Renault", "car_model": "Sandero",
+                "car_price": 14940000 + i, "car_location": "Buenos Aires", "car_id": str(100000 + i),
+            },
+        }
+        for i in range(n)
+    ]
+    payload = json.dumps({"props": {"cars": cars, "total": n}}, separators=(",", ":"))
+    escapado = payload.replace('"', '\\"').replace("/", "\\/")
+    relleno = "<div class='x'>" + "<span>texto</span>" * 5000 + "</div>"
+    return (
+        f"<html><head><script>window.__cfg = {json.dumps({'k' * 50: 'v' * 5000})}</script></head>"
+        f"<body>{relleno}<script>self.__next_f.push([1,\"{escapado}\"])</script>{relleno}</body></html>"
+    )
+
+
+def _medir(nombre: str, fn, html: str, repeticiones: int):
+    fn(html)
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        resultado = fn(html)
+    ms = (time.perf_counter() - t0) * 1000 / repeticiones
+    print(f"  {nombre:<32} {ms:8.2f} ms/página  ({len(resultado)} autos)")
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del extractor de Kavak")
+    parser.add_argument("--autos", type=int, default=500)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    ruta = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kavak_sample.html")
+    if os.path.exists(ruta) and os.path.getsize(ruta) > 0:
+        with open(ruta, encoding="utf-8") as f:
+            html = f.read()
+        print(f"kavak_sample.html ({len(html) / 1024:.0f} KB)")
+    else:
+        html = pagina_sintetica(args.autos)
+        print(f"kavak_sample.html vacío: página sintética con {args.autos} autos ({len(html) / 1024:.0f} KB)")
+
+    anterior = _medir("corchetes char a char + loads", _extraer_anterior, html, args.repeticiones)
+    nuevo = _medir("raw_decode incremental", _extract_cars_from_html, html, args.repeticiones)
+    print(f"  resultados idénticos: {anterior == nuevo}")
+
+    t0 = time.perf_counter()
+    primero = next(_iter_cars_from_html(html), None)
+    print(f"  primer auto disponible en {(time.perf_counter() - t0) * 1000:.2f} ms ({'ok' if primero else 'sin autos'})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark del matcher de marcas/modelos del normalizador.
+Compara el costo por fila del escaneo lineal anterior (substring sobre todo
+el catálogo) contra CatalogoMatcher. No necesita base de datos: usa un
+catálogo sintético armado a partir de MARCA_ALIASES.
+
+Uso:
+    python bench_matcher.py
+    python bench_matcher.py --filas 50000 --modelos-por-marca 80
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.catalogo_matcher import CatalogoMatcher, MARCA_ALIASES
+
+
+MODELOS_BASE = [
+    "Gol", "Gol Trend", "Polo", "Vento", "Amarok", "Focus", "Fiesta", "Ka", "Ranger",
+    "Corolla", "Corolla Cross", "Etios", "Hilux", "Onix", "Onix Plus", "Cruze", "Cronos",
+    "Argo", "Toro", "Clase A", "Clase C", "Sandero", "Sandero Stepway", "Kangoo", "208",
+    "2008", "308", "C3", "C4 Cactus", "Tracker", "Spin", "S10", "Mobi", "Uno", "Palio",
+    "Siena", "Partner", "Berlingo", "Duster", "Logan",
+]
+
+
+def _catalogo(modelos_por_marca: int):
+    marcas = [(i + 1, nombre) for i, nombre in enumerate(sorted(set(MARCA_ALIASES.values())))]
+    modelos = []
+    for marca_id, _ in marcas:
+        for j in range(modelos_por_marca):
+            base = MODELOS_BASE[j % len(MODELOS_BASE)]
+            nombre = base if j < len(MODELOS_BASE) else f"{base} Serie {j // len(MODELOS_BASE)}"
+            modelos.append((len(modelos) + 1, marca_id, nombre))
+    return marcas, modelos
+
+
+def _filas(marcas, modelos, n: int):
+    """Filas crudas (marca_raw, modelo_raw, (marca_id, modelo_id) esperado)."""
+    alias_por_oficial = {}
+    for alias, oficial in MARCA_ALIASES.items():
+        alias_por_oficial.setdefault(oficial, []).append(alias)
+    modelos_por_marca = {}
+    for mid, marca_id, nombre in modelos:
+        modelos_por_marca.setdefault(marca_id, []).append((mid, nombre))
+
+    random.seed(42)
+    filas = []
+    for _ in range(n):
+        marca_id, nombre = random.choice(marcas)
+        marca_raw = random.choice(alias_por_oficial.get(nombre, [nombre]) + [nombre.upper()])
+        modelo_id, modelo = random.choice(modelos_por_marca[marca_id])
+        modelo_raw = modelo + random.choice(["", " 1.6 Highline", " 2.0 TDI 4x4", " Full"])
+        filas.append((marca_raw, modelo_raw, (marca_id, modelo_id)))
+    return filas
+
+
+def _matcher_lineal(marcas, modelos):
+    """Réplica del matcheo anterior de normalizar_listings (escaneo lineal)."""
+    marcas_por_nombre = {nombre.lower(): (mid, nombre) for mid, nombre in marcas}
+    modelos_por_marca: dict[int, dict[str, int]] = {}
+    for mid, marca_id, nombre in modelos:
+        modelos_por_marca.setdefault(marca_id, {})[nombre.lower()] = mid
+
+    def buscar_marca(marca_raw):
+        oficial = MARCA_ALIASES.get(marca_raw.strip().lower(), marca_raw.strip())
+        r = marcas_por_nombre.get(oficial.lower())
+        if r:
+            return r[0]
+        for key, (mid, _) in marcas_por_nombre.items():
+            if oficial.lower() in key or key in oficial.lower():
+                return mid
+        return None
+
+    def buscar_modelo(modelo_raw, marca_id):
+        modelos_marca = modelos_por_marca.get(marca_id, {})
+        ml = modelo_raw.strip().lower()
+        if ml in modelos_marca:
+            return modelos_marca[ml]
+        for key, mid in modelos_marca.items():
+            if ml in key or key in ml:
+                return mid
+        return None
+
+    def resolver(marca_raw, modelo_raw):
+        marca_id = buscar_marca(marca_raw)
+        return (marca_id, buscar_modelo(modelo_raw, marca_id)) if marca_id else (None, None)
+
+    return resolver
+
+
+def _medir(nombre: str, resolver, filas) -> None:
+    t0 = time.perf_counter()
+    resultados = [resolver(marca_raw, modelo_raw) for marca_raw, modelo_raw, _ in filas]
+    dt = time.perf_counter() - t0
+    correctas = sum(1 for r, (_, _, esperado) in zip(resultados, filas) if r == esperado)
+    print(f"{nombre:<18} {dt * 1e6 / len(filas):8.2f} µs/fila  ({correctas}/{len(filas)} correctas)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del matcher de catálogo")
+    parser.add_argument("--filas", type=int, default=20000)
+    parser.add_argument("--modelos-por-marca", type=int, default=40)
+    args = parser.parse_args()
+
+    marcas, modelos = _catalogo(args.modelos_por_marca)
+    filas = _filas(marcas, modelos, args.filas)
+    print(f"Catálogo: {len(marcas)} marcas, {len(modelos)} modelos — {len(filas)} filas")
+
+    t0 = time.perf_counter()
+    matcher = CatalogoMatcher(marcas, modelos)
+    print(f"Construcción del matcher: {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    _medir("escaneo lineal", _matcher_lineal(marcas, modelos), filas)
+    _medir("CatalogoMatcher", matcher.resolver, filas)
+
+
+if __name__ == "__main__":
+    main()
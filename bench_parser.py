@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+"""
+Benchmark de parseo HTML de los scrapers.
+Compara la extracción anterior (BeautifulSoup + html.parser + selectores CSS
+parseados en cada `select_one`) contra la capa de app/services/html_parser.py
+(backend más rápido disponible, SoupStrainer y selectores precompilados que
+se resuelven en un solo recorrido por item).
+
+Usa páginas sintéticas con la estructura de MercadoLibre y deRuedas (la
+página real trae además mucho markup que no son resultados). Si
+`kavak_sample.html` tiene contenido, también mide el parseo completo de esa página.
+
+Uso:
+    python bench_parser.py
+    python bench_parser.py --items 96 --repeticiones 20
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bs4 import BeautifulSoup
+
+from app.services import html_parser
+from app.services.scraper_mercadolibre import (
+    SELECTORES_ML, SOLO_RESULTADOS_ML, _extraer_item, _url_item,
+    _extraer_marca_modelo_titulo, _parse_anio, _parse_km, _parse_precio,
+)
+from app.services.scraper_deruedas import SELECTORES_DERUEDAS, _extract_listing_data
+
+RELLENO = (
+    "<header><nav>" + "<a href='/cat'>Categoría</a>" * 80 + "</nav></header>"
+    + "<script>window.__PRELOADED_STATE__ = {" + "\"k\": 1," * 2000 + "}</script>"
+    + "<aside>" + "<div class='filtro'><span>Filtro</span><ul><li>Opción</li></ul></div>" * 60 + "</aside>"
+)
+
+
+def pagina_ml(n: int) -> str:
+    items = []
+    for i in range(n):
+        items.append(
+            "<li class='ui-search-layout__item'><div class='poly-card'>"
+            f"<img class='poly-component__picture' data-src='https://img/{i}.jpg'>"
+            f"<h2 class='poly-component__title'><a href='https://auto.mercadolibre.com.ar/MLA-{i}-vw-gol#pos'>"
+            f"Volkswagen Gol Trend 1.6 Highline {2010 + i % 14}</a></h2>"
+            "<div class='poly-component__price'><span class='andes-money-amount__currency-symbol'>$</span>"
+            f"<span class='andes-money-amount__fraction'>{12 + i % 9}.500.000</span></div>"
+            f"<ul class='poly-component__attributes-list'><li>{2010 + i % 14}</li><li>{40 + i}.000 Km</li></ul>"
+            "<span class='poly-component__location'>Capital Federal</span>"
+            "</div></li>"
+        )
+    return f"<html><body>{RELLENO}<ol class='ui-search-layout'>{''.join(items)}</ol>{RELLENO}</body></html>"
+
+
+def pagina_deruedas(n: int) -> str:
+    cards = []
+    for i in range(n):
+        cards.append(
+            "<div class='divCar_1'><div>"
+            f"<a href='/vendo/Toyota/Etios/Usado/Mendoza?cod={1000 + i}'><img src='/fotos/{i}.jpg'></a>"
+            f"<a href='/vendo/Toyota/Etios/Usado/Mendoza?cod={1000 + i}'>Toyota Etios 1.5 5ptas XLS 4AT</a>"
+            f"<span>$ {19 + i % 7}.500.000</span><span>Nafta | {2012 + i % 10}</span><span>{57 + i}000 Km</span>"
+            "</div></div>"
+        )
+    return f"<html><body>{RELLENO}<div id='listado'>{''.join(cards)}</div>{RELLENO}</body></html>"
+
+
+def _ml_anterior(html: str) -> list[dict]:
+    """Réplica de la extracción previa de scrape_mercadolibre_web."""
+    resultados = []
+    soup = BeautifulSoup(html, "html.parser")
+    for item in soup.select("li.ui-search-layout__item"):
+        link_el = item.select_one("a.ui-search-link") or item.select_one("a")
+        href = link_el["href"] if link_el and link_el.get("href") else None
+        if not href:
+            continue
+        title_el = (
+            item.select_one(".ui-search-item__title")
+            or item.select_one(".poly-component__title")
+            or item.select_one("h2")
+        )
+        titulo = title_el.text.strip() if title_el else ""
+        price_el = item.select_one(".andes-money-amount__fraction")
+        currency_el = item.select_one(".andes-money-amount__currency-symbol")
+        moneda_text = currency_el.text.strip() if currency_el else "$"
+        attrs = item.select(".ui-search-card-attributes__attribute")
+        if not attrs:
+            attrs = item.select(".poly-component__attributes-list li")
+        anio = km = None
+        for a in attrs:
+            txt = a.text.strip()
+            if _parse_anio(txt):
+                anio = _parse_anio(txt)
+            elif "km" in txt.lower() or re.match(r"^[\d.]+\s", txt):
+                km = _parse_km(txt)
+        marca_raw, modelo_raw = _extraer_marca_modelo_titulo(titulo)
+        loc_el = item.select_one(".ui-search-item__location") or item.select_one(".poly-component__location")
+        img_el = item.select_one("img.ui-search-result-image__element") or item.select_one("img")
+        resultados.append({
+            "url": href.split("#")[0].split("?")[0],
+            "titulo": titulo, "marca_raw": marca_raw, "modelo_raw": modelo_raw,
+            "anio": anio, "km": km,
+            "precio": _parse_precio(price_el.text) if price_el else None,
+            "moneda": "USD" if "U$S" in moneda_text or "US" in moneda_text else "ARS",
+            "ubicacion": loc_el.text.strip() if loc_el else "",
+            "imagen_url": (img_el.get("data-src") or img_el.get("src") or "") if img_el else "",
+        })
+    return resultados
+
+
+def _ml_nuevo(html: str) -> list[dict]:
+    soup = html_parser.parsear_html(html, solo=SOLO_RESULTADOS_ML)
+    resultados = []
+    for item in soup.find_all("li", class_="ui-search-layout__item"):
+        campos = SELECTORES_ML.extraer(item)
+        url = _url_item(campos)
+        if url is None:
+            continue
+        resultados.append({"url": url, **_extraer_item(campos)})
+    return resultados
+
+
+def _deruedas(soup, links) -> list[dict]:
+    return [_extract_listing_data(link.parent.parent) for link in links]
+
+
+def _deruedas_anterior(html: str) -> list[dict]:
+    soup = BeautifulSoup(html, "html.parser")
+    return _deruedas(soup, soup.find_all("a", href=re.compile(r"/vendo/")))
+
+
+def _deruedas_nuevo(html: str) -> list[dict]:
+    soup = html_parser.parsear_html(html)
+    return _deruedas(soup, SELECTORES_DERUEDAS.extraer(soup).todos("links_listing"))
+
+
+def _medir(nombre: str, fn, html: str, repeticiones: int):
+    fn(html)  # calentamiento
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        resultado = fn(html)
+    ms = (time.perf_counter() - t0) * 1000 / repeticiones
+    print(f"  {nombre:<28} {ms:8.2f} ms/página")
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de parseo HTML de scrapers")
+    parser.add_argument("--items", type=int, default=48)
+    parser.add_argument("--repeticiones", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"Backend: {html_parser.BACKEND}")
+
+    html = pagina_ml(args.items)
+    print(f"MercadoLibre ({args.items} resultados, {len(html) / 1024:.0f} KB)")
+    anterior = _medir("html.parser + select_one", _ml_anterior, html, args.repeticiones)
+    nuevo = _medir(f"{html_parser.BACKEND} + precompilados", _ml_nuevo, html, args.repeticiones)
+    print(f"  resultados idénticos: {anterior == nuevo}")
+
+    html = pagina_deruedas(args.items)
+    print(f"deRuedas ({args.items} resultados, {len(html) / 1024:.0f} KB)")
+    anterior = _medir("html.parser + find_all(re)", _deruedas_anterior, html, args.repeticiones)
+    nuevo = _medir(f"{html_parser.BACKEND} + precompilados", _deruedas_nuevo, html, args.repeticiones)
+    print(f"  resultados idénticos: {anterior == nuevo}")
+
+    ruta_kavak = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kavak_sample.html")
+    if os.path.exists(ruta_kavak) and os.path.getsize(ruta_kavak) > 0:
+        with open(ruta_kavak, encoding="utf-8") as f:
+            html = f.read()
+        print(f"kavak_sample.html ({len(html) / 1024:.0f} KB)")
+        _medir("html.parser", lambda h: BeautifulSoup(h, "html.parser"), html, args.repeticiones)
+        _medir(html_parser.BACKEND, html_parser.parsear_html, html, args.repeticiones)
+    else:
+        print("kavak_sample.html vacío o ausente: se omite")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,9 @@ Puede ejecutarse vía cron o manualmente.
 Uso:
     python run_scraper.py                  # Scraping + normalización
     python run_scraper.py --fuente kavak   # Solo Kavak
-    python run_scraper.py --no-normalize   # Sin normalizar
+    python run_scraper.py --no-normalize   # Sin normalizar (ni desactivar vencidos)
+    python run_scraper.py --cache          # GET condicional: saltea páginas sin cambios
+    python run_scraper.py --budget-minutes 20  # Delta: primero los segmentos con más movimiento, 20 min máx.
 """
 import argparse
 import logging
@@ -16,12 +18,15 @@ import os
 # Asegurar que el directorio raíz del backend esté en el path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from app.config import (
+    HTTP_CACHE_DIR, HTTP_CACHE_TTL_HORAS, HTTP_CACHE_MAX_MB, SCRAPER_PRESUPUESTO_PAGINAS,
+    LISTINGS_DIAS_VIGENCIA, LISTINGS_DIAS_ARCHIVO,
+)
 from app.database import SessionLocal
-from app.services.scraper_mercadolibre import scrape_all_mercadolibre
-from app.services.scraper_kavak import scrape_all_kavak
-from app.services.scraper_deruedas import scrape_all_deruedas
-from app.services.scraper_preciosdeautos import scrape_all_preciosdeautos
+from app.services.http_client import activar_cache
+from app.services.scraping_orchestrator import FUENTES_WEB, ejecutar_scrapers, sumar_stats
 from app.services.normalizer import normalizar_listings
+from app.services.vigencia import actualizar_vigencia
 
 logging.basicConfig(
     level=logging.INFO,
@@ -46,42 +51,70 @@ def main():
     parser.add_argument(
         "--max-por-marca",
         type=int,
-        default=50,
-        help="Máximo de listings por marca (default: 50)",
+        default=None,
+        help="Máximo de listings nuevos por búsqueda (default: el de cada fuente)",
+    )
+    parser.add_argument(
+        "--max-paginas",
+        type=int,
+        default=SCRAPER_PRESUPUESTO_PAGINAS,
+        help=f"Presupuesto de páginas de la corrida, entre todas las fuentes (default: {SCRAPER_PRESUPUESTO_PAGINAS})",
+    )
+    parser.add_argument(
+        "--budget-minutes",
+        type=float,
+        default=None,
+        help="Modo delta: prioriza los segmentos con más movimiento y corta al vencer el plazo",
+    )
+    parser.add_argument(
+        "--dias-vigencia",
+        type=int,
+        default=LISTINGS_DIAS_VIGENCIA,
+        help=f"Desactivar listings no vistos en N días (default: {LISTINGS_DIAS_VIGENCIA})",
+    )
+    parser.add_argument(
+        "--dias-archivo",
+        type=int,
+        default=LISTINGS_DIAS_ARCHIVO,
+        help="Archivar inactivos no vistos en N días (default: 0 = no archivar)",
+    )
+    parser.add_argument(
+        "--cache",
+        nargs="?",
+        const=HTTP_CACHE_DIR,
+        metavar="DIR",
+        help=f"Usar la caché de páginas en disco (default: {HTTP_CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--cache-ttl-horas",
+        type=float,
+        default=HTTP_CACHE_TTL_HORAS,
+        help=f"Vencimiento de las páginas cacheadas (default: {HTTP_CACHE_TTL_HORAS:g})",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=HTTP_CACHE_MAX_MB,
+        help=f"Tamaño máximo de la caché (default: {HTTP_CACHE_MAX_MB:g} MB)",
     )
     args = parser.parse_args()
 
+    if args.cache:
+        activar_cache(args.cache, ttl_horas=args.cache_ttl_horas, max_mb=args.cache_max_mb)
+
     db = SessionLocal()
     try:
-        total = {"nuevos": 0, "duplicados": 0, "errores": 0}
-
-        if args.fuente in ("mercadolibre", "all"):
-            logger.info("Iniciando scraping de MercadoLibre...")
-            stats = scrape_all_mercadolibre(db, max_por_marca=args.max_por_marca)
-            logger.info(f"MercadoLibre: {stats}")
-            for k in total:
-                total[k] += stats[k]
-
-        if args.fuente in ("kavak", "all"):
-            logger.info("Iniciando scraping de Kavak...")
-            stats = scrape_all_kavak(db, max_por_marca=args.max_por_marca)
-            logger.info(f"Kavak: {stats}")
-            for k in total:
-                total[k] += stats[k]
-
-        if args.fuente in ("deruedas", "all"):
-            logger.info("Iniciando scraping de deRuedas...")
-            stats = scrape_all_deruedas(db, max_por_marca=args.max_por_marca)
-            logger.info(f"deRuedas: {stats}")
-            for k in total:
-                total[k] += stats[k]
-
-        if args.fuente in ("preciosdeautos", "all"):
-            logger.info("Iniciando scraping de PreciosDeAutos...")
-            stats = scrape_all_preciosdeautos(db, max_por_marca=args.max_por_marca)
-            logger.info(f"PreciosDeAutos: {stats}")
-            for k in total:
-                total[k] += stats[k]
+        fuentes = FUENTES_WEB if args.fuente == "all" else [args.fuente]
+        logger.info(f"Iniciando scraping en paralelo: {', '.join(fuentes)}...")
+        stats_por_fuente = ejecutar_scrapers(
+            fuentes,
+            max_por_marca=args.max_por_marca,
+            max_paginas=args.max_paginas,
+            limite_minutos=args.budget_minutes,
+        )
+        for fuente, stats in stats_por_fuente.items():
+            logger.info(f"{fuente}: {stats}")
+        total = sumar_stats(stats_por_fuente)
 
         logger.info(f"Scraping total: {total}")
 
@@ -90,6 +123,10 @@ def main():
             norm_stats = normalizar_listings(db)
             logger.info(f"Normalización: {norm_stats}")
 
+            # Desactivar los listings que dejaron de aparecer
+            vigencia_stats = actualizar_vigencia(db, dias=args.dias_vigencia, dias_archivo=args.dias_archivo)
+            logger.info(f"Vigencia: {vigencia_stats}")
+
         logger.info("Proceso completado exitosamente.")
     except Exception as e:
         logger.error(f"Error: {e}")
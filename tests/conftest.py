@@ -0,0 +1,146 @@
+"""
+Fixtures de los tests: una base SQLite descartable por test.
+DATABASE_URL se fija antes de importar `app` (config la lee al importarse).
+"""
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_BASE = os.path.join(tempfile.mkdtemp(prefix="tests_autos_"), "tests.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_BASE}"
+os.environ.setdefault("AI_CACHE_ENABLED", "false")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import app.models  # noqa: F401  (registra todas las tablas en Base)
+from app.database import Base, SessionLocal, engine
+from app.models.auto import Auto
+from app.models.marca import Marca
+from app.models.modelo import Modelo
+from app.models.pricing import MarketListing
+
+
+@pytest.fixture
+def db():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def _sembrar_mercado(db, n_listings: int = 1500, n_autos: int = 40, semilla: int = 1) -> None:
+    """Catálogo, listings de mercado y stock aleatorios (con años, km y monedas mezclados)."""
+    rnd = random.Random(semilla)
+    marcas = [Marca(nombre=n) for n in ("Volkswagen", "Ford", "Toyota", "Chevrolet")]
+    db.add_all(marcas)
+    db.flush()
+    modelos = [
+        Modelo(nombre=n, marca_id=m.id)
+        for m in marcas
+        for n in ("Gol", "Focus", "Corolla", "Onix", "Cronos")[:rnd.randint(2, 5)]
+    ]
+    db.add_all(modelos)
+    db.flush()
+    ahora = datetime.utcnow()
+    for i in range(n_listings):
+        mo = rnd.choice(modelos)
+        db.add(MarketListing(
+            fuente=rnd.choice(["mercadolibre", "kavak"]),
+            marca_id=mo.marca_id,
+            modelo_id=mo.id,
+            anio=rnd.choice([0] + list(range(2005, 2024))),
+            km=rnd.choice([None, rnd.randint(0, 200_000)]),
+            precio=rnd.choice([0, rnd.uniform(1e6, 3e7)]),
+            moneda=rnd.choice(["ARS", "ARS", "USD"]),
+            url=f"https://mercado.local/{i}",
+            activo=rnd.random() > 0.1,
+            fecha_scraping=ahora - timedelta(days=rnd.randint(0, 100)),
+        ))
+    for _ in range(n_autos):
+        mo = rnd.choice(modelos)
+        db.add(Auto(
+            marca_id=mo.marca_id,
+            modelo_id=mo.id,
+            anio=rnd.randint(2003, 2024),
+            precio=rnd.uniform(1e6, 3e7),
+            en_stock=rnd.random() > 0.2,
+            es_trade_in=rnd.random() > 0.7,
+            precio_compra=rnd.uniform(1e6, 2e7),
+        ))
+    db.commit()
+
+
+@pytest.fixture
+def mercado(db):
+    """Base sembrada con `_sembrar_mercado` (valores por defecto)."""
+    _sembrar_mercado(db)
+    return db
+
+
+class SitioFalso:
+    """
+    Servidor HTTP local con páginas por path (incluida la query). Manda ETag y
+    responde 304 a un If-None-Match vigente; `pedidos` registra (path, status).
+    """
+
+    def __init__(self):
+        self.paginas: dict[str, bytes] = {}
+        self.pedidos: list[tuple[str, int]] = []
+        sitio = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                cuerpo = sitio.paginas.get(self.path)
+                if cuerpo is None:
+                    return self._responder(404, b"")
+                etag = f'"{hashlib.sha1(cuerpo).hexdigest()}"'
+                if self.headers.get("If-None-Match") == etag:
+                    return self._responder(304, None, etag)
+                self._responder(200, cuerpo, etag)
+
+            def _responder(self, status, cuerpo, etag=None):
+                sitio.pedidos.append((self.path, status))
+                self.send_response(status)
+                if etag:
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(cuerpo or b"")))
+                self.end_headers()
+                if cuerpo:
+                    self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass
+
+        self._servidor = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.base = f"http://127.0.0.1:{self._servidor.server_address[1]}"
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+
+    def cerrar(self):
+        self._servidor.shutdown()
+
+
+@pytest.fixture
+def sitio():
+    s = SitioFalso()
+    yield s
+    s.cerrar()
+
+
+@pytest.fixture
+def cache_paginas(tmp_path):
+    from app.services import http_client
+
+    cache = http_client.activar_cache(str(tmp_path / "http_cache"), ttl_horas=1, max_mb=50)
+    yield cache
+    http_client.desactivar_cache()
@@ -0,0 +1,80 @@
+"""Historial de precios: solo se escriben los cambios, y la serie semanal toma el precio vigente."""
+from datetime import datetime, timedelta
+
+from app.models.pricing import MarketListing, MarketPriceHistory, MarketRawListing
+from app.services.historial_precios import _lunes, historial_listing, serie_semanal
+from app.services.raw_listing_sink import SinkRawListings
+
+
+def _scrapear(db, precios: dict[str, float]) -> dict:
+    stats = {"nuevos": 0, "duplicados": 0, "errores": 0}
+    sink = SinkRawListings(db, "mercadolibre", stats)
+    for url, precio in precios.items():
+        sink.agregar(url=url, titulo=url, anio=2018, precio=precio, moneda="ARS")
+    sink.cerrar()
+    return stats
+
+
+def _historial(db) -> list[tuple[str, float]]:
+    return [
+        (url, precio)
+        for url, precio in db.query(MarketRawListing.url, MarketPriceHistory.precio)
+        .join(MarketPriceHistory, MarketPriceHistory.raw_listing_id == MarketRawListing.id)
+        .order_by(MarketPriceHistory.id)
+    ]
+
+
+def test_solo_los_cambios_de_precio_escriben_historial(db):
+    _scrapear(db, {"a": 100.0, "b": 200.0})
+
+    # Mismo precio visto de nuevo: ninguna fila
+    stats = _scrapear(db, {"a": 100.0, "b": 200.0})
+    assert stats["duplicados"] == 2 and stats["cambios_precio"] == 0
+    assert _historial(db) == []
+
+    # Primer cambio: el precio original y el nuevo
+    stats = _scrapear(db, {"a": 90.0, "b": 200.0})
+    assert stats["cambios_precio"] == 1
+    assert _historial(db) == [("a", 100.0), ("a", 90.0)]
+    assert db.query(MarketRawListing.precio).filter(MarketRawListing.url == "a").scalar() == 90.0
+
+    # Cambios siguientes: una fila cada uno, comparando contra el último precio
+    _scrapear(db, {"a": 90.0})
+    _scrapear(db, {"a": 80.0})
+    assert _historial(db) == [("a", 100.0), ("a", 90.0), ("a", 80.0)]
+
+
+def test_serie_semanal_usa_el_precio_vigente_de_cada_semana(db):
+    ahora = datetime.utcnow()
+    lunes = _lunes(ahora)
+    db.add_all(MarketRawListing(id=i, fuente="mercadolibre", url=url) for i, url in ((1, "a"), (2, "b")))
+    db.add_all([
+        # "a": publicado hace 3 semanas a 100, baja a 80 a mitad de la semana pasada
+        MarketListing(
+            raw_listing_id=1, fuente="mercadolibre", marca_id=1, modelo_id=1, anio=2018, precio=80,
+            url="a", fecha_scraping=lunes - timedelta(weeks=3, days=-1), fecha_ultima_vista=ahora,
+        ),
+        # "b": sin cambios, visto solo durante la semana de hace dos
+        MarketListing(
+            raw_listing_id=2, fuente="mercadolibre", marca_id=1, modelo_id=1, anio=2018, precio=200,
+            url="b", activo=False,
+            fecha_scraping=lunes - timedelta(weeks=2), fecha_ultima_vista=lunes - timedelta(weeks=2, days=-3),
+        ),
+        MarketPriceHistory(raw_listing_id=1, fecha=lunes - timedelta(weeks=3, days=-1), precio=100, moneda="ARS"),
+        MarketPriceHistory(raw_listing_id=1, fecha=lunes - timedelta(weeks=1, days=-3), precio=80, moneda="ARS"),
+    ])
+    db.commit()
+
+    semana = lambda atras: (lunes - timedelta(weeks=atras)).date().isoformat()
+    assert serie_semanal(db, 1, 1, semanas=4) == [
+        {"semana": semana(3), "precio_promedio": 100, "count": 1},
+        {"semana": semana(2), "precio_promedio": 150, "count": 2},
+        {"semana": semana(1), "precio_promedio": 80, "count": 1},
+        {"semana": semana(0), "precio_promedio": 80, "count": 1},
+    ]
+    # Con menos semanas la serie se corta al inicio de la ventana
+    assert [p["semana"] for p in serie_semanal(db, 1, 1, semanas=2)] == [semana(1), semana(0)]
+    assert serie_semanal(db, 1, 1, moneda="USD") == []
+
+    puntos = historial_listing(db, db.query(MarketListing.id).filter(MarketListing.url == "a").scalar())
+    assert [p["precio"] for p in puntos] == [100, 80]
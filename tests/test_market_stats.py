@@ -0,0 +1,63 @@
+"""mediana_mercado: misma mediana desde market_stats o desde los listings, y por moneda."""
+import statistics
+from datetime import datetime
+
+from app.models.pricing import MarketListing
+from app.services.market_stats import (
+    combinar_market_stats, mediana_mercado, obtener_market_stats, refrescar_market_stats,
+)
+from app.services.pricing_engine import _trimmed_mean
+
+
+def _listing(i: int, anio: int, precio: float, moneda: str = "ARS", activo: bool = True) -> MarketListing:
+    return MarketListing(
+        fuente="mercadolibre", marca_id=1, modelo_id=1, anio=anio, km=50_000, precio=precio,
+        moneda=moneda, url=f"https://mercado.local/{i}", activo=activo, fecha_scraping=datetime.utcnow(),
+    )
+
+
+def test_mediana_mercado_sin_market_stats_usa_listings(db):
+    precios_ars = [10e6, 11e6, 12e6, 15e6, 20e6]
+    db.add_all(_listing(i, 2015, p) for i, p in enumerate(precios_ars))
+    db.add_all([
+        _listing(100, 2015, 9_000, moneda="USD"),
+        _listing(101, 2015, 12_000, moneda="USD"),
+        _listing(102, 2015, 99e6, activo=False),
+        _listing(103, 2019, 99e6),
+    ])
+    db.commit()
+
+    # Tabla sin refrescar: se calcula sobre los listings activos en pesos
+    assert mediana_mercado(db, 1, 1, 2014, 2016) == statistics.median(precios_ars)
+    assert mediana_mercado(db, 1, 1, 2014, 2016, moneda="USD") == statistics.median([9_000, 12_000])
+    assert mediana_mercado(db, 1, 1, 2000, 2001) == 0
+
+    refrescar_market_stats(db)
+    assert mediana_mercado(db, 1, 1, 2014, 2016) == statistics.median(precios_ars)
+    assert mediana_mercado(db, 1, 1, 2014, 2016, moneda="USD") == statistics.median([9_000, 12_000])
+
+
+def test_combinar_varias_filas_da_los_valores_exactos(db):
+    precios_ars = {2014: [8e6, 9e6, 30e6], 2015: [10e6, 11e6, 12e6, 15e6], 2016: [13e6, 14e6]}
+    i = 0
+    for anio, precios in precios_ars.items():
+        for p in precios:
+            db.add(_listing(i, anio, p))
+            i += 1
+    db.add_all([_listing(100, 2015, 9_000, moneda="USD"), _listing(101, 2016, 12_000, moneda="USD")])
+    db.commit()
+    refrescar_market_stats(db)
+
+    todos = [p for precios in precios_ars.values() for p in precios]
+    stats = obtener_market_stats(db, 1, 1, 2014, 2016)
+    assert len(stats) == 5
+
+    # Las filas en dólares no se mezclan con las de pesos
+    resumen = combinar_market_stats(stats)
+    assert resumen["cantidad"] == len(todos)
+    assert resumen["media_recortada"] == _trimmed_mean(todos, trim_count=1)
+    assert combinar_market_stats(stats, "USD")["cantidad"] == 2
+
+    # La mediana de varios años es la exacta, no una combinación de medianas
+    assert mediana_mercado(db, 1, 1, 2014, 2016) == statistics.median(todos)
+    assert mediana_mercado(db, 1, 1, 2014, 2016, moneda="USD") == statistics.median([9_000, 12_000])
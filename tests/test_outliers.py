@@ -0,0 +1,30 @@
+"""Muestra acotada del modo MAD: exacta hasta el tope, memoria fija por encima."""
+import random
+import statistics
+
+from app.services.normalizer import _MuestraGrupo
+
+
+def test_muestra_grupo_exacta_bajo_el_tope():
+    rnd = random.Random(3)
+    precios = [rnd.uniform(1e6, 3e7) for _ in range(500)]
+    grupo = _MuestraGrupo(random.Random(0), max_muestra=1000)
+    for p in precios:
+        grupo.agregar(p)
+    mediana, _escala = grupo.limites()
+    assert grupo.n == 500
+    assert mediana == statistics.median(precios)
+
+
+def test_muestra_grupo_acotada_sobre_el_tope():
+    rnd = random.Random(4)
+    precios = [rnd.gauss(10e6, 1e6) for _ in range(50_000)]
+    grupo = _MuestraGrupo(random.Random(0), max_muestra=2000)
+    for p in precios:
+        grupo.agregar(p)
+    mediana, escala = grupo.limites()
+    assert grupo.n == 50_000
+    assert len(grupo.valores) == 2000
+    assert abs(mediana - statistics.median(precios)) < 0.05e6
+    # 1.4826·MAD estima σ para una normal
+    assert abs(escala - 1e6) < 0.1e6
@@ -0,0 +1,18 @@
+"""
+El modo batch de analizar_inventario debe dar exactamente lo mismo que
+calcular_precio_sugerido auto por auto.
+"""
+from app.models.auto import Auto
+from app.services.pricing_engine import analizar_inventario, calcular_precio_sugerido
+
+
+def test_analizar_inventario_igual_a_calculo_por_auto(db, mercado):
+    ids = [a.id for a in db.query(Auto).filter(Auto.en_stock == True).order_by(Auto.id)]
+
+    batch = analizar_inventario(db)
+    por_auto = [calcular_precio_sugerido(db, auto_id) for auto_id in ids]
+
+    assert sorted(b.auto_id for b in batch) == ids
+    assert sum(b.comparables_count for b in batch) > 0
+    por_id = {p.auto_id: p.model_dump() for p in por_auto}
+    assert {b.auto_id: b.model_dump() for b in batch} == por_id
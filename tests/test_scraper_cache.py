@@ -0,0 +1,49 @@
+"""Una página sin cambios (304) sale de la caché: sus listings cuentan como vistos sin reparsearla."""
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from app.models.pricing import MarketRawListing
+from app.services import scraper_kavak
+from app.services.scraper_kavak import scrape_kavak_web
+
+
+def pagina_kavak(ids) -> bytes:
+    cars = [
+        {
+            "id": str(i),
+            "url": f"/ar/usado/auto-{i}",
+            "title": "Toyota • Corolla",
+            "subtitle": f"{2015 + i % 5} • {40 + i}.000 km • 1.8 XEI • Manual",
+            "mainPrice": f"{20 + i}.500.000",
+        }
+        for i in ids
+    ]
+    return f'<html><script>"cars":{json.dumps(cars)}</script></html>'.encode()
+
+
+def test_pagina_sin_cambios_marca_listings_vistos(db, sitio, cache_paginas, monkeypatch):
+    monkeypatch.setattr(scraper_kavak, "KAVAK_BASE_URL", f"{sitio.base}/usados")
+    monkeypatch.setattr(scraper_kavak, "REQUEST_DELAY", 0)
+    sitio.paginas["/usados"] = pagina_kavak(range(10))
+
+    primera = scrape_kavak_web(db)
+    assert (primera["nuevos"], primera["sin_cambios"]) == (10, 0)
+    guardado = cache_paginas.leer(f"{sitio.base}/usados")["guardado"]
+
+    hace_un_mes = datetime.utcnow() - timedelta(days=30)
+    db.execute(update(MarketRawListing).values(fecha_ultima_vista=hace_un_mes))
+    db.commit()
+
+    # Las URLs de la página quedaron en la caché: sin cambios no se vuelve a parsear
+    def _sin_parsear(html):
+        raise AssertionError("la página sin cambios no debería parsearse")
+    monkeypatch.setattr(scraper_kavak, "_iter_cars_from_html", _sin_parsear)
+    segunda = scrape_kavak_web(db)
+    assert sitio.pedidos[-1] == ("/usados", 304)
+    assert (segunda["nuevos"], segunda["duplicados"], segunda["sin_cambios"]) == (0, 10, 1)
+    vistas = [f for (f,) in db.query(MarketRawListing.fecha_ultima_vista)]
+    assert len(vistas) == 10 and all(f > hace_un_mes for f in vistas)
+    # El 304 no renueva el TTL de la entrada
+    assert cache_paginas.leer(f"{sitio.base}/usados")["guardado"] == guardado
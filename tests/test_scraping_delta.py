@@ -0,0 +1,67 @@
+"""Corte de la corrida delta por presupuesto de páginas y registro de segmentos."""
+from datetime import datetime, timedelta
+
+from app.models.pricing import ScrapingSegmento
+from app.services.paginacion import PresupuestoPaginas, paginar
+from app.services.scraping_delta import recorrer_segmentos
+
+
+def _buscador(presupuesto, pagina_stats):
+    pedidas = []
+
+    def _buscar(marca: str, modelo: str, completo: bool) -> dict:
+        def _pagina(pagina: int, limit: int) -> dict:
+            pedidas.append((marca, pagina))
+            return dict(pagina_stats)
+        return paginar(_pagina, marca, max_nuevos=100, presupuesto=presupuesto, recorrido_completo=completo)
+
+    return _buscar, pedidas
+
+
+def test_corta_al_agotar_paginas_y_no_registra_segmentos_sin_visitar(db):
+    presupuesto = PresupuestoPaginas(1)
+    buscar, pedidas = _buscador(presupuesto, {"nuevos": 0, "duplicados": 5, "errores": 0})
+
+    recorrer_segmentos(db, "kavak", [("A", ""), ("B", ""), ("C", "")], buscar, presupuesto)
+
+    assert len(pedidas) == 1
+    assert db.query(ScrapingSegmento).count() == 1
+    # Una búsqueda que no llegó a pedir páginas no cuenta como visita
+    assert paginar(lambda p, l: {}, "X", max_nuevos=10, presupuesto=presupuesto)["paginas"] == 0
+
+
+def test_segmento_sin_cambios_no_decae_tasas(db):
+    hace_un_dia = datetime.utcnow() - timedelta(days=1)
+    db.add(ScrapingSegmento(
+        fuente="kavak", marca="Toyota", modelo="", ultimo_scrapeo=hace_un_dia,
+        ultimo_recorrido_completo=hace_un_dia, tasa_nuevos=0.4, tasa_cambios_precio=0.2, corridas=3,
+    ))
+    db.commit()
+    buscar, _ = _buscador(None, {"nuevos": 0, "duplicados": 5, "errores": 0, "sin_cambios": 1})
+
+    recorrer_segmentos(db, "kavak", [("Toyota", "")], buscar)
+
+    segmento = db.query(ScrapingSegmento).one()
+    assert (segmento.tasa_nuevos, segmento.tasa_cambios_precio, segmento.corridas) == (0.4, 0.2, 3)
+    assert segmento.ultimo_scrapeo > hace_un_dia
+    assert segmento.vistos == 5
+
+
+def test_fin_del_listado_por_items_de_la_pagina_y_no_por_los_guardados():
+    # Página llena de ML con items descartados (sin link): no es la última
+    paginas = {1: {"nuevos": 40, "duplicados": 5, "en_pagina": 48}, 2: {"nuevos": 10, "duplicados": 0, "en_pagina": 12}}
+    pedidas = []
+
+    def _pagina(pagina: int, limit: int) -> dict:
+        pedidas.append(pagina)
+        return {"errores": 0, **paginas[pagina]}
+
+    total = paginar(_pagina, "ML", max_nuevos=500, tam_pagina=48, recorrido_completo=True)
+    assert pedidas == [1, 2] and total["completo"]
+
+    # Sin `en_pagina` la página corta corta la búsqueda, pero no prueba que terminó el listado
+    sin_conteo = paginar(
+        lambda pagina, limit: {"nuevos": 40, "duplicados": 5, "errores": 0},
+        "ML", max_nuevos=500, tam_pagina=48, recorrido_completo=True,
+    )
+    assert sin_conteo["paginas"] == 1 and not sin_conteo["completo"]
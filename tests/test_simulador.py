@@ -0,0 +1,40 @@
+"""simular_rango evalúa todos los precios sobre una sola carga: debe coincidir con simular_venta paso a paso."""
+import random
+from datetime import datetime, timedelta
+
+from app.models.auto import Auto
+from app.models.venta import Venta
+from app.services.market_stats import refrescar_market_stats
+from app.services.simulador import simular_rango, simular_venta
+
+
+def _sembrar_ventas(db, n: int = 150, semilla: int = 2) -> None:
+    rnd = random.Random(semilla)
+    autos = db.query(Auto).all()
+    ahora = datetime.utcnow()
+    for _ in range(n):
+        auto = rnd.choice(autos)
+        db.add(Venta(
+            cliente_id=1,
+            auto_vendido_id=auto.id,
+            precio_venta=rnd.uniform(1e6, 3e7),
+            estado="completada",
+            fecha_creacion=ahora - timedelta(days=rnd.randint(1, 90)),
+            fecha_venta=ahora,
+        ))
+    db.commit()
+
+
+def test_simular_rango_igual_a_simular_venta_por_precio(db, mercado):
+    _sembrar_ventas(db)
+    refrescar_market_stats(db)
+
+    steps = 15
+    precio_min, precio_max = 1e6, 4e7
+    incremento = (precio_max - precio_min) / (steps - 1)
+    for auto in db.query(Auto).all():
+        rango = simular_rango(db, auto.id, precio_min, precio_max, steps)
+        por_precio = [simular_venta(db, auto.id, precio_min + incremento * i) for i in range(steps)]
+        assert rango == por_precio
+
+    assert simular_rango(db, 999_999, precio_min, precio_max, 3) == [{"error": "Auto no encontrado"}] * 3
@@ -0,0 +1,91 @@
+"""La vigencia solo desactiva listings de segmentos recorridos completos dentro de la ventana."""
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from app.models.marca import Marca
+from app.models.modelo import Modelo
+from app.models.pricing import MarketListing, MarketRawListing, ScrapingSegmento
+from app.services import scraper_kavak, scraping_delta
+from app.services.scraper_kavak import scrape_all_kavak, scrape_kavak_web
+from app.services.vigencia import actualizar_vigencia
+from test_scraper_cache import pagina_kavak
+
+
+def _activos(db) -> set[str]:
+    return {url.rsplit("-", 1)[1] for (url,) in db.query(MarketListing.url).filter(MarketListing.activo == True)}
+
+
+def _kavak_falso(sitio, monkeypatch) -> None:
+    monkeypatch.setattr(scraper_kavak, "KAVAK_BASE_URL", f"{sitio.base}/usados")
+    monkeypatch.setattr(scraper_kavak, "REQUEST_DELAY", 0)
+
+
+def _market_listings_vistos(db, cuando: datetime) -> None:
+    """Un market listing por raw listing, todos vistos por última vez `cuando`."""
+    db.execute(update(MarketRawListing).values(fecha_ultima_vista=cuando))
+    db.add(Marca(id=1, nombre="Toyota"))
+    db.add(Modelo(id=1, nombre="Corolla", marca_id=1))
+    db.add_all([
+        MarketListing(
+            raw_listing_id=raw_id, fuente="kavak", marca_id=1, modelo_id=1, anio=2018, precio=precio,
+            url=url, fecha_scraping=cuando, fecha_ultima_vista=cuando,
+        )
+        for raw_id, url, precio in db.query(MarketRawListing.id, MarketRawListing.url, MarketRawListing.precio)
+    ])
+    db.commit()
+
+
+def test_vigencia_requiere_recorrido_completo(db, sitio, cache_paginas, monkeypatch):
+    _kavak_falso(sitio, monkeypatch)
+    sitio.paginas["/usados"] = pagina_kavak(range(10))
+    sitio.paginas["/usados?page=2"] = pagina_kavak(range(10, 20))
+    sitio.paginas["/usados?page=3"] = pagina_kavak([])
+
+    # Primer scrapeo de las dos páginas (queda en caché) y sus market listings
+    scrape_kavak_web(db)
+    scrape_kavak_web(db, page=2)
+    hace_un_mes = datetime.utcnow() - timedelta(days=30)
+    _market_listings_vistos(db, hace_un_mes)
+    # La búsqueda de la marca (/usados/toyota) da 404: no cuenta como recorrido
+
+    # Corrida delta que corta en la página 1 (304, solo duplicados): la 2 no se ve
+    monkeypatch.setattr(scraping_delta, "LISTINGS_DIAS_RECORRIDO_COMPLETO", 10_000)
+    db.add(ScrapingSegmento(fuente="kavak", marca="", modelo="", ultimo_recorrido_completo=hace_un_mes))
+    db.commit()
+    scrape_all_kavak(db)
+    assert ("/usados", 304) in sitio.pedidos
+    assert not any(path.startswith("/usados?page=2") for path, _ in sitio.pedidos[2:])
+    assert actualizar_vigencia(db, dias=14)["desactivados"] == 0
+    assert _activos(db) == {str(i) for i in range(20)}
+
+    # Recorrido completo (páginas 1 y 2 sin cambios, la 3 vacía) sin el listing 19
+    monkeypatch.setattr(scraping_delta, "LISTINGS_DIAS_RECORRIDO_COMPLETO", 7)
+    sitio.paginas["/usados?page=2"] = pagina_kavak(range(10, 19))
+    scrape_all_kavak(db)
+    segmento = db.query(ScrapingSegmento).filter_by(fuente="kavak", marca="").one()
+    assert segmento.ultimo_recorrido_completo > hace_un_mes
+    assert actualizar_vigencia(db, dias=14)["desactivados"] == 1
+    assert _activos(db) == {str(i) for i in range(19)}
+
+
+def test_pagina_truncada_no_cuenta_como_recorrido_completo(db, sitio, cache_paginas, monkeypatch):
+    _kavak_falso(sitio, monkeypatch)
+    sitio.paginas["/usados?page=2"] = pagina_kavak(range(10))
+    scrape_kavak_web(db, page=2)
+    hace_un_mes = datetime.utcnow() - timedelta(days=30)
+    _market_listings_vistos(db, hace_un_mes)
+
+    # Página 1 con 10 nuevos: a la 2 (reordenada, no sale de la caché) le queda
+    # un límite de 5 y se corta en los duplicados 9-5; la 3 vacía no alcanza
+    # para dar el listado por recorrido
+    sitio.paginas["/usados"] = pagina_kavak(range(100, 110))
+    sitio.paginas["/usados?page=2"] = pagina_kavak(range(9, -1, -1))
+    sitio.paginas["/usados?page=3"] = pagina_kavak([])
+    scrape_all_kavak(db, max_por_marca=15)
+    assert ("/usados?page=3", 200) in sitio.pedidos
+
+    segmento = db.query(ScrapingSegmento).filter_by(fuente="kavak", marca="").one()
+    assert segmento.ultimo_recorrido_completo is None
+    assert actualizar_vigencia(db, dias=14)["desactivados"] == 0
+    assert _activos(db) == {str(i) for i in range(10)}